@@ -24,6 +24,11 @@ class Clientes(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['apellido', 'nombre', 'id'], name='cliente_apellido_nombre_idx'),
+        ]
+
     def __str__(self):
         return f"{self.nombre} {self.apellido}"
 
@@ -2,16 +2,20 @@ from rest_framework import viewsets, filters, status
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import IsAuthenticated
 from .models import Clientes
+from core.cambios import SincronizacionMixin
+from core.pagination import KeysetPagination
 from .serializers import ClienteSerializer
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 
-class ClienteViewSet(viewsets.ModelViewSet):
+class ClienteViewSet(SincronizacionMixin, viewsets.ModelViewSet):
+	entidad_cambios = 'cliente'
 	queryset = Clientes.objects.all().order_by('apellido', 'nombre')
 	serializer_class = ClienteSerializer
 	permission_classes = [IsAuthenticated]
-	pagination_class = None  # Desactivar paginación para devolver todos los clientes
+	pagination_class = KeysetPagination  # Lista completa salvo ?paginacion=cursor
+	keyset_ordering = ('apellido', 'nombre', 'id')
 	filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
 	filterset_fields = ['email', 'dni', 'activo', 'condicion_iva']
 	search_fields = ['nombre', 'apellido', 'email', 'dni']
@@ -1,3 +1,18 @@
 from django.contrib import admin
+from .models import CodigoProveedor, ImportacionCompra
 
 # Register your models here.
+
+@admin.register(CodigoProveedor)
+class CodigoProveedorAdmin(admin.ModelAdmin):
+    list_display = ('codigo', 'proveedor', 'producto', 'creado')
+    list_filter = ('proveedor',)
+    search_fields = ('codigo', 'producto__nombre')
+    raw_id_fields = ('producto',)
+
+
+@admin.register(ImportacionCompra)
+class ImportacionCompraAdmin(admin.ModelAdmin):
+    list_display = ('nombre_archivo', 'proveedor', 'compra', 'filas', 'unidades', 'user', 'creado')
+    list_filter = ('proveedor',)
+    readonly_fields = ('hash', 'compra', 'filas', 'unidades', 'user', 'creado')
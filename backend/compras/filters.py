@@ -0,0 +1,19 @@
+import django_filters
+
+from lotes.models import Lote
+from .models import Compras
+
+
+class CompraFilter(django_filters.FilterSet):
+    fecha_desde = django_filters.DateFilter(field_name='fecha_compra', lookup_expr='gte')
+    fecha_hasta = django_filters.DateFilter(field_name='fecha_compra', lookup_expr='lte')
+    proveedor = django_filters.NumberFilter(field_name='id_proveedor_id')
+    producto = django_filters.NumberFilter(method='filter_producto')
+
+    class Meta:
+        model = Compras
+        fields = ['proveedor', 'producto']
+
+    def filter_producto(self, queryset, name, value):
+        # Subconsulta y no lotes__producto: no debe tocar el JOIN de los totales
+        return queryset.filter(id__in=Lote.objects.filter(producto_id=value).values('compra_id'))
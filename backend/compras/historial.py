@@ -0,0 +1,61 @@
+from django.db.models import Case, Count, DecimalField, F, Max, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from lotes.models import Lote
+
+
+# ==========================================================
+# HISTORIAL DE COMPRAS: TOTALES EN SQL
+# ==========================================================
+# El costo neto de cada lote replica Lote.costo_unitario_final() * cantidad_inicial:
+# 'porc' descuenta un porcentaje del costo y 'valor' un importe sobre el total del lote.
+
+DINERO = DecimalField(max_digits=14, decimal_places=2)
+
+
+def costo_bruto(prefijo=''):
+    return F(f'{prefijo}cantidad_inicial') * F(f'{prefijo}costo_unitario')
+
+
+def costo_neto(prefijo=''):
+    bruto = costo_bruto(prefijo)
+    return Case(
+        When(**{f'{prefijo}descuento_tipo': 'porc', f'{prefijo}descuento_valor__isnull': False},
+             then=bruto * (Value(100) - F(f'{prefijo}descuento_valor')) / Value(100)),
+        When(**{f'{prefijo}descuento_tipo': 'valor', f'{prefijo}descuento_valor__isnull': False},
+             then=bruto - F(f'{prefijo}descuento_valor')),
+        default=bruto,
+        output_field=DINERO,
+    )
+
+
+def anotar_totales(compras):
+    """
+    Agrega lineas, unidades, costo_bruto y costo_total por compra con un único
+    JOIN + GROUP BY sobre sus lotes. Filtrar por lote o producto con una subconsulta
+    (id__in): un filter() sobre lotes__ reutilizaría el JOIN y recortaría los totales.
+    """
+    cero = Value(0, output_field=DINERO)
+    return compras.annotate(
+        lineas=Count('lotes'),
+        unidades=Coalesce(Sum('lotes__cantidad_inicial'), 0),
+        costo_bruto=Coalesce(Sum(costo_bruto('lotes__'), output_field=DINERO), cero),
+        costo_total=Coalesce(Sum(costo_neto('lotes__')), cero),
+    )
+
+
+def resumen_proveedores(compras):
+    """Totales por proveedor de las compras dadas, en una consulta sobre Lote."""
+    cero = Value(0, output_field=DINERO)
+    return (Lote.objects
+            .filter(compra__in=compras.order_by().values('id'))
+            .values(proveedor_id=F('compra__id_proveedor'), proveedor_nombre=F('compra__id_proveedor__nombre'))
+            .annotate(
+                compras=Count('compra', distinct=True),
+                lineas=Count('id'),
+                unidades=Coalesce(Sum('cantidad_inicial'), 0),
+                costo_bruto=Coalesce(Sum(costo_bruto(), output_field=DINERO), cero),
+                costo_total=Coalesce(Sum(costo_neto()), cero),
+                ultima_compra=Max('compra__fecha_compra'),
+            )
+            .order_by('-costo_total'))
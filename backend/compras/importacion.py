@@ -0,0 +1,272 @@
+import hashlib
+import os
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError
+from rest_framework import serializers
+
+from core.importacion import bloques, filas_csv, filas_xlsx, normalizar_encabezado
+from core.models import Producto
+from lotes.models import diferir_recalculo_stock
+from .models import CodigoProveedor, ImportacionCompra
+from .services import RegistroCompra
+
+
+# ==========================================================
+# IMPORTACIÓN DE FACTURAS DE PROVEEDOR (CSV / XLSX)
+# ==========================================================
+# El archivo se recorre fila por fila (nunca entero en memoria) y se procesa en
+# bloques: por bloque, una consulta resuelve los códigos del proveedor y un
+# bulk_create por tabla escribe lotes, detalles y kardex. La importación es
+# todo o nada: si alguna fila tiene errores no se escribe nada y se informan
+# las filas con problemas.
+#
+# Columnas reconocidas (encabezado en la primera fila, sin importar mayúsculas
+# ni acentos): codigo (o producto_id), cantidad, costo_unitario, y opcionales
+# fecha_vencimiento y numero_lote.
+
+TAMANO_BLOQUE = 500
+MAX_ERRORES = 1000
+
+ALIAS_COLUMNAS = {
+    'codigo': ('codigo', 'cod', 'codigo_proveedor', 'sku', 'articulo'),
+    'producto_id': ('producto_id', 'id_producto'),
+    'cantidad': ('cantidad', 'cant', 'unidades'),
+    'costo_unitario': ('costo_unitario', 'costo', 'precio_unitario', 'precio'),
+    'fecha_vencimiento': ('fecha_vencimiento', 'vencimiento', 'vto'),
+    'numero_lote': ('numero_lote', 'lote', 'nro_lote'),
+}
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y')
+
+
+class _ImportacionConErrores(Exception):
+    """Deshace la transacción de la importación cuando alguna fila no es válida."""
+
+
+def hash_archivo(archivo):
+    """sha256 del contenido, leído por partes; deja el archivo al principio."""
+    digest = hashlib.sha256()
+    archivo.seek(0)
+    for parte in iter(lambda: archivo.read(64 * 1024), b''):
+        digest.update(parte)
+    archivo.seek(0)
+    return digest.hexdigest()
+
+
+def _mapear_columnas(encabezados):
+    alias = {a: campo for campo, nombres in ALIAS_COLUMNAS.items() for a in nombres}
+    columnas = {}
+    for indice, encabezado in enumerate(encabezados):
+        campo = alias.get(normalizar_encabezado(encabezado))
+        if campo and campo not in columnas:
+            columnas[campo] = indice
+    if 'codigo' not in columnas and 'producto_id' not in columnas:
+        raise serializers.ValidationError({"detail": "El archivo necesita una columna 'codigo' o 'producto_id'"})
+    for requerida in ('cantidad', 'costo_unitario'):
+        if requerida not in columnas:
+            raise serializers.ValidationError({"detail": f"El archivo necesita una columna '{requerida}'"})
+    return columnas
+
+
+def leer_filas(archivo, nombre):
+    """Genera (numero_de_fila, {campo: valor}) desde la segunda fila del archivo."""
+    extension = os.path.splitext(nombre or '')[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        filas = filas_xlsx(archivo)
+    elif extension in ('.csv', '.txt', ''):
+        filas = filas_csv(archivo)
+    else:
+        raise serializers.ValidationError({"detail": f"Formato no soportado: {extension} (usar CSV o XLSX)"})
+    encabezados = next(filas, None)
+    if encabezados is None:
+        raise serializers.ValidationError({"detail": "El archivo está vacío"})
+    columnas = _mapear_columnas(encabezados)
+    for numero, fila in enumerate(filas, start=2):
+        if not any(valor not in (None, '') for valor in fila):
+            continue
+        yield numero, {
+            campo: fila[indice] if indice < len(fila) else None
+            for campo, indice in columnas.items()
+        }
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _entero(valor):
+    texto = _texto(valor)
+    try:
+        numero = Decimal(texto.replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"'{texto}' no es un número")
+    if numero != numero.to_integral_value():
+        raise ValueError(f"'{texto}' no es un número entero")
+    return int(numero)
+
+
+def _decimal(valor):
+    if isinstance(valor, (int, float, Decimal)):
+        return Decimal(str(valor)).quantize(Decimal('0.01'))
+    texto = _texto(valor).replace('$', '').replace(' ', '')
+    if ',' in texto and '.' in texto:
+        # 1.234,56 -> 1234.56
+        texto = texto.replace('.', '').replace(',', '.')
+    else:
+        texto = texto.replace(',', '.')
+    try:
+        return Decimal(texto).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f"'{_texto(valor)}' no es un importe")
+
+
+def _fecha(valor):
+    if valor in (None, ''):
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = _texto(valor)
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"'{texto}' no es una fecha (usar AAAA-MM-DD o DD/MM/AAAA)")
+
+
+def validar_bloque(bloque, proveedor, notas=None):
+    """
+    Convierte un bloque de filas en datos de lote. Resuelve los códigos del
+    proveedor y los producto_id en una consulta cada uno.
+    Devuelve (lotes, errores) con errores = [{'fila', 'error'}].
+    """
+    codigos = {_texto(f['codigo']) for _, f in bloque if _texto(f.get('codigo'))}
+    por_codigo = dict(
+        CodigoProveedor.objects.filter(proveedor=proveedor, codigo__in=codigos).values_list('codigo', 'producto_id')
+    ) if codigos else {}
+    ids = set()
+    for _, f in bloque:
+        if not _texto(f.get('codigo')) and _texto(f.get('producto_id')):
+            try:
+                ids.add(_entero(f['producto_id']))
+            except ValueError:
+                pass
+    existentes = set(Producto.objects.filter(id__in=ids).values_list('id', flat=True)) if ids else set()
+
+    lotes, errores = [], []
+    for numero, f in bloque:
+        try:
+            codigo = _texto(f.get('codigo'))
+            if codigo:
+                producto_id = por_codigo.get(codigo)
+                if producto_id is None:
+                    raise ValueError(f"El código '{codigo}' no está asociado a ningún producto de este proveedor")
+            elif _texto(f.get('producto_id')):
+                producto_id = _entero(f['producto_id'])
+                if producto_id not in existentes:
+                    raise ValueError(f"El producto {producto_id} no existe")
+            else:
+                raise ValueError("Falta el código del producto")
+            cantidad = _entero(f['cantidad'])
+            if cantidad <= 0:
+                raise ValueError("La cantidad debe ser mayor a 0")
+            costo = _decimal(f['costo_unitario'])
+            if costo < 0:
+                raise ValueError("El costo no puede ser negativo")
+            lotes.append({
+                'producto_id': producto_id,
+                'cantidad_inicial': cantidad,
+                'cantidad_disponible': cantidad,
+                'costo_unitario': costo,
+                'fecha_vencimiento': _fecha(f.get('fecha_vencimiento')),
+                'numero_lote': _texto(f.get('numero_lote'))[:50] or None,
+                'notas': notas,
+            })
+        except ValueError as e:
+            errores.append({'fila': numero, 'error': str(e)})
+    return lotes, errores
+
+
+def _duplicada(importacion):
+    return {
+        'importada': False,
+        'duplicada': True,
+        'importacion_id': importacion.id,
+        'compra_id': importacion.compra_id,
+        'filas': importacion.filas,
+        'unidades': importacion.unidades,
+    }
+
+
+def importar(archivo, nombre, proveedor, user, caja=None, empleado=None, medio_pago='EFECTIVO', tamano=TAMANO_BLOQUE):
+    """
+    Importa una factura de proveedor como una Compra con un lote por fila.
+    Si hay `caja` registra el egreso por el total. El mismo archivo (mismo hash)
+    para el mismo proveedor se importa una sola vez.
+    """
+    digest = hash_archivo(archivo)
+    previa = ImportacionCompra.objects.filter(proveedor=proveedor, hash=digest).first()
+    if previa:
+        return _duplicada(previa)
+
+    registro = RegistroCompra(user, caja, empleado)
+    notas = f'Importación {nombre}'[:255]
+    errores, total_errores = [], 0
+    filas = unidades = 0
+    total = Decimal('0')
+    try:
+        with diferir_recalculo_stock():
+            compra = registro.crear_compra(proveedor)
+            for bloque in bloques(leer_filas(archivo, nombre), tamano):
+                lotes, encontrados = validar_bloque(bloque, proveedor, notas)
+                total_errores += len(encontrados)
+                errores.extend(encontrados[:max(MAX_ERRORES - len(errores), 0)])
+                filas += len(bloque)
+                if total_errores:
+                    # Se sigue leyendo sólo para informar todos los errores
+                    continue
+                registro.agregar_lotes(compra, lotes)
+                unidades += sum(lote['cantidad_inicial'] for lote in lotes)
+                total += sum(lote['cantidad_inicial'] * lote['costo_unitario'] for lote in lotes)
+            if not filas:
+                errores, total_errores = [{'fila': None, 'error': 'El archivo no tiene filas para importar'}], 1
+            if total_errores:
+                raise _ImportacionConErrores()
+            compra.monto_total = total
+            compra.save(update_fields=['monto_total'])
+            if caja is not None:
+                registro.registrar_egreso(compra, medio_pago)
+            importacion = ImportacionCompra.objects.create(
+                proveedor=proveedor, hash=digest, nombre_archivo=(nombre or '')[:255],
+                compra=compra, filas=filas, unidades=unidades, user=user,
+            )
+    except _ImportacionConErrores:
+        return {
+            'importada': False,
+            'duplicada': False,
+            'filas': filas,
+            'errores_total': total_errores,
+            'errores': errores,
+        }
+    except IntegrityError:
+        # Otra importación del mismo archivo terminó primero
+        previa = ImportacionCompra.objects.filter(proveedor=proveedor, hash=digest).first()
+        if previa is None:
+            raise
+        return _duplicada(previa)
+    return {
+        'importada': True,
+        'duplicada': False,
+        'importacion_id': importacion.id,
+        'compra_id': compra.id,
+        'filas': filas,
+        'unidades': unidades,
+        'monto_total': total,
+    }
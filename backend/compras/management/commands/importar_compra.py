@@ -0,0 +1,51 @@
+import json
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from compras.importacion import importar
+from core.models import EmpleadoProfile
+from movimientos_caja.models import Caja
+from proveedores.models import Proveedores
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa una factura de proveedor (CSV o XLSX) como una compra con un lote por fila. "
+        "Los códigos se traducen con los CodigoProveedor del proveedor; el mismo archivo no se importa dos veces."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', type=str)
+        parser.add_argument('--proveedor', type=int, required=True, help='Id del proveedor')
+        parser.add_argument('--usuario', type=str, required=True, help='Usuario que registra la compra')
+        parser.add_argument('--medio-pago', type=str, default='EFECTIVO')
+        parser.add_argument('--egreso', action='store_true', help='Registrar el egreso en la caja abierta')
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        if not os.path.isfile(ruta):
+            raise CommandError(f'No existe el archivo {ruta}')
+        proveedor = Proveedores.objects.filter(pk=options['proveedor']).first()
+        if not proveedor:
+            raise CommandError(f"No existe el proveedor {options['proveedor']}")
+        user = get_user_model().objects.filter(username=options['usuario']).first()
+        if not user:
+            raise CommandError(f"No existe el usuario {options['usuario']}")
+        caja = None
+        if options['egreso']:
+            caja = Caja.objects.filter(estado='ABIERTA').first()
+            if not caja:
+                raise CommandError('No hay sesión de caja abierta')
+        empleado = EmpleadoProfile.objects.filter(user=user).first()
+
+        with open(ruta, 'rb') as archivo:
+            resultado = importar(
+                archivo, os.path.basename(ruta), proveedor, user,
+                caja=caja, empleado=empleado, medio_pago=options['medio_pago'],
+            )
+        self.stdout.write(json.dumps(resultado, cls=DjangoJSONEncoder, indent=2, ensure_ascii=False))
+        if not resultado['importada'] and not resultado['duplicada']:
+            raise CommandError(f"La factura tiene {resultado['errores_total']} filas con errores")
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0002_initial'),
+        ('core', '0004_idempotency_key'),
+        ('proveedores', '0002_indices_keyset'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodigoProveedor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=50)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='codigos_proveedor', to='core.producto')),
+                ('proveedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='codigos', to='proveedores.proveedores')),
+            ],
+            options={
+                'verbose_name': 'Código de proveedor',
+                'verbose_name_plural': 'Códigos de proveedor',
+                'constraints': [models.UniqueConstraint(fields=('proveedor', 'codigo'), name='codigo_proveedor_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportacionCompra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.CharField(max_length=64)),
+                ('nombre_archivo', models.CharField(max_length=255)),
+                ('filas', models.PositiveIntegerField(default=0)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('compra', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='importaciones', to='compras.compras')),
+                ('proveedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='importaciones', to='proveedores.proveedores')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Importación de compra',
+                'verbose_name_plural': 'Importaciones de compra',
+                'constraints': [models.UniqueConstraint(fields=('proveedor', 'hash'), name='importacion_compra_hash_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0003_importacion_facturas'),
+        ('proveedores', '0002_indices_keyset'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='compras',
+            index=models.Index(fields=['fecha_compra', 'id'], name='compra_fecha_id_idx'),
+        ),
+    ]
@@ -8,6 +8,12 @@ class Compras(models.Model):
     id_proveedor = models.ForeignKey('proveedores.Proveedores', on_delete=models.CASCADE)
     id_usuario = models.ForeignKey('auth.User', on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # Historial: orden y paginación keyset por (-fecha_compra, -id)
+            models.Index(fields=['fecha_compra', 'id'], name='compra_fecha_id_idx'),
+        ]
+
     def __str__(self):
         return f'Compra #{self.id}'
 
@@ -25,3 +31,48 @@ class DetalleCompra(models.Model):
 
     def __str__(self):
         return f"Detalle de Compra {self.id_compra.pk}"
+
+
+# ==========================================================
+# IMPORTACIÓN DE FACTURAS DE PROVEEDOR
+# ==========================================================
+# CodigoProveedor traduce el código que usa cada proveedor en sus facturas a
+# nuestro Producto. ImportacionCompra guarda el hash del archivo importado:
+# volver a subir el mismo archivo devuelve la compra ya creada. Ver compras/importacion.py.
+
+class CodigoProveedor(models.Model):
+    proveedor = models.ForeignKey('proveedores.Proveedores', on_delete=models.CASCADE, related_name='codigos')
+    codigo = models.CharField(max_length=50)
+    producto = models.ForeignKey('core.Producto', on_delete=models.CASCADE, related_name='codigos_proveedor')
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Código de proveedor'
+        verbose_name_plural = 'Códigos de proveedor'
+        constraints = [
+            models.UniqueConstraint(fields=['proveedor', 'codigo'], name='codigo_proveedor_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.codigo} → {self.producto_id}'
+
+
+class ImportacionCompra(models.Model):
+    proveedor = models.ForeignKey('proveedores.Proveedores', on_delete=models.CASCADE, related_name='importaciones')
+    hash = models.CharField(max_length=64)
+    nombre_archivo = models.CharField(max_length=255)
+    compra = models.ForeignKey(Compras, on_delete=models.SET_NULL, null=True, blank=True, related_name='importaciones')
+    filas = models.PositiveIntegerField(default=0)
+    unidades = models.PositiveIntegerField(default=0)
+    user = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True, blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Importación de compra'
+        verbose_name_plural = 'Importaciones de compra'
+        constraints = [
+            models.UniqueConstraint(fields=['proveedor', 'hash'], name='importacion_compra_hash_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.nombre_archivo} ({self.hash[:12]})'
@@ -1,10 +1,13 @@
-from .models import Compras, DetalleCompra
+from .models import Compras, DetalleCompra, CodigoProveedor
 from rest_framework import serializers
 from .models import Compras
+from core.models import Producto
 from lotes.models import Lote
+from proveedores.models import Proveedores
 
 class DetalleCompraSerializer(serializers.ModelSerializer):
     producto = serializers.SerializerMethodField()
+    lote = serializers.SerializerMethodField()
 
     def get_producto(self, obj):
         return {
@@ -12,9 +15,20 @@ class DetalleCompraSerializer(serializers.ModelSerializer):
             'nombre': obj.id_lote.producto.nombre
         } if obj.id_lote and obj.id_lote.producto else None
 
+    def get_lote(self, obj):
+        lote = obj.id_lote
+        return {
+            'numero_lote': lote.numero_lote,
+            'fecha_vencimiento': lote.fecha_vencimiento,
+            'cantidad_disponible': lote.cantidad_disponible,
+            'descuento_tipo': lote.descuento_tipo,
+            'descuento_valor': lote.descuento_valor,
+            'costo_unitario_final': lote.costo_unitario_final(),
+        } if lote else None
+
     class Meta:
         model = DetalleCompra
-        fields = ['id', 'id_compra', 'id_lote', 'producto', 'cantidad', 'costo_unitario', 'descuento_por_item', 'subtotal']
+        fields = ['id', 'id_compra', 'id_lote', 'producto', 'lote', 'cantidad', 'costo_unitario', 'descuento_por_item', 'subtotal']
 
 class CompraSerializer(serializers.ModelSerializer):
     detalles = DetalleCompraSerializer(many=True, read_only=True)
@@ -28,23 +42,68 @@ class CompraSerializer(serializers.ModelSerializer):
         user = self.context['request'].user
         return Compras.objects.create(id_usuario=user, **validated_data)
 
+class CompraHistorialSerializer(CompraSerializer):
+    # Totales anotados en SQL por compras.historial.anotar_totales
+    proveedor_nombre = serializers.CharField(source='id_proveedor.nombre', read_only=True)
+    usuario = serializers.CharField(source='id_usuario.username', read_only=True)
+    lineas = serializers.IntegerField(read_only=True)
+    unidades = serializers.IntegerField(read_only=True)
+    costo_bruto = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    costo_total = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+
+    class Meta(CompraSerializer.Meta):
+        fields = CompraSerializer.Meta.fields + ['proveedor_nombre', 'usuario', 'lineas', 'unidades', 'costo_bruto', 'costo_total']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Con ?incluir_items=false la vista no precarga detalles: se omite 'detalles'
+        if not self.context.get('incluir_items', True):
+            self.fields.pop('detalles')
+
 class LoteCompraSerializer(serializers.ModelSerializer):
+    # Id plano: los productos de toda la factura se resuelven juntos en CompraConLotesSerializer
+    producto = serializers.IntegerField(min_value=1)
+    costo_unitario = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+
     class Meta:
         model = Lote
         exclude = ['id', 'compra', 'creado', 'activo']
 
+    def validate(self, attrs):
+        if attrs['cantidad_disponible'] > attrs['cantidad_inicial']:
+            raise serializers.ValidationError({"cantidad_disponible": "No puede superar la cantidad inicial"})
+        return attrs
+
 class CompraConLotesSerializer(serializers.ModelSerializer):
-    lotes = LoteCompraSerializer(many=True)
+    lotes = LoteCompraSerializer(many=True, allow_empty=False)
+    medio_pago = serializers.CharField(max_length=50, required=False, default='EFECTIVO', write_only=True)
 
     class Meta:
         model = Compras
-        fields = ['id', 'monto_total', 'fecha_compra', 'id_proveedor', 'id_usuario', 'lotes']
+        fields = ['id', 'monto_total', 'fecha_compra', 'id_proveedor', 'id_usuario', 'lotes', 'medio_pago']
         read_only_fields = ['id', 'fecha_compra', 'id_usuario']
 
-    def create(self, validated_data):
-        lotes_data = validated_data.pop('lotes')
-        user = self.context['request'].user
-        compra = Compras.objects.create(id_usuario=user, **validated_data)
-        for lote_data in lotes_data:
-            Lote.objects.create(compra=compra, **lote_data)
-        return compra
+    def validate_lotes(self, lotes):
+        ids = {lote['producto'] for lote in lotes}
+        productos = Producto.objects.in_bulk(ids)
+        faltantes = sorted(ids - productos.keys())
+        if faltantes:
+            raise serializers.ValidationError(f"El producto {faltantes[0]} no existe")
+        for lote in lotes:
+            lote['producto'] = productos[lote['producto']]
+        return lotes
+
+class CodigoProveedorSerializer(serializers.ModelSerializer):
+    producto_nombre = serializers.CharField(source='producto.nombre', read_only=True)
+
+    class Meta:
+        model = CodigoProveedor
+        fields = ['id', 'proveedor', 'codigo', 'producto', 'producto_nombre', 'creado']
+        read_only_fields = ['id', 'creado']
+
+class ImportarCompraSerializer(serializers.Serializer):
+    archivo = serializers.FileField()
+    id_proveedor = serializers.PrimaryKeyRelatedField(queryset=Proveedores.objects.all())
+    medio_pago = serializers.CharField(max_length=50, required=False, default='EFECTIVO')
+    # Una factura a pagar más adelante no sale de la caja
+    registrar_egreso = serializers.BooleanField(required=False, default=True)
@@ -0,0 +1,109 @@
+from decimal import Decimal
+
+from django.db.models import Prefetch, prefetch_related_objects
+
+from lotes import kardex
+from lotes.models import Lote, diferir_recalculo_stock, recalcular_stock_productos
+from movimientos_caja.models import MovimientoDeCaja
+from tipo_movimientos.models import TipoMovimiento
+from tipo_pago.models import TipoPago
+from .models import Compras, DetalleCompra
+
+
+class RegistroCompra:
+    """
+    Registra una compra con sus lotes con un número fijo de consultas, sin
+    importar cuántas líneas tenga la factura: compra, lotes, detalles, kardex y
+    egreso de caja en una transacción, y un único recálculo de stock al final.
+
+    Recibe los datos ya validados por CompraConLotesSerializer (productos
+    resueltos en una consulta, costos presentes).
+    """
+
+    def __init__(self, user, caja, empleado):
+        self.user = user
+        self.caja = caja
+        self.empleado = empleado
+        self._tipo_egreso = None
+        self._tipos_pago = {}
+
+    # ------------------------------------------------------------------
+    # Catálogos de caja (se resuelven una vez por instancia)
+    # ------------------------------------------------------------------
+    def tipo_egreso(self):
+        if self._tipo_egreso is None:
+            tm = TipoMovimiento.objects.filter(nombre_tipo_movimiento__iexact='EGRESO').first()
+            if not tm:
+                tm = TipoMovimiento.objects.create(nombre_tipo_movimiento='EGRESO')
+            self._tipo_egreso = tm
+        return self._tipo_egreso
+
+    def tipo_pago(self, medio_pago):
+        if medio_pago not in self._tipos_pago:
+            tp = TipoPago.objects.filter(nombre_tipo_pago__iexact=medio_pago).first()
+            if not tp:
+                tp = TipoPago.objects.create(nombre_tipo_pago=medio_pago)
+            self._tipos_pago[medio_pago] = tp
+        return self._tipos_pago[medio_pago]
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    # Los pasos sueltos sirven a la importación de facturas, que agrega los
+    # lotes por bloques; deben correr dentro de diferir_recalculo_stock().
+    def crear_compra(self, proveedor, monto_total=Decimal('0')):
+        return Compras.objects.create(monto_total=monto_total, id_proveedor=proveedor, id_usuario=self.user)
+
+    def agregar_lotes(self, compra, lotes_data):
+        """Inserta un bloque de lotes con sus detalles y movimientos de kardex. Devuelve los lotes."""
+        Lote.objects.bulk_create([Lote(compra=compra, **lote) for lote in lotes_data])
+        # bulk_create no devuelve ids en MySQL: se releen los últimos insertados de la compra
+        lotes = list(Lote.objects.filter(compra=compra).order_by('-id')[:len(lotes_data)])[::-1]
+
+        DetalleCompra.objects.bulk_create([
+            DetalleCompra(
+                id_compra=compra,
+                id_lote=lote,
+                cantidad=lote.cantidad_inicial,
+                costo_unitario=lote.costo_unitario,
+                descuento_por_item=Decimal('0'),
+                subtotal=lote.cantidad_inicial * lote.costo_unitario,
+            )
+            for lote in lotes
+        ])
+        kardex.registrar(
+            kardex.movimiento(lote, 'COMPRA', lote.cantidad_disponible, 'compra', compra.id, self.user)
+            for lote in lotes
+        )
+        recalcular_stock_productos(lote.producto_id for lote in lotes)
+        return lotes
+
+    def registrar_egreso(self, compra, medio_pago='EFECTIVO'):
+        return MovimientoDeCaja.objects.create(
+            caja=self.caja,
+            monto=compra.monto_total,
+            descripcion=f'Compra #{compra.id}',
+            empleado=self.empleado,
+            id_tipo_movimiento=self.tipo_egreso(),
+            id_tipo_pago=self.tipo_pago(medio_pago),
+            tipo='EGRESO',
+            origen='COMPRA',
+            ref_type='compra',
+            ref_id=compra.id,
+            created_by=self.user,
+        )
+
+    def registrar(self, datos, medio_pago='EFECTIVO'):
+        """
+        datos = {'monto_total', 'id_proveedor', 'lotes': [{producto, cantidad_inicial, ...}]}.
+        Devuelve la compra con sus detalles (y lote/producto de cada uno) ya cargados.
+        """
+        with diferir_recalculo_stock():
+            compra = self.crear_compra(datos['id_proveedor'], datos['monto_total'])
+            self.agregar_lotes(compra, datos['lotes'])
+            self.registrar_egreso(compra, medio_pago)
+
+        prefetch_related_objects(
+            [compra], Prefetch('detalles', queryset=DetalleCompra.objects.select_related('id_lote__producto').order_by('id'))
+        )
+        return compra
@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import RegistrarCompraView
+from .views import RegistrarCompraView, ImportarCompraView
 
 urlpatterns = [
     path('api/registrar-compra/', RegistrarCompraView.as_view(), name='registrar-compra'),
+    path('api/importar-compra/', ImportarCompraView.as_view(), name='importar-compra'),
 ]
@@ -1,66 +1,117 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework import status
-from .serializers import CompraConLotesSerializer
-from movimientos_caja.models import Caja, MovimientoDeCaja
-from tipo_movimientos.models import TipoMovimiento
-from tipo_pago.models import TipoPago
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from django.db.models import Prefetch
+from django_filters.rest_framework import DjangoFilterBackend
+from .filters import CompraFilter
+from .historial import anotar_totales, resumen_proveedores
+from .importacion import importar
+from .models import CodigoProveedor, Compras, DetalleCompra
+from .serializers import CompraConLotesSerializer, CompraSerializer, CompraHistorialSerializer, CodigoProveedorSerializer, ImportarCompraSerializer
+from core.pagination import KeysetPagination
+from .services import RegistroCompra
+from core.idempotency import idempotente
+from core.models import EmpleadoProfile
+from movimientos_caja.models import Caja
 
 # Endpoint para registrar compra y lotes juntos
 class RegistrarCompraView(APIView):
 	permission_classes = [IsAuthenticated]
 
+	@idempotente('registrar-compra')
 	def post(self, request):
-		from .models import Compras, DetalleCompra
-		from .serializers import CompraConLotesSerializer, DetalleCompraSerializer, CompraSerializer
-		data = request.data.copy()
-		lotes_data = data.pop('lotes', [])
-		compra_serializer = CompraConLotesSerializer(data={**data, 'lotes': lotes_data}, context={'request': request})
-		if compra_serializer.is_valid():
-			compra = compra_serializer.save()
-			detalles_creados = []
-			# Crear los detalles de compra para cada lote
-			for lote in compra.lotes.all():
-				detalle_data = {
-					'id_compra': compra.id,
-					'id_lote': lote.id,
-					'cantidad': lote.cantidad_inicial,
-					'costo_unitario': lote.costo_unitario,
-					'descuento_por_item': lote.descuento_por_item if hasattr(lote, 'descuento_por_item') else 0,
-					'subtotal': (lote.cantidad_inicial * lote.costo_unitario) - (lote.descuento_por_item if hasattr(lote, 'descuento_por_item') else 0)
-				}
-				detalle_serializer = DetalleCompraSerializer(data=detalle_data)
-				if detalle_serializer.is_valid():
-					detalle_serializer.save()
-					detalles_creados.append(detalle_serializer.data)
-				else:
-					return Response(detalle_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-			# Registrar movimiento de caja tipo EGRESO
+		# Todo se valida antes de escribir: productos de la factura en una consulta
+		compra_serializer = CompraConLotesSerializer(data=request.data, context={'request': request})
+		if not compra_serializer.is_valid():
+			return Response(compra_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+		datos = compra_serializer.validated_data
+		# El egreso se registra en la caja abierta
+		caja = Caja.objects.filter(estado='ABIERTA').first()
+		if not caja:
+			return Response({"detail": "No hay sesión de caja abierta"}, status=409)
+		empleado = EmpleadoProfile.objects.filter(user=request.user).first()
+
+		compra = RegistroCompra(request.user, caja, empleado).registrar(datos, medio_pago=datos['medio_pago'])
+		return Response(CompraSerializer(compra).data, status=status.HTTP_201_CREATED)
+
+
+# Importación de facturas de proveedor (CSV/XLSX) como una compra con un lote por fila
+class ImportarCompraView(APIView):
+	permission_classes = [IsAuthenticated]
+	parser_classes = [MultiPartParser, FormParser]
+
+	def post(self, request):
+		ser = ImportarCompraSerializer(data=request.data)
+		ser.is_valid(raise_exception=True)
+		datos = ser.validated_data
+		caja = None
+		if datos['registrar_egreso']:
 			caja = Caja.objects.filter(estado='ABIERTA').first()
-			from core.models import EmpleadoProfile
-			empleado_user = request.user
-			empleado_profile = EmpleadoProfile.objects.get(user=empleado_user)
-			tm = TipoMovimiento.objects.filter(nombre_tipo_movimiento__iexact='EGRESO').first()
-			if not tm:
-				tm = TipoMovimiento.objects.create(nombre_tipo_movimiento='EGRESO')
-			tp = TipoPago.objects.filter(nombre_tipo_pago__iexact=data.get('medio_pago', 'EFECTIVO')).first()
-			if not tp:
-				tp = TipoPago.objects.create(nombre_tipo_pago=data.get('medio_pago', 'EFECTIVO'))
-			MovimientoDeCaja.objects.create(
-				caja=caja,
-				monto=compra.monto_total,
-				descripcion=f'Compra #{compra.id}',
-				empleado=empleado_profile,
-				id_tipo_movimiento=tm,
-				id_tipo_pago=tp,
-				tipo='EGRESO',
-				origen='COMPRA',
-				ref_type='compra',
-				ref_id=compra.id,
-				created_by=empleado_user,
-			)
-			response_data = CompraSerializer(compra).data
-			response_data['detalles'] = detalles_creados
-			return Response(response_data, status=status.HTTP_201_CREATED)
-		return Response(compra_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+			if not caja:
+				return Response({"detail": "No hay sesión de caja abierta"}, status=409)
+		empleado = EmpleadoProfile.objects.filter(user=request.user).first()
+		archivo = datos['archivo']
+		resultado = importar(
+			archivo, archivo.name, datos['id_proveedor'], request.user,
+			caja=caja, empleado=empleado, medio_pago=datos['medio_pago'],
+		)
+		if resultado['importada']:
+			return Response(resultado, status=status.HTTP_201_CREATED)
+		if resultado['duplicada']:
+			return Response(resultado, status=status.HTTP_200_OK)
+		return Response(resultado, status=status.HTTP_400_BAD_REQUEST)
+
+
+class CodigoProveedorViewSet(viewsets.ModelViewSet):
+	serializer_class = CodigoProveedorSerializer
+	permission_classes = [IsAuthenticated]
+	pagination_class = None  # Se consulta por proveedor o producto
+
+	def get_queryset(self):
+		qs = CodigoProveedor.objects.select_related('producto').order_by('proveedor_id', 'codigo')
+		proveedor = self.request.query_params.get('proveedor')
+		if proveedor:
+			qs = qs.filter(proveedor_id=proveedor)
+		producto = self.request.query_params.get('producto')
+		if producto:
+			qs = qs.filter(producto_id=producto)
+		return qs
+
+
+# Historial de compras: totales por compra en SQL y detalles con lote/producto en una consulta extra
+class CompraViewSet(viewsets.ReadOnlyModelViewSet):
+	permission_classes = [IsAuthenticated]
+	serializer_class = CompraHistorialSerializer
+	pagination_class = KeysetPagination  # Lista completa salvo ?paginacion=cursor
+	keyset_ordering = ('-fecha_compra', '-id')
+	filter_backends = [DjangoFilterBackend]
+	filterset_class = CompraFilter
+
+	def incluir_items(self):
+		return self.request.query_params.get('incluir_items', '').lower() not in ('false', '0', 'no')
+
+	def get_queryset(self):
+		qs = Compras.objects.select_related('id_proveedor', 'id_usuario').order_by('-fecha_compra', '-id')
+		if self.action in ('list', 'retrieve'):
+			qs = anotar_totales(qs)
+			if self.action == 'retrieve' or self.incluir_items():
+				qs = qs.prefetch_related(Prefetch(
+					'detalles',
+					queryset=DetalleCompra.objects.select_related('id_lote__producto').order_by('id'),
+				))
+		return qs
+
+	def get_serializer_context(self):
+		context = super().get_serializer_context()
+		if self.action == 'list':
+			context['incluir_items'] = self.incluir_items()
+		return context
+
+	@action(detail=False, methods=['get'])
+	def resumen(self, request):
+		"""Totales por proveedor (compras, líneas, unidades, costo) con los mismos filtros que el listado."""
+		compras = self.filter_queryset(Compras.objects.all())
+		return Response(list(resumen_proveedores(compras)))
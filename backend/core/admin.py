@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import EmpleadoProfile, Producto
+from .models import EmpleadoProfile, Producto, CodigoBarras, AjustePrecio, PrecioHistorico
 
 @admin.register(EmpleadoProfile) 
 class EmpleadoProfileAdmin(admin.ModelAdmin):
@@ -15,3 +15,23 @@ class ProductoAdmin(admin.ModelAdmin):
     search_fields = ('nombre', 'categoria')
     ordering = ('-creado',)
     readonly_fields = ('creado',)
+
+@admin.register(CodigoBarras)
+class CodigoBarrasAdmin(admin.ModelAdmin):
+    list_display = ('codigo', 'producto', 'lote', 'creado')
+    search_fields = ('codigo', 'producto__nombre')
+    raw_id_fields = ('producto', 'lote')
+    readonly_fields = ('creado',)
+
+@admin.register(AjustePrecio)
+class AjustePrecioAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'valor', 'multiplo', 'direccion', 'productos', 'user', 'fecha')
+    list_filter = ('tipo', 'fecha')
+    readonly_fields = ('fecha',)
+
+@admin.register(PrecioHistorico)
+class PrecioHistoricoAdmin(admin.ModelAdmin):
+    list_display = ('producto', 'precio_anterior', 'precio', 'origen', 'fecha', 'user')
+    list_filter = ('origen', 'fecha')
+    search_fields = ('producto__nombre',)
+    raw_id_fields = ('producto', 'ajuste', 'user')
@@ -7,3 +7,7 @@ class CoreConfig(AppConfig):
     
     def ready(self):
         import core.signals  # Importar las señales cuando la app esté lista
+        from . import cambios, codigos, imagenes
+        cambios.conectar()
+        codigos.conectar()
+        imagenes.conectar()
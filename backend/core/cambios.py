@@ -0,0 +1,211 @@
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import CambioCatalogo
+
+
+# ==========================================================
+# SINCRONIZACIÓN INCREMENTAL DEL CATÁLOGO (?since=)
+# ==========================================================
+# Cada alta/modificación/baja de una entidad del catálogo agrega una fila a
+# CambioCatalogo; su id es la versión. Los guardados por instancia se registran
+# con señales y las escrituras masivas que no las disparan llaman a registrar()
+# (recalcular_stock_productos para productos, kardex.registrar para lotes).
+#
+# El cliente carga el listado completo una vez (la versión viene en el header
+# X-Catalogo-Version) y después consulta ?since=<versión>: recibe sólo lo que
+# cambió y los ids borrados. Sin cambios, la consulta es un único range scan
+# sobre el índice (entidad, id) y la respuesta es mínima.
+#
+# Las filas se insertan después del commit de la transacción que hizo el
+# cambio, en su propio INSERT: así las versiones siguen el orden de los commits
+# y una transacción larga (importación de facturas, bloques de ventas, conteos)
+# no deja una versión baja sin confirmar detrás de la que ya leyó un cliente.
+# Si el proceso muere entre el commit y ese INSERT el cambio no se anota; el
+# cliente lo recupera con la próxima recarga completa.
+
+ENTIDADES = {
+    'producto': 'core.Producto',
+    'lote': 'lotes.Lote',
+    'cliente': 'clientes.Clientes',
+    'proveedor': 'proveedores.Proveedores',
+    'marca': 'marcas.Marca',
+    'categoria': 'productos.Categoria',
+}
+# Marca de compactación: objeto_id = última versión de baja que se purgó
+PURGA = '_purga'
+LIMITE_CAMBIOS = 5000
+HEADER_VERSION = 'X-Catalogo-Version'
+
+# Cachés en memoria del mismo proceso (p.ej. core.codigos) que se invalidan con cada cambio
+_oyentes = []
+
+
+def escuchar(oyente):
+    """oyente(entidad, ids) se llama después del commit de cada registrar()."""
+    if oyente not in _oyentes:
+        _oyentes.append(oyente)
+
+
+def registrar(entidad, ids, eliminado=False):
+    """
+    Anota un cambio por id en un único INSERT, después del commit de la
+    transacción en curso (en el acto si no hay ninguna). Lo registrado dentro de
+    un savepoint que se deshace no se anota.
+    """
+    ids = sorted(set(ids))
+    if ids:
+        transaction.on_commit(lambda: _escribir(entidad, ids, eliminado), robust=True)
+
+
+def _escribir(entidad, ids, eliminado):
+    CambioCatalogo.objects.bulk_create([
+        CambioCatalogo(entidad=entidad, objeto_id=objeto_id, eliminado=eliminado) for objeto_id in ids
+    ])
+    for oyente in _oyentes:
+        oyente(entidad, ids)
+
+
+def conectar():
+    """Conecta las señales de guardado y borrado de cada entidad (desde CoreConfig.ready)."""
+    for entidad, etiqueta in ENTIDADES.items():
+        modelo = apps.get_model(etiqueta)
+
+        def al_guardar(sender, instance, entidad=entidad, **kwargs):
+            registrar(entidad, [instance.pk])
+
+        def al_borrar(sender, instance, entidad=entidad, **kwargs):
+            registrar(entidad, [instance.pk], eliminado=True)
+
+        post_save.connect(al_guardar, sender=modelo, weak=False, dispatch_uid=f'cambios-{entidad}-guardar')
+        post_delete.connect(al_borrar, sender=modelo, weak=False, dispatch_uid=f'cambios-{entidad}-borrar')
+
+
+def _corte():
+    return timezone.now() - timedelta(seconds=settings.CATALOGO_MARGEN_SEGUNDOS)
+
+
+def version_actual():
+    """Última versión ya asentada (más vieja que el margen): recorre el PK desde el final."""
+    return (CambioCatalogo.objects
+            .filter(fecha__lt=_corte())
+            .order_by('-id')
+            .values_list('id', flat=True)
+            .first()) or 0
+
+
+class Delta(NamedTuple):
+    version: int
+    objetos: dict      # objeto_id -> eliminado (último estado)
+    hay_mas: bool
+    reinicio: bool
+
+
+def cambios_desde(entidad, since, limite=LIMITE_CAMBIOS):
+    """
+    Cambios de `entidad` con versión > since, en orden. Se corta en el primer
+    cambio más nuevo que el margen (llega en la próxima consulta) o al llegar a
+    `limite` (hay_mas: el cliente vuelve a consultar con la versión devuelta).
+    reinicio indica que se purgaron bajas posteriores a `since`: hay que recargar todo.
+    """
+    corte = _corte()
+    filas = (CambioCatalogo.objects
+             .filter(entidad__in=[entidad, PURGA], id__gt=since)
+             .order_by('id')
+             .values_list('id', 'entidad', 'objeto_id', 'eliminado', 'fecha')[:limite + 1])
+    version, objetos, hay_mas = since, {}, False
+    for indice, (version_fila, entidad_fila, objeto_id, eliminado, fecha) in enumerate(filas):
+        if entidad_fila == PURGA:
+            if objeto_id > since:
+                return Delta(version_actual(), {}, False, True)
+            continue
+        if fecha >= corte:
+            break
+        if indice == limite:
+            hay_mas = True
+            break
+        objetos[objeto_id] = eliminado
+        version = version_fila
+    return Delta(version, objetos, hay_mas, False)
+
+
+def compactar(tamano=10000):
+    """
+    Borra los cambios que ya tienen uno posterior del mismo objeto y las bajas
+    más viejas que CATALOGO_RETENCION_DIAS (dejando una marca PURGA para que los
+    clientes más atrasados sepan que deben recargar). Devuelve (reemplazados, bajas).
+    """
+    maximo = CambioCatalogo.objects.aggregate(maximo=Max('id'))['maximo']
+    if maximo is None:
+        return 0, 0
+    posterior = CambioCatalogo.objects.filter(
+        entidad=OuterRef('entidad'), objeto_id=OuterRef('objeto_id'), id__gt=OuterRef('id'),
+    )
+    reemplazados = 0
+    for desde in range(0, maximo + 1, tamano):
+        # MySQL no permite borrar con una subconsulta sobre la misma tabla: primero los ids
+        ids = list(
+            CambioCatalogo.objects
+            .filter(id__gte=desde, id__lt=desde + tamano)
+            .filter(Exists(posterior))
+            .values_list('id', flat=True)
+        )
+        if ids:
+            reemplazados += CambioCatalogo.objects.filter(id__in=ids).delete()[0]
+
+    limite = timezone.now() - timedelta(days=settings.CATALOGO_RETENCION_DIAS)
+    viejas = CambioCatalogo.objects.filter(eliminado=True, fecha__lt=limite).exclude(entidad=PURGA)
+    ultima = viejas.aggregate(ultima=Max('id'))['ultima']
+    bajas = 0
+    if ultima is not None:
+        bajas = viejas.filter(id__lte=ultima).delete()[0]
+        registrar(PURGA, [ultima])
+        CambioCatalogo.objects.filter(entidad=PURGA, objeto_id__lt=ultima).delete()
+    return reemplazados, bajas
+
+
+class SincronizacionMixin:
+    """
+    Para ViewSets del catálogo: el listado completo informa la versión en el
+    header X-Catalogo-Version y ?since=<versión> responde
+    {version, cambios, eliminados, hay_mas, reinicio}.
+    """
+    entidad_cambios = None
+
+    def list(self, request, *args, **kwargs):
+        since = request.query_params.get('since')
+        if since is None:
+            version = version_actual()
+            response = super().list(request, *args, **kwargs)
+            response[HEADER_VERSION] = str(version)
+            return response
+        try:
+            since = int(since)
+            if since < 0:
+                raise ValueError
+        except ValueError:
+            return Response({"detail": "since debe ser un número de versión"}, status=status.HTTP_400_BAD_REQUEST)
+
+        delta = cambios_desde(self.entidad_cambios, since)
+        if delta.reinicio:
+            return Response({'version': delta.version, 'cambios': [], 'eliminados': [], 'hay_mas': False, 'reinicio': True})
+        vivos = [objeto_id for objeto_id, eliminado in delta.objetos.items() if not eliminado]
+        # Sin filtros ni búsqueda: el delta es del catálogo completo
+        objetos = list(self.get_queryset().filter(pk__in=vivos)) if vivos else []
+        presentes = {objeto.pk for objeto in objetos}
+        return Response({
+            'version': delta.version,
+            'cambios': self.get_serializer(objetos, many=True).data,
+            'eliminados': sorted(set(delta.objetos) - presentes),
+            'hay_mas': delta.hay_mas,
+            'reinicio': False,
+        })
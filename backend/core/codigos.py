@@ -0,0 +1,265 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from . import cambios
+from .gs1 import interpretar
+from .models import CambioCatalogo, CodigoBarras
+
+
+# ==========================================================
+# ESCANEO EN EL POS: CÓDIGO -> PRODUCTO, PRECIO Y LOTES VENDIBLES
+# ==========================================================
+# Cada proceso guarda en un LRU los códigos más escaneados con su producto,
+# precio y lotes vendibles (FEFO). Un acierto no consulta la base; un fallo
+# son dos consultas (código por índice único + lotes por lote_vendible_idx)
+# sin importar cuántos códigos se resuelvan juntos.
+#
+# Invalidación: todo cambio de producto o lote pasa por cambios.registrar()
+# (señales y escrituras masivas). En el mismo proceso invalida apenas hace
+# commit; los cambios de otros procesos se leen de CambioCatalogo cada
+# CODIGOS_VERIFICAR_SEGUNDOS. Además ninguna entrada vive más de
+# CODIGOS_CACHE_SEGUNDOS. Las reservas de stock no se guardan: cambian con
+# cada escaneo y las valida la propia reserva.
+
+# Tope de cambios leídos por verificación; más que eso vacía el caché entero
+MAX_CAMBIOS_VERIFICACION = 1000
+
+_lock = threading.Lock()
+_entradas = OrderedDict()         # codigo -> Entrada
+_por_producto = {}                # producto_id -> {codigos}
+_por_lote = {}                    # lote_id -> {codigos}
+# generacion cambia con cada invalidación: una entrada armada mientras tanto no se guarda
+_estado = {'version': None, 'verificado': 0.0, 'generacion': 0}
+
+
+class Entrada:
+    __slots__ = ('creada', 'producto', 'lote', 'lotes')
+
+    def __init__(self, producto, lote, lotes):
+        self.creada = time.monotonic()
+        self.producto = producto    # {'id', 'nombre', 'precio', 'stock'}
+        self.lote = lote            # lote propio del código (GS1 por lote) o None
+        self.lotes = lotes          # lotes vendibles en orden FEFO
+
+
+def _lote_json(lote):
+    return {
+        'id': lote.id,
+        'numero_lote': lote.numero_lote,
+        'cantidad_disponible': lote.cantidad_disponible,
+        'fecha_vencimiento': lote.fecha_vencimiento,
+        'activo': lote.activo,
+    }
+
+
+def _indexar(codigo, entrada):
+    _por_producto.setdefault(entrada.producto['id'], set()).add(codigo)
+    for lote in entrada.lotes + ([entrada.lote] if entrada.lote else []):
+        _por_lote.setdefault(lote['id'], set()).add(codigo)
+
+
+def _quitar(codigo):
+    entrada = _entradas.pop(codigo, None)
+    if entrada is None:
+        return
+    codigos = _por_producto.get(entrada.producto['id'])
+    if codigos is not None:
+        codigos.discard(codigo)
+        if not codigos:
+            del _por_producto[entrada.producto['id']]
+    for lote in entrada.lotes + ([entrada.lote] if entrada.lote else []):
+        codigos = _por_lote.get(lote['id'])
+        if codigos is not None:
+            codigos.discard(codigo)
+            if not codigos:
+                del _por_lote[lote['id']]
+
+
+def limpiar():
+    with _lock:
+        _estado['generacion'] += 1
+        _entradas.clear()
+        _por_producto.clear()
+        _por_lote.clear()
+
+
+def invalidar(entidad, ids):
+    """Descarta las entradas de los productos o lotes indicados."""
+    indice = _por_producto if entidad == 'producto' else _por_lote if entidad == 'lote' else None
+    if indice is None or not ids:
+        return
+    with _lock:
+        _estado['generacion'] += 1
+        for objeto_id in ids:
+            for codigo in list(indice.get(objeto_id, ())):
+                _quitar(codigo)
+
+
+def _verificar_otros_procesos():
+    """Aplica los cambios de producto/lote registrados desde la última verificación."""
+    intervalo = getattr(settings, 'CODIGOS_VERIFICAR_SEGUNDOS', 2)
+    ahora = time.monotonic()
+    with _lock:
+        if ahora - _estado['verificado'] < intervalo:
+            return
+        _estado['verificado'] = ahora
+        version = _estado['version']
+    if version is None:
+        version = CambioCatalogo.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        with _lock:
+            _estado['version'] = version
+        return
+
+    filas = list(
+        CambioCatalogo.objects
+        .filter(entidad__in=['producto', 'lote'], id__gt=version)
+        .order_by('id')
+        .values_list('id', 'entidad', 'objeto_id', 'fecha')[:MAX_CAMBIOS_VERIFICACION + 1]
+    )
+    if len(filas) > MAX_CAMBIOS_VERIFICACION:
+        limpiar()
+        with _lock:
+            _estado['version'] = filas[-1][0]
+        return
+    # Una transacción más lenta puede asentar una versión menor después: la versión sólo
+    # avanza hasta los cambios fuera del margen y los más nuevos se vuelven a leer
+    corte = timezone.now() - timedelta(seconds=settings.CATALOGO_MARGEN_SEGUNDOS)
+    for entidad in ('producto', 'lote'):
+        invalidar(entidad, {objeto_id for _, e, objeto_id, _ in filas if e == entidad})
+    asentadas = [version_fila for version_fila, _, _, fecha in filas if fecha < corte]
+    if asentadas:
+        with _lock:
+            _estado['version'] = max(_estado['version'] or 0, asentadas[-1])
+
+
+def _construir(codigos):
+    """Arma las entradas de `codigos` (normalizados) con dos consultas. Devuelve {codigo: Entrada}."""
+    from lotes.asignacion import lotes_vendibles
+
+    filas = list(
+        CodigoBarras.objects
+        .filter(codigo__in=codigos)
+        .select_related('producto', 'lote')
+        .only('codigo', 'producto__id', 'producto__nombre', 'producto__precio', 'producto__cantidad',
+              'lote__id', 'lote__numero_lote', 'lote__cantidad_disponible', 'lote__fecha_vencimiento', 'lote__activo')
+    )
+    lotes = lotes_vendibles({fila.producto_id for fila in filas})
+    entradas = {}
+    for fila in filas:
+        producto = fila.producto
+        entradas[fila.codigo] = Entrada(
+            {'id': producto.id, 'nombre': producto.nombre, 'precio': producto.precio, 'stock': producto.cantidad},
+            _lote_json(fila.lote) if fila.lote_id else None,
+            [_lote_json(lote) for lote in lotes[producto.id]],
+        )
+    return entradas
+
+
+def _obtener(codigos):
+    """{codigo: Entrada} para los códigos existentes, desde el caché o la base."""
+    _verificar_otros_procesos()
+    vigencia = getattr(settings, 'CODIGOS_CACHE_SEGUNDOS', 60)
+    tamano = getattr(settings, 'CODIGOS_CACHE_TAMANO', 2000)
+    ahora = time.monotonic()
+    encontradas, faltantes = {}, []
+    with _lock:
+        generacion = _estado['generacion']
+        for codigo in codigos:
+            entrada = _entradas.get(codigo)
+            if entrada is not None and ahora - entrada.creada < vigencia:
+                _entradas.move_to_end(codigo)
+                encontradas[codigo] = entrada
+            else:
+                faltantes.append(codigo)
+    if faltantes:
+        nuevas = _construir(faltantes)
+        with _lock:
+            if generacion == _estado['generacion']:
+                for codigo, entrada in nuevas.items():
+                    _quitar(codigo)
+                    _entradas[codigo] = entrada
+                    _indexar(codigo, entrada)
+            while len(_entradas) > tamano:
+                _quitar(next(iter(_entradas)))
+        encontradas.update(nuevas)
+    return encontradas
+
+
+def _resultado(texto, lectura, entrada, hoy):
+    # Un lote puede vencer mientras su entrada sigue en el caché
+    lotes = [
+        lote for lote in entrada.lotes
+        if lote['fecha_vencimiento'] is None or lote['fecha_vencimiento'] >= hoy
+    ]
+    lote = entrada.lote
+    if lote is None and lectura.numero_lote:
+        # GS1 con (10): el lote vendible con ese número (y vencimiento, si vino)
+        lote = next((
+            l for l in lotes
+            if l['numero_lote'] == lectura.numero_lote
+            and (lectura.vencimiento is None or l['fecha_vencimiento'] in (None, lectura.vencimiento))
+        ), None)
+    return {
+        'lectura': texto,
+        'codigo': lectura.codigo,
+        'producto': dict(entrada.producto),
+        'lote': dict(lote) if lote else None,
+        'lote_vendible': None if lote is None else any(l['id'] == lote['id'] for l in lotes),
+        'numero_lote': lectura.numero_lote,
+        'vencimiento': lectura.vencimiento,
+        'lotes': [dict(l) for l in lotes],
+    }
+
+
+def resolver_varios(lecturas):
+    """
+    Resuelve varias lecturas del escáner (EAN/UPC, SKU o GS1). Devuelve
+    (resultados en el orden recibido, lecturas sin producto).
+    """
+    interpretadas = [(texto, interpretar(texto)) for texto in lecturas]
+    entradas = _obtener(list(dict.fromkeys(lectura.codigo for _, lectura in interpretadas if lectura.codigo)))
+    hoy = timezone.localdate()
+    resultados, no_encontrados = [], []
+    for texto, lectura in interpretadas:
+        entrada = entradas.get(lectura.codigo)
+        if entrada is None:
+            no_encontrados.append(texto)
+        else:
+            resultados.append(_resultado(texto, lectura, entrada, hoy))
+    return resultados, no_encontrados
+
+
+def resolver(lectura):
+    """Resultado de una lectura o None si el código no está registrado."""
+    resultados, _ = resolver_varios([lectura])
+    return resultados[0] if resultados else None
+
+
+def conectar():
+    """Invalida con cada cambio del catálogo y registra los cambios de códigos (desde CoreConfig.ready)."""
+    cambios.escuchar(invalidar)
+
+    def codigo_por_guardar(sender, instance, **kwargs):
+        # Si el código pasa a otro producto, el anterior también cambia
+        instance._producto_anterior = None
+        if instance.pk:
+            instance._producto_anterior = (
+                sender.objects.filter(pk=instance.pk).values_list('producto_id', flat=True).first()
+            )
+
+    def codigo_cambiado(sender, instance, **kwargs):
+        # El código cuelga del producto: para los demás procesos y para ?since= es un cambio del producto
+        anterior = getattr(instance, '_producto_anterior', None)
+        cambios.registrar('producto', [instance.producto_id] + ([anterior] if anterior else []))
+
+    modelo = apps.get_model('core.CodigoBarras')
+    pre_save.connect(codigo_por_guardar, sender=modelo, weak=False, dispatch_uid='codigos-por-guardar')
+    post_save.connect(codigo_cambiado, sender=modelo, weak=False, dispatch_uid='codigos-guardar')
+    post_delete.connect(codigo_cambiado, sender=modelo, weak=False, dispatch_uid='codigos-borrar')
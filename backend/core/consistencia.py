@@ -0,0 +1,262 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Max, Min, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Abs, Coalesce, Greatest
+
+from core import cambios
+from core.models import EmpleadoProfile, Producto
+from lotes.models import Lote, recalcular_stock_productos
+from movimientos_caja.models import Caja
+from ventas.models import Venta
+
+
+# ==========================================================
+# VERIFICACIÓN DE CAMPOS DESNORMALIZADOS
+# ==========================================================
+# Cada verificación recorre su tabla en rangos de id (un bloque = una consulta
+# agrupada, sin bloqueos largos) y devuelve las filas que no cumplen el
+# invariante. reparar() corrige un bloque con UPDATEs agrupados en una
+# transacción corta. Ver `manage.py verificar_consistencia`.
+
+DINERO = DecimalField(max_digits=14, decimal_places=2)
+
+
+class Verificacion:
+    nombre = None
+    modelo = None
+    descripcion = ''
+
+    def queryset(self):
+        return self.modelo.objects.all()
+
+    def rango_ids(self):
+        limites = self.queryset().aggregate(minimo=Min('id'), maximo=Max('id'))
+        return limites['minimo'], limites['maximo']
+
+    def bloques(self, tamano, particion=0, particiones=1):
+        """Rangos [desde, hasta) de `tamano` ids; con particiones sólo los que tocan a esta."""
+        minimo, maximo = self.rango_ids()
+        if minimo is None:
+            return
+        for indice, desde in enumerate(range(minimo, maximo + 1, tamano)):
+            if indice % particiones == particion:
+                yield desde, desde + tamano
+
+    def inconsistencias(self, desde, hasta):
+        raise NotImplementedError
+
+    def reparar(self, filas):
+        raise NotImplementedError
+
+
+class StockProducto(Verificacion):
+    nombre = 'stock_producto'
+    modelo = Producto
+    descripcion = 'Producto.cantidad = suma de Lote.cantidad_disponible'
+
+    def inconsistencias(self, desde, hasta):
+        stock = (Lote.objects.filter(producto=OuterRef('pk')).order_by()
+                 .values('producto').annotate(total=Sum('cantidad_disponible')).values('total'))
+        return list(
+            Producto.objects.filter(id__gte=desde, id__lt=hasta)
+            .annotate(esperado=Coalesce(Subquery(stock), 0))
+            .exclude(cantidad=F('esperado'))
+            .values('id', 'cantidad', 'esperado')
+        )
+
+    def reparar(self, filas):
+        recalcular_stock_productos(fila['id'] for fila in filas)
+        return len(filas)
+
+
+class LoteActivo(Verificacion):
+    nombre = 'lote_activo'
+    modelo = Lote
+    descripcion = 'Lote.activo sólo si le queda cantidad_disponible'
+
+    def inconsistencias(self, desde, hasta):
+        return list(
+            Lote.objects.filter(id__gte=desde, id__lt=hasta)
+            .filter(Q(activo=True, cantidad_disponible=0) | Q(activo=False, cantidad_disponible__gt=0))
+            .values('id', 'activo', 'cantidad_disponible')
+        )
+
+    def reparar(self, filas):
+        ids = [fila['id'] for fila in filas]
+        with transaction.atomic():
+            Lote.objects.filter(id__in=ids).update(
+                activo=Case(When(cantidad_disponible__gt=0, then=Value(True)), default=Value(False))
+            )
+            cambios.registrar('lote', ids)
+        return len(ids)
+
+
+class TotalesVenta(Verificacion):
+    nombre = 'totales_venta'
+    modelo = Venta
+    descripcion = 'Venta.monto_total, bruto, descuento_total, items_count y unidades contra sus DetalleVenta'
+
+    def inconsistencias(self, desde, hasta):
+        ventas = (
+            Venta.objects.filter(id__gte=desde, id__lt=hasta)
+            .annotate(
+                suma_subtotal=Coalesce(Sum('detalles__subtotal'), Value(Decimal('0')), output_field=DINERO),
+                suma_bruto=Coalesce(
+                    Sum(F('detalles__precio_unitario') * F('detalles__cantidad'), output_field=DINERO),
+                    Value(Decimal('0')), output_field=DINERO,
+                ),
+                suma_lineas=Count('detalles'),
+                suma_unidades=Coalesce(Sum('detalles__cantidad'), 0),
+            )
+            # Subtotales con descuentos prorrateados: un centavo de margen por línea
+            .annotate(
+                dif_total=Abs(F('monto_total') - F('suma_subtotal')),
+                dif_bruto=Abs(F('bruto') - F('suma_bruto')),
+                tolerancia=Greatest(F('suma_lineas'), 1) * Value(Decimal('0.01'), output_field=DINERO),
+            )
+            .filter(
+                Q(suma_lineas__gt=0) & (
+                    Q(dif_total__gt=F('tolerancia')) | Q(dif_bruto__gt=F('tolerancia'))
+                    | ~Q(items_count=F('suma_lineas')) | ~Q(unidades=F('suma_unidades'))
+                )
+                | Q(suma_lineas=0, monto_total__gt=0)
+            )
+        )
+        return [
+            {
+                'id': v['id'],
+                'monto_total': v['monto_total'], 'esperado_monto_total': v['suma_subtotal'],
+                'bruto': v['bruto'], 'esperado_bruto': v['suma_bruto'],
+                'items_count': v['items_count'], 'esperado_items_count': v['suma_lineas'],
+                'unidades': v['unidades'], 'esperado_unidades': v['suma_unidades'],
+                'sin_detalles': v['suma_lineas'] == 0,
+            }
+            for v in ventas.values(
+                'id', 'monto_total', 'bruto', 'items_count', 'unidades',
+                'suma_subtotal', 'suma_bruto', 'suma_lineas', 'suma_unidades',
+            )
+        ]
+
+    def reparar(self, filas):
+        # Una venta sin detalles no tiene de dónde reconstruirse: sólo se informa
+        reparables = [fila for fila in filas if not fila['sin_detalles']]
+        ventas = []
+        for fila in reparables:
+            venta = Venta(id=fila['id'])
+            venta.monto_total = fila['esperado_monto_total']
+            venta.bruto = fila['esperado_bruto']
+            venta.descuento_total = fila['esperado_bruto'] - fila['esperado_monto_total']
+            venta.items_count = fila['esperado_items_count']
+            venta.unidades = fila['esperado_unidades']
+            ventas.append(venta)
+        with transaction.atomic():
+            Venta.objects.bulk_update(ventas, ['monto_total', 'bruto', 'descuento_total', 'items_count', 'unidades'])
+        return len(ventas)
+
+
+def _efecto(prefijo=''):
+    """Efecto con signo de un movimiento de caja sobre el saldo (igual que Caja._apply_effect)."""
+    return [
+        When(**{f'{prefijo}tipo': 'INGRESO'}, then=F(f'{prefijo}monto')),
+        When(**{f'{prefijo}tipo': 'EGRESO'}, then=-F(f'{prefijo}monto')),
+        When(**{f'{prefijo}tipo': 'AJUSTE', f'{prefijo}ajuste_sign': 'IN'}, then=F(f'{prefijo}monto')),
+        When(**{f'{prefijo}tipo': 'AJUSTE', f'{prefijo}ajuste_sign': 'OUT'}, then=-F(f'{prefijo}monto')),
+    ]
+
+
+class CierreCaja(Verificacion):
+    nombre = 'cierre_caja'
+    modelo = Caja
+    descripcion = 'Caja.closing_system_amount = monto_inicial + movimientos (cajas cerradas)'
+
+    def queryset(self):
+        return Caja.objects.filter(estado='CERRADA')
+
+    def inconsistencias(self, desde, hasta):
+        # Un REVERSO anula el efecto del movimiento original; el ajuste de cierre no suma al saldo del sistema
+        efecto = Case(
+            *_efecto('movimientos__'),
+            *[
+                When(Q(movimientos__tipo='REVERSO') & cuando.condition, then=-cuando.result)
+                for cuando in _efecto('movimientos__reversed_of__')
+            ],
+            default=Value(Decimal('0')),
+            output_field=DINERO,
+        )
+        cajas = (
+            self.queryset().filter(id__gte=desde, id__lt=hasta)
+            .annotate(movido=Coalesce(
+                Sum(efecto, filter=~Q(movimientos__origen='CIERRE')),
+                Value(Decimal('0')), output_field=DINERO,
+            ))
+            .annotate(esperado=F('monto_inicial') + F('movido'))
+            .filter(Q(closing_system_amount__isnull=True) | ~Q(closing_system_amount=F('esperado')))
+            .values('id', 'closing_system_amount', 'closing_counted_amount', 'esperado')
+        )
+        return list(cajas)
+
+    def reparar(self, filas):
+        cajas = []
+        for fila in filas:
+            caja = Caja(id=fila['id'])
+            caja.closing_system_amount = fila['esperado']
+            contado = fila['closing_counted_amount']
+            caja.difference_amount = contado - fila['esperado'] if contado is not None else None
+            cajas.append(caja)
+        with transaction.atomic():
+            Caja.objects.bulk_update(cajas, ['closing_system_amount', 'difference_amount'])
+        return len(cajas)
+
+
+class EmpleadoActivo(Verificacion):
+    nombre = 'empleado_activo'
+    modelo = EmpleadoProfile
+    descripcion = 'User.is_active = EmpleadoProfile.activo'
+
+    def inconsistencias(self, desde, hasta):
+        return list(
+            EmpleadoProfile.objects.filter(id__gte=desde, id__lt=hasta)
+            .exclude(user__is_active=F('activo'))
+            .values('id', 'user_id', 'user__username', 'activo', 'user__is_active')
+        )
+
+    def reparar(self, filas):
+        activar = [fila['user_id'] for fila in filas if fila['activo']]
+        desactivar = [fila['user_id'] for fila in filas if not fila['activo']]
+        with transaction.atomic():
+            User.objects.filter(id__in=activar).update(is_active=True)
+            User.objects.filter(id__in=desactivar).update(is_active=False)
+        return len(filas)
+
+
+VERIFICACIONES = {
+    v.nombre: v
+    for v in (StockProducto(), LoteActivo(), TotalesVenta(), CierreCaja(), EmpleadoActivo())
+}
+
+
+def verificar(nombre, tamano=5000, particion=0, particiones=1, reparar=False, muestras=100):
+    """
+    Corre una verificación bloque por bloque y devuelve
+    {descripcion, bloques, inconsistencias, reparadas, muestras}.
+    """
+    verificacion = VERIFICACIONES[nombre]
+    resultado = {
+        'descripcion': verificacion.descripcion,
+        'bloques': 0,
+        'inconsistencias': 0,
+        'reparadas': 0 if reparar else None,
+        'muestras': [],
+    }
+    for desde, hasta in verificacion.bloques(tamano, particion, particiones):
+        resultado['bloques'] += 1
+        filas = verificacion.inconsistencias(desde, hasta)
+        if not filas:
+            continue
+        resultado['inconsistencias'] += len(filas)
+        resultado['muestras'].extend(filas[:max(muestras - len(resultado['muestras']), 0)])
+        if reparar:
+            resultado['reparadas'] += verificacion.reparar(filas)
+    return resultado
@@ -0,0 +1,95 @@
+import calendar
+import re
+from datetime import date
+from typing import NamedTuple, Optional
+
+
+# ==========================================================
+# CÓDIGOS DE BARRAS (EAN/UPC y GS1-128 / DataMatrix)
+# ==========================================================
+# Los EAN-8, UPC-A, EAN-13 y GTIN-14 se guardan como GTIN-14 (ceros a la
+# izquierda), así el mismo artículo leído como UPC o como EAN da la misma clave.
+# Los GS1 con identificadores de aplicación (AI) traen además lote y
+# vencimiento: (01) GTIN, (10) lote, (17) vencimiento.
+
+LONGITUDES_GTIN = (8, 12, 13, 14)
+# Prefijos de simbología que agregan algunos lectores (]C1 = GS1-128, ]d2 = DataMatrix...)
+_SIMBOLOGIA = re.compile(r'^\][A-Za-z][0-9A-Za-z]')
+_SEPARADOR = '\x1d'  # FNC1 / GS
+# AI de largo fijo que interesan (el resto de la lectura se ignora)
+_FIJOS = {'00': 18, '01': 14, '02': 14, '11': 6, '12': 6, '13': 6, '15': 6, '16': 6, '17': 6, '20': 2}
+# AI de largo variable: terminan en GS o al final
+_VARIABLES = {'10': 20, '21': 20, '22': 20, '240': 30, '241': 30}
+_ENTRE_PARENTESIS = re.compile(r'\((\d{2,4})\)([^(]*)')
+
+
+class Lectura(NamedTuple):
+    codigo: str                       # Clave normalizada para buscar en CodigoBarras
+    numero_lote: Optional[str] = None
+    vencimiento: Optional[date] = None
+
+
+def normalizar_codigo(codigo):
+    """GTIN numérico -> 14 dígitos; cualquier otro código (SKU interno) sin espacios y en mayúsculas."""
+    codigo = str(codigo or '').strip()
+    if codigo.isdigit() and len(codigo) in LONGITUDES_GTIN:
+        return codigo.zfill(14)
+    return codigo.upper()
+
+
+def _fecha(aammdd):
+    """AAMMDD de GS1; DD=00 significa el último día del mes."""
+    try:
+        anio, mes, dia = 2000 + int(aammdd[:2]), int(aammdd[2:4]), int(aammdd[4:6])
+        if dia == 0:
+            dia = calendar.monthrange(anio, mes)[1]
+        return date(anio, mes, dia)
+    except (ValueError, IndexError):
+        return None
+
+
+def _elementos_crudos(texto):
+    """Recorre una lectura GS1 sin paréntesis (AI pegados, variables cortados por GS)."""
+    i = 0
+    while i < len(texto):
+        if texto[i] == _SEPARADOR:
+            i += 1
+            continue
+        ai = next((texto[i:i + n] for n in (2, 3) if texto[i:i + n] in _FIJOS or texto[i:i + n] in _VARIABLES), None)
+        if ai is None:
+            return  # AI no reconocido: no se puede seguir sin conocer su largo
+        i += len(ai)
+        if ai in _FIJOS:
+            valor = texto[i:i + _FIJOS[ai]]
+            i += _FIJOS[ai]
+        else:
+            fin = texto.find(_SEPARADOR, i)
+            fin = len(texto) if fin < 0 else fin
+            valor = texto[i:min(fin, i + _VARIABLES[ai])]
+            i = fin
+        yield ai, valor
+
+
+def interpretar(texto):
+    """
+    Interpreta una lectura del escáner. Devuelve Lectura(codigo, numero_lote, vencimiento):
+    para un GS1 con (01) el código es el GTIN y se agregan (10) lote y (17) vencimiento;
+    para cualquier otra lectura, el código normalizado.
+    """
+    texto = _SIMBOLOGIA.sub('', str(texto or '').strip())
+    if texto.startswith('('):
+        elementos = [(ai, valor.strip(_SEPARADOR)) for ai, valor in _ENTRE_PARENTESIS.findall(texto)]
+    elif len(texto) > 14 and texto[:2] in ('01', '02') and texto[2:16].isdigit():
+        elementos = list(_elementos_crudos(texto))
+    else:
+        return Lectura(normalizar_codigo(texto))
+
+    datos = dict(elementos)
+    gtin = datos.get('01') or datos.get('02')
+    if not gtin:
+        return Lectura(normalizar_codigo(texto))
+    return Lectura(
+        normalizar_codigo(gtin),
+        datos.get('10') or None,
+        _fecha(datos['17']) if '17' in datos else None,
+    )
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+
+# ==========================================================
+# IDEMPOTENCIA DE ESCRITURAS (Idempotency-Key)
+# ==========================================================
+# El cliente manda la misma clave en cada reintento (header Idempotency-Key o,
+# por compatibilidad, idempotency_key / idempotencyKey en el cuerpo).
+#
+# 1. Antes de ejecutar la vista se reclama la clave insertando la fila
+#    (user, endpoint, clave) en estado EN_CURSO, en autocommit: el UNIQUE hace
+#    que sólo una solicitud gane, sin tomar ningún lock de la vista.
+# 2. Los duplicados concurrentes esperan hasta IDEMPOTENCY_ESPERA_SEGUNDOS a que
+#    la original termine y devuelven su respuesta; si no termina, 409.
+# 3. Una respuesta 2xx se guarda y se repite tal cual hasta que la clave expira.
+#    Cualquier otro resultado libera la clave para que el cliente pueda corregir y reintentar.
+#
+# El decorador debe quedar por fuera de transaction.atomic: el reclamo tiene que
+# ser visible para las demás conexiones antes de que la vista bloquee filas.
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+CAMPOS_CUERPO = ('idempotency_key', 'idempotencyKey')
+LARGO_MAXIMO = 100
+INTERVALO_ESPERA = 0.1
+
+
+def obtener_clave(request):
+    clave = request.META.get(HEADER)
+    if not clave and hasattr(request.data, 'get'):
+        for campo in CAMPOS_CUERPO:
+            clave = request.data.get(campo)
+            if clave:
+                break
+    clave = str(clave).strip() if clave else ''
+    return clave or None
+
+
+def calcular_huella(request):
+    try:
+        cuerpo = json.dumps(request.data, sort_keys=True, cls=JSONEncoder)
+    except (TypeError, ValueError):
+        # multipart con archivos: no se compara el cuerpo
+        return ''
+    return hashlib.sha256(cuerpo.encode()).hexdigest()
+
+
+def _turno(user, endpoint, clave, huella):
+    """
+    Devuelve (registro, propio). `propio` indica que esta solicitud reclamó la
+    clave y debe ejecutar la vista; si no, `registro` es la respuesta ya guardada
+    o None cuando la original sigue en curso pasado el tiempo de espera.
+    """
+    limite = time.monotonic() + settings.IDEMPOTENCY_ESPERA_SEGUNDOS
+    while True:
+        ahora = timezone.now()
+        try:
+            with transaction.atomic():
+                registro = IdempotencyKey.objects.create(
+                    user=user, endpoint=endpoint, clave=clave, huella=huella,
+                    expira=ahora + timedelta(hours=settings.IDEMPOTENCY_TTL_HORAS),
+                )
+            return registro, True
+        except IntegrityError:
+            pass
+
+        registro = IdempotencyKey.objects.filter(user=user, endpoint=endpoint, clave=clave).first()
+        if registro is None:
+            # La original falló y liberó la clave: volver a reclamar
+            continue
+        if registro.expira <= ahora:
+            IdempotencyKey.objects.filter(pk=registro.pk, expira__lte=ahora).delete()
+            continue
+        if registro.estado == 'COMPLETADA':
+            return registro, False
+
+        abandono = ahora - timedelta(seconds=settings.IDEMPOTENCY_ABANDONO_SEGUNDOS)
+        if registro.actualizado < abandono:
+            # El proceso que la reclamó no terminó nunca: se toma el reclamo
+            tomado = IdempotencyKey.objects.filter(
+                pk=registro.pk, estado='EN_CURSO', actualizado=registro.actualizado,
+            ).update(actualizado=ahora, huella=huella)
+            if tomado:
+                return registro, True
+            continue
+
+        if time.monotonic() >= limite:
+            return None, False
+        time.sleep(INTERVALO_ESPERA)
+
+
+def idempotente(endpoint):
+    """
+    Decorador para métodos de vista (create/post) que aceptan Idempotency-Key.
+    `endpoint` distingue claves iguales usadas en endpoints distintos.
+    Sin clave, la vista se ejecuta como siempre.
+    """
+    def decorador(metodo):
+        @wraps(metodo)
+        def envoltura(self, request, *args, **kwargs):
+            clave = obtener_clave(request)
+            if clave is None:
+                return metodo(self, request, *args, **kwargs)
+            if len(clave) > LARGO_MAXIMO:
+                return Response({"detail": f"Idempotency-Key admite hasta {LARGO_MAXIMO} caracteres"}, status=status.HTTP_400_BAD_REQUEST)
+
+            huella = calcular_huella(request)
+            registro, propio = _turno(request.user, endpoint, clave, huella)
+
+            if not propio:
+                if registro is None:
+                    return Response(
+                        {"detail": "Hay una solicitud en curso con la misma Idempotency-Key, reintente en unos segundos"},
+                        status=status.HTTP_409_CONFLICT,
+                        headers={'Retry-After': '1'},
+                    )
+                if registro.huella and huella and registro.huella != huella:
+                    return Response(
+                        {"detail": "La Idempotency-Key ya se usó con un cuerpo distinto"},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                return Response(registro.respuesta, status=registro.status_code, headers={'Idempotent-Replayed': 'true'})
+
+            try:
+                response = metodo(self, request, *args, **kwargs)
+            except Exception:
+                IdempotencyKey.objects.filter(pk=registro.pk).delete()
+                raise
+            if 200 <= response.status_code < 300:
+                IdempotencyKey.objects.filter(pk=registro.pk).update(
+                    estado='COMPLETADA',
+                    status_code=response.status_code,
+                    respuesta=response.data,
+                    actualizado=timezone.now(),
+                    expira=timezone.now() + timedelta(hours=settings.IDEMPOTENCY_TTL_HORAS),
+                )
+            else:
+                IdempotencyKey.objects.filter(pk=registro.pk).delete()
+            return response
+        return envoltura
+    return decorador
@@ -0,0 +1,204 @@
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+
+from . import cambios
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================================================
+# VARIANTES DE LAS IMÁGENES DE PRODUCTOS
+# ==========================================================
+# Al subir una imagen, después del commit, un pool de hilos del proceso genera
+# miniaturas de IMAGENES_TAMANOS px (lado mayor) en WebP y JPEG y las anota en
+# Producto.imagen_variantes. El request de subida no espera.
+#
+# Los nombres llevan el hash del contenido original
+# (productos/variantes/<id>/<hash>_<tamaño>.<ext>): un archivo nunca cambia y
+# se puede servir con Cache-Control: immutable. Hasta que las variantes están
+# listas (o si el proceso se reinicia antes), el serializer usa la original;
+# `manage.py generar_variantes_imagenes` completa las que falten.
+
+CARPETA = 'productos/variantes'
+FORMATOS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Variante de los listados (imagen_miniatura); se genera aunque no esté en IMAGENES_TAMANOS
+TAMANO_MINIATURA = 256
+
+_lock = threading.Lock()
+_pool = {'executor': None}
+
+
+def _hash(archivo):
+    digest = hashlib.sha256()
+    for parte in archivo.chunks():
+        digest.update(parte)
+    return digest.hexdigest()[:16]
+
+
+def _variantes_vigentes(producto):
+    """Las variantes anotadas si corresponden a la imagen actual; si no, {}."""
+    variantes = producto.imagen_variantes or {}
+    if producto.imagen and variantes.get('origen') == producto.imagen.name and variantes.get('tamanos'):
+        return variantes['tamanos']
+    return {}
+
+
+def _archivos(variantes):
+    return [
+        nombre
+        for tamano in (variantes or {}).get('tamanos', {}).values()
+        for formato, nombre in tamano.items() if formato in FORMATOS
+    ]
+
+
+def borrar_variantes(variantes, storage, conservar=()):
+    for nombre in _archivos(variantes):
+        if nombre not in conservar:
+            try:
+                storage.delete(nombre)
+            except OSError:
+                logger.warning('No se pudo borrar la variante %s', nombre)
+
+
+def _renderizar(imagen, tamano, formato):
+    from PIL import Image
+
+    copia = imagen.copy()
+    # thumbnail conserva la proporción y nunca agranda
+    copia.thumbnail((tamano, tamano), Image.Resampling.LANCZOS)
+    nombre_pil, opciones = FORMATOS[formato]
+    if nombre_pil == 'JPEG' and copia.mode != 'RGB':
+        fondo = Image.new('RGB', copia.size, (255, 255, 255))
+        if copia.mode in ('RGBA', 'LA', 'P'):
+            copia = copia.convert('RGBA')
+            fondo.paste(copia, mask=copia.getchannel('A'))
+        else:
+            fondo.paste(copia.convert('RGB'))
+        copia = fondo
+    elif nombre_pil == 'WEBP' and copia.mode not in ('RGB', 'RGBA'):
+        copia = copia.convert('RGBA' if 'A' in copia.getbands() or copia.mode == 'P' else 'RGB')
+    salida = io.BytesIO()
+    copia.save(salida, nombre_pil, **opciones)
+    return salida.getvalue(), copia.size
+
+
+def generar_variantes(producto_id, forzar=False):
+    """
+    Genera las variantes de la imagen actual del producto. No hace nada si ya
+    están (mismo hash) salvo forzar=True. Devuelve el dict guardado o None.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    Producto = apps.get_model('core', 'Producto')
+    producto = Producto.objects.only('id', 'imagen', 'imagen_variantes').filter(pk=producto_id).first()
+    if producto is None or not producto.imagen:
+        return None
+    origen = producto.imagen.name
+    storage = producto.imagen.storage
+    anteriores = producto.imagen_variantes or {}
+    tamanos = sorted(set(getattr(settings, 'IMAGENES_TAMANOS', (64, 256, 1024))) | {TAMANO_MINIATURA})
+
+    try:
+        with producto.imagen.open('rb') as archivo:
+            digest = _hash(archivo)
+            if (not forzar and anteriores.get('origen') == origen and anteriores.get('hash') == digest
+                    and all(storage.exists(n) for n in _archivos(anteriores))):
+                return anteriores
+            archivo.seek(0)
+            imagen = Image.open(archivo)
+            # JPEG: decodifica directamente a una escala cercana al mayor tamaño pedido
+            imagen.draft('RGB', (tamanos[-1], tamanos[-1]))
+            imagen = ImageOps.exif_transpose(imagen)
+            imagen.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        logger.warning('Imagen inválida del producto %s (%s): %s', producto_id, origen, e)
+        variantes = {'origen': origen, 'error': str(e)[:200]}
+        Producto.objects.filter(pk=producto_id, imagen=origen).update(imagen_variantes=variantes)
+        return variantes
+
+    resultado = {}
+    for tamano in tamanos:
+        resultado[str(tamano)] = {}
+        for formato in FORMATOS:
+            nombre = f'{CARPETA}/{producto_id}/{digest}_{tamano}.{formato}'
+            if storage.exists(nombre) and not forzar:
+                with storage.open(nombre) as archivo_variante, Image.open(archivo_variante) as existente:
+                    ancho, alto = existente.size
+            else:
+                contenido, (ancho, alto) = _renderizar(imagen, tamano, formato)
+                if storage.exists(nombre):
+                    storage.delete(nombre)
+                nombre = storage.save(nombre, ContentFile(contenido))
+            resultado[str(tamano)][formato] = nombre
+            resultado[str(tamano)].update(ancho=ancho, alto=alto)
+
+    variantes = {'origen': origen, 'hash': digest, 'tamanos': resultado}
+    # Sólo si la imagen no cambió mientras tanto; update() no dispara las señales de imagen
+    if Producto.objects.filter(pk=producto_id, imagen=origen).update(imagen_variantes=variantes):
+        borrar_variantes(anteriores, storage, conservar=set(_archivos(variantes)))
+        cambios.registrar('producto', [producto_id])
+    else:
+        borrar_variantes(variantes, storage)
+    return variantes
+
+
+def _procesar(producto_id):
+    try:
+        generar_variantes(producto_id)
+    except Exception:
+        logger.exception('Error generando las variantes de imagen del producto %s', producto_id)
+    finally:
+        # Los hilos del pool no pasan por el ciclo de request: cerrar su conexión
+        close_old_connections()
+
+
+def encolar(producto_id):
+    """Programa la generación para después del commit (en el pool o, si IMAGENES_SINCRONICO, en el acto)."""
+    if getattr(settings, 'IMAGENES_SINCRONICO', False):
+        transaction.on_commit(lambda: generar_variantes(producto_id))
+        return
+    with _lock:
+        if _pool['executor'] is None:
+            _pool['executor'] = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGENES_HILOS', 2), thread_name_prefix='imagenes'
+            )
+        executor = _pool['executor']
+    transaction.on_commit(lambda: executor.submit(_procesar, producto_id))
+
+
+def variantes_urls(producto, request=None):
+    """{tamaño: {webp, jpeg, ancho, alto}} con URLs (absolutas si hay request)."""
+    urls = {}
+    storage = producto.imagen.storage if producto.imagen else None
+    for tamano, variante in _variantes_vigentes(producto).items():
+        urls[tamano] = {'ancho': variante.get('ancho'), 'alto': variante.get('alto')}
+        for formato in FORMATOS:
+            url = storage.url(variante[formato])
+            urls[tamano][formato] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def conectar():
+    """Encola las variantes cuando un producto guarda una imagen nueva (desde CoreConfig.ready)."""
+
+    def producto_guardado(sender, instance, update_fields=None, **kwargs):
+        if update_fields is not None and 'imagen' not in update_fields:
+            return
+        if instance.imagen and (instance.imagen_variantes or {}).get('origen') != instance.imagen.name:
+            encolar(instance.pk)
+
+    post_save.connect(
+        producto_guardado, sender=apps.get_model('core', 'Producto'), weak=False, dispatch_uid='imagenes-producto'
+    )
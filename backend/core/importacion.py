@@ -0,0 +1,623 @@
+import csv
+import io
+import json
+import os
+import unicodedata
+from collections import defaultdict
+from contextlib import nullcontext
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+
+from clientes.models import Clientes
+from clientes.serializers import ClienteSerializer
+from marcas.models import Marca
+from marcas.serializers import MarcaSerializer
+from productos.models import Categoria
+from productos.serializers import CategoriaSerializer
+from proveedores.models import Proveedores
+from proveedores.serializers import ProveedorSerializer
+from . import cambios, precios
+from .gs1 import normalizar_codigo
+from .models import CodigoBarras, Producto
+from .serializers import ProductoSerializer
+
+
+# ==========================================================
+# LECTURA DE ARCHIVOS (CSV / XLSX / JSON)
+# ==========================================================
+# Los archivos se recorren fila por fila, nunca enteros en memoria (salvo un
+# .json con un único arreglo; para archivos grandes usar .jsonl).
+
+def normalizar_encabezado(encabezado):
+    """'Código Proveedor' -> 'codigo_proveedor' (sin acentos ni mayúsculas)."""
+    texto = unicodedata.normalize('NFKD', str(encabezado or '')).encode('ascii', 'ignore').decode()
+    return texto.strip().lower().replace(' ', '_').replace('.', '')
+
+
+def filas_csv(archivo):
+    """Filas de un CSV binario; detecta el separador (coma, punto y coma o tab)."""
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    muestra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+    try:
+        yield from csv.reader(texto, dialecto)
+    finally:
+        # No cerrar el archivo de quien llama junto con el wrapper
+        texto.detach()
+
+
+def filas_xlsx(archivo):
+    """Filas de la hoja activa de un XLSX (openpyxl en modo sólo lectura)."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise serializers.ValidationError({"detail": "Para importar archivos XLSX hace falta instalar openpyxl"})
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        yield from libro.active.iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+
+def bloques(filas, tamano):
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def _valor_celda(valor):
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return valor.strip() if isinstance(valor, str) else valor
+
+
+def leer_registros(archivo, nombre):
+    """
+    Genera (numero_de_fila, {columna: valor}) desde un CSV, XLSX, JSON (arreglo de
+    objetos o {"filas": [...]}) o JSON Lines. En CSV/XLSX las celdas vacías se
+    omiten: no modifican el campo al actualizar.
+    """
+    extension = os.path.splitext(nombre or '')[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        texto = io.TextIOWrapper(archivo, encoding='utf-8-sig')
+        try:
+            for numero, linea in enumerate(texto, start=1):
+                if linea.strip():
+                    try:
+                        yield numero, json.loads(linea)
+                    except ValueError:
+                        yield numero, None
+        finally:
+            texto.detach()
+        return
+    if extension == '.json':
+        try:
+            datos = json.load(archivo)
+        except ValueError:
+            raise serializers.ValidationError({"detail": "El archivo no es un JSON válido"})
+        if isinstance(datos, dict):
+            datos = datos.get('filas')
+        if not isinstance(datos, list):
+            raise serializers.ValidationError({"detail": "El JSON debe ser un arreglo de objetos o {\"filas\": [...]}"})
+        yield from enumerate(datos, start=1)
+        return
+
+    if extension in ('.xlsx', '.xlsm'):
+        filas = filas_xlsx(archivo)
+    elif extension in ('.csv', '.txt', ''):
+        filas = filas_csv(archivo)
+    else:
+        raise serializers.ValidationError({"detail": f"Formato no soportado: {extension} (usar CSV, XLSX, JSON o JSONL)"})
+    encabezados = next(filas, None)
+    if encabezados is None:
+        raise serializers.ValidationError({"detail": "El archivo está vacío"})
+    columnas = [normalizar_encabezado(encabezado) for encabezado in encabezados]
+    for numero, fila in enumerate(filas, start=2):
+        registro = {
+            columna: _valor_celda(valor)
+            for columna, valor in zip(columnas, fila)
+            if columna and valor not in (None, '')
+        }
+        if registro:
+            yield numero, registro
+
+
+# ==========================================================
+# CARGA MASIVA DEL CATÁLOGO (ALTA Y ACTUALIZACIÓN POR CLAVE NATURAL)
+# ==========================================================
+# Por bloque: los campos se validan con el serializer de la entidad (sin sus
+# chequeos de unicidad, que hacen una consulta por fila), las claves naturales
+# y las relaciones se resuelven con una consulta por columna, y se escribe con
+# un bulk_create y un bulk_update. Cada fila termina creada, actualizada, sin
+# cambios o con errores; las filas con errores no frenan al resto del bloque.
+#
+# Claves: las únicas (id, dni, nombre de marca...) identifican el objeto y no
+# pueden apuntar a dos objetos distintos; las de respaldo (nombre de producto,
+# cuil) sólo se usan si ninguna única encontró nada y deben dar un resultado.
+
+TAMANO_BLOQUE = 1000
+MODOS = ('upsert', 'crear', 'actualizar')
+
+
+class _Simulacion(Exception):
+    """Deshace una importación simulada."""
+
+
+class Entidad:
+    """Cómo se importa un modelo del catálogo. Las subclases completan los atributos."""
+    nombre = None             # Clave de cambios.ENTIDADES
+    modelo = None
+    serializer_class = None
+    claves_unicas = ('id',)
+    claves_respaldo = ()
+    # Campos con los que se recuperan los ids de bulk_create donde la base no los
+    # devuelve (MySQL): cada alta se busca por el primero que tenga valor
+    claves_alta = ('nombre',)
+
+    def __init__(self):
+        self.campos_modelo = {campo.attname for campo in self.modelo._meta.concrete_fields} - {'id'}
+        self.campos_auto_now = [
+            campo.attname for campo in self.modelo._meta.concrete_fields if getattr(campo, 'auto_now', False)
+        ]
+
+    def serializer(self):
+        """Serializer de fila: parcial y sin validadores de unicidad (se resuelven por bloque)."""
+        serializer = self.serializer_class(partial=True)
+        for campo in serializer.fields.values():
+            campo.validators = [v for v in campo.validators if not isinstance(v, UniqueValidator)]
+        serializer.validators = []
+        return serializer
+
+    def clave(self, campo, valor):
+        if campo == 'id':
+            return valor
+        return str(valor).strip().casefold()
+
+    def buscar(self, campo, valores):
+        """Objetos cuyo `campo` está en `valores`: [(clave, objeto)]."""
+        objetos = self.modelo.objects.filter(**{f'{campo}__in': valores})
+        return [(self.clave(campo, getattr(objeto, campo)), objeto) for objeto in objetos]
+
+    def validar_alta(self, datos):
+        return None
+
+    def resolver(self, filas, crear_relacionados):
+        """Resuelve las relaciones de las filas válidas del bloque (consultas por conjunto)."""
+
+    def cambios_externos(self, fila):
+        """True si la fila cambia algo fuera de las columnas del modelo (p.ej. un código nuevo)."""
+        return False
+
+    def despues(self, filas, user=None):
+        """Escrituras asociadas, con los objetos ya guardados."""
+
+
+# ----------------------------------------------------------
+# Serializers de fila
+# ----------------------------------------------------------
+# Se apoyan en los serializers de cada app para heredar sus reglas de campo;
+# las relaciones llegan por nombre y se resuelven en Entidad.resolver().
+
+class ProductoFilaSerializer(ProductoSerializer):
+    categoria_id = None
+    categoria_nombre = None
+    marca_id = None
+    imagen = None
+    codigos = None
+    imagen_variantes = None
+    imagen_miniatura = None
+    codigo = serializers.CharField(max_length=64, required=False)
+    categoria = serializers.CharField(max_length=80, required=False, allow_null=True)
+    marca = serializers.CharField(max_length=50, required=False, allow_null=True)
+
+    class Meta(ProductoSerializer.Meta):
+        # El stock no se importa: sale de los lotes
+        fields = ['codigo', 'nombre', 'precio', 'categoria', 'marca', 'activo']
+
+
+class ClienteFilaSerializer(ClienteSerializer):
+    class Meta(ClienteSerializer.Meta):
+        fields = [campo for campo in ClienteSerializer.Meta.fields if campo not in ('id', 'created_at', 'updated_at')]
+
+    def validate(self, attrs):
+        # "email o DNI" se exige sólo en las altas (ClientesImportacion.validar_alta)
+        return attrs
+
+
+class ProveedorFilaSerializer(ProveedorSerializer):
+    class Meta(ProveedorSerializer.Meta):
+        fields = [campo for campo in ProveedorSerializer.Meta.fields if campo != 'id']
+
+
+class MarcaFilaSerializer(MarcaSerializer):
+    class Meta(MarcaSerializer.Meta):
+        fields = ['nombre_marca', 'notas', 'activo']
+
+
+class CategoriaFilaSerializer(CategoriaSerializer):
+    class Meta(CategoriaSerializer.Meta):
+        fields = ['nombre', 'descripcion', 'activo']
+
+
+# ----------------------------------------------------------
+# Entidades
+# ----------------------------------------------------------
+
+class ProductosImportacion(Entidad):
+    nombre = 'producto'
+    modelo = Producto
+    serializer_class = ProductoFilaSerializer
+    claves_unicas = ('id', 'codigo')
+    claves_respaldo = ('nombre',)
+    # columna -> (modelo relacionado, campo de nombre, atributo en Producto, entidad de cambios)
+    relaciones = {
+        'marca': (Marca, 'nombre_marca', 'marca_id', 'marca'),
+        'categoria': (Categoria, 'nombre', 'categoria_ref_id', 'categoria'),
+    }
+
+    def __init__(self):
+        super().__init__()
+        # Códigos ya registrados del bloque en curso (los demás se dan de alta en despues())
+        self.codigos_existentes = set()
+
+    def clave(self, campo, valor):
+        if campo == 'codigo':
+            return normalizar_codigo(valor)
+        return super().clave(campo, valor)
+
+    def buscar(self, campo, valores):
+        if campo == 'codigo':
+            codigos = list(CodigoBarras.objects.filter(
+                codigo__in={normalizar_codigo(valor) for valor in valores}
+            ).select_related('producto'))
+            self.codigos_existentes = {codigo.codigo for codigo in codigos}
+            return [(codigo.codigo, codigo.producto) for codigo in codigos]
+        return super().buscar(campo, valores)
+
+    def resolver(self, filas, crear_relacionados):
+        for columna, (modelo, campo, atributo, entidad) in self.relaciones.items():
+            nombres = {fila['datos'][columna] for fila in filas if fila['datos'].get(columna)}
+            if not nombres:
+                continue
+            ids = {self.clave(campo, getattr(o, campo)): o.id for o in modelo.objects.filter(**{f'{campo}__in': nombres})}
+            faltantes = {nombre for nombre in nombres if self.clave(campo, nombre) not in ids}
+            if faltantes and crear_relacionados:
+                modelo.objects.bulk_create([modelo(**{campo: nombre}) for nombre in faltantes], ignore_conflicts=True)
+                nuevos = {self.clave(campo, getattr(o, campo)): o.id for o in modelo.objects.filter(**{f'{campo}__in': faltantes})}
+                cambios.registrar(entidad, nuevos.values())
+                ids.update(nuevos)
+            for fila in filas:
+                datos = fila['datos']
+                if columna not in datos:
+                    continue
+                nombre = datos[columna]
+                if nombre is None:
+                    datos[atributo] = None
+                    if columna == 'categoria':
+                        datos[columna] = ''
+                elif self.clave(campo, nombre) in ids:
+                    datos[atributo] = ids[self.clave(campo, nombre)]
+                else:
+                    fila['errores'] = {columna: [f"No existe: {nombre}"]}
+                if columna == 'marca':
+                    # La categoría conserva además el texto (columna legacy)
+                    del datos[columna]
+
+    def cambios_externos(self, fila):
+        return 'codigo' in fila['datos'] and self.clave('codigo', fila['datos']['codigo']) not in self.codigos_existentes
+
+    def despues(self, filas, user=None):
+        CodigoBarras.objects.bulk_create([
+            CodigoBarras(codigo=normalizar_codigo(fila['datos']['codigo']), producto_id=fila['objeto'].pk)
+            for fila in filas if self.cambios_externos(fila)
+        ])
+        precios.registrar([
+            (fila['objeto'].pk, fila['anteriores']['precio'], fila['objeto'].precio)
+            for fila in filas if 'precio' in fila.get('anteriores', {})
+        ], 'IMPORTACION', user=user)
+
+
+class ClientesImportacion(Entidad):
+    nombre = 'cliente'
+    modelo = Clientes
+    serializer_class = ClienteFilaSerializer
+    claves_unicas = ('id', 'dni', 'email')
+    claves_alta = ('dni', 'email')
+
+    def validar_alta(self, datos):
+        if not datos.get('email') and not datos.get('dni'):
+            return 'Debe indicar email o DNI.'
+        return None
+
+
+class ProveedoresImportacion(Entidad):
+    nombre = 'proveedor'
+    modelo = Proveedores
+    serializer_class = ProveedorFilaSerializer
+    # El cuil no es único en la base: identifica sólo si hay un único proveedor con él
+    claves_respaldo = ('cuil', 'nombre')
+
+
+class MarcasImportacion(Entidad):
+    nombre = 'marca'
+    modelo = Marca
+    serializer_class = MarcaFilaSerializer
+    claves_unicas = ('id', 'nombre_marca')
+    claves_alta = ('nombre_marca',)
+
+
+class CategoriasImportacion(Entidad):
+    nombre = 'categoria'
+    modelo = Categoria
+    serializer_class = CategoriaFilaSerializer
+    claves_unicas = ('id', 'nombre')
+
+
+ENTIDADES = {
+    entidad.nombre: entidad
+    for entidad in (ProductosImportacion, ClientesImportacion, ProveedoresImportacion, MarcasImportacion, CategoriasImportacion)
+}
+
+
+# ----------------------------------------------------------
+# Importador
+# ----------------------------------------------------------
+
+class Importador:
+    """
+    importar(registros) recibe (numero, dict) como los de leer_registros() y
+    devuelve {resumen, filas}: una entrada por fila con fila, accion
+    (creado | actualizado | sin_cambios | error), id y errores.
+    Con simular=True todo se escribe dentro de una transacción que se deshace.
+    """
+
+    def __init__(self, entidad, modo='upsert', crear_relacionados=False, simular=False, tamano=TAMANO_BLOQUE, user=None):
+        if modo not in MODOS:
+            raise ValueError(f"Modo desconocido: {modo}")
+        self.entidad = ENTIDADES[entidad]()
+        self.modo = modo
+        self.crear_relacionados = crear_relacionados
+        self.simular = simular
+        self.tamano = tamano
+        self.user = user
+        self.serializer = self.entidad.serializer()
+        self.columnas = set(self.serializer.fields) | {'id'}
+        self.vistas = {}              # (campo, clave) -> fila donde apareció
+        self.ignoradas = set()
+
+    def importar(self, registros):
+        reporte = []
+        try:
+            with transaction.atomic() if self.simular else nullcontext():
+                for bloque in bloques(registros, self.tamano):
+                    reporte.extend(self._procesar(bloque))
+                if self.simular:
+                    raise _Simulacion()
+        except _Simulacion:
+            pass
+        resumen = {accion: 0 for accion in ('creado', 'actualizado', 'sin_cambios', 'error')}
+        for fila in reporte:
+            resumen[fila['accion']] += 1
+        return {
+            'resumen': {
+                'entidad': self.entidad.nombre,
+                'modo': self.modo,
+                'simulada': self.simular,
+                'filas': len(reporte),
+                'creados': resumen['creado'],
+                'actualizados': resumen['actualizado'],
+                'sin_cambios': resumen['sin_cambios'],
+                'errores': resumen['error'],
+                'columnas_ignoradas': sorted(self.ignoradas),
+            },
+            'filas': reporte,
+        }
+
+    # ------------------------------------------------------------------
+    # Pasos por bloque
+    # ------------------------------------------------------------------
+    def _validar(self, numero, registro):
+        fila = {'numero': numero, 'datos': None, 'errores': None, 'objeto': None, 'claves': []}
+        if not isinstance(registro, dict):
+            fila['errores'] = {'detail': ['La fila no es un objeto']}
+            return fila
+        registro = {normalizar_encabezado(columna): valor for columna, valor in registro.items()}
+        self.ignoradas.update(set(registro) - self.columnas)
+        pk = registro.pop('id', None)
+        try:
+            fila['datos'] = dict(self.serializer.run_validation(registro))
+            if pk not in (None, ''):
+                fila['datos']['id'] = serializers.IntegerField(min_value=1).run_validation(pk)
+        except serializers.ValidationError as e:
+            fila['errores'] = e.detail if isinstance(e.detail, dict) else {'detail': e.detail}
+            return fila
+        # Claves presentes; una repetida en el archivo es un error de la segunda fila
+        for campo in self.entidad.claves_unicas + self.entidad.claves_respaldo:
+            if fila['datos'].get(campo) not in (None, ''):
+                fila['claves'].append((campo, self.entidad.clave(campo, fila['datos'][campo])))
+        return fila
+
+    def _deduplicar(self, fila):
+        unicas = [clave for clave in fila['claves'] if clave[0] in self.entidad.claves_unicas]
+        # Una clave de respaldo sólo cuenta si la fila no trae ninguna única
+        propias = unicas or fila['claves'][:1]
+        for clave in propias:
+            previa = self.vistas.get(clave)
+            if previa is not None:
+                fila['errores'] = {clave[0]: [f"Repetido en el archivo (fila {previa})"]}
+                return
+        for clave in propias:
+            self.vistas[clave] = fila['numero']
+
+    def _existentes(self, filas):
+        """{(campo, clave): [objetos]} con una consulta por columna clave."""
+        encontrados = defaultdict(list)
+        por_pk = {}
+        for campo in self.entidad.claves_unicas + self.entidad.claves_respaldo:
+            valores = {fila['datos'][campo] for fila in filas if fila['datos'].get(campo) not in (None, '')}
+            if not valores:
+                continue
+            for clave, objeto in self.entidad.buscar(campo, valores):
+                # Una sola instancia por objeto aunque lo encuentren varias columnas
+                objeto = por_pk.setdefault(objeto.pk, objeto)
+                encontrados[(campo, clave)].append(objeto)
+        return encontrados
+
+    def _identificar(self, fila, encontrados):
+        datos = fila['datos']
+        unicos = {}
+        for campo, clave in fila['claves']:
+            if campo in self.entidad.claves_unicas:
+                for objeto in encontrados.get((campo, clave), ()):
+                    unicos.setdefault(objeto.pk, (campo, objeto))
+        if len(unicos) > 1:
+            detalle = ', '.join(f"{campo}={datos[campo]} es el id {pk}" for pk, (campo, _) in unicos.items())
+            fila['errores'] = {'detail': [f"Las claves corresponden a objetos distintos: {detalle}"]}
+            return
+        if unicos:
+            fila['objeto'] = next(iter(unicos.values()))[1]
+        elif 'id' in datos:
+            fila['errores'] = {'id': [f"No existe el id {datos['id']}"]}
+            return
+        else:
+            respaldo = next(((c, k) for c, k in fila['claves'] if c in self.entidad.claves_respaldo), None)
+            candidatos = encontrados.get(respaldo, []) if respaldo else []
+            if len(candidatos) > 1:
+                fila['errores'] = {respaldo[0]: [f"Hay {len(candidatos)} registros con {respaldo[0]}={datos[respaldo[0]]}: indique el id"]}
+                return
+            if candidatos:
+                fila['objeto'] = candidatos[0]
+
+        if fila['objeto'] is not None and self.modo == 'crear':
+            fila['errores'] = {'detail': [f"Ya existe (id {fila['objeto'].pk})"]}
+        elif fila['objeto'] is None and self.modo == 'actualizar':
+            fila['errores'] = {'detail': ["No existe"]}
+        elif fila['objeto'] is None:
+            faltan = [
+                nombre for nombre, campo in self.serializer.fields.items()
+                if campo.required and not campo.read_only and nombre not in datos
+            ]
+            if faltan:
+                fila['errores'] = {nombre: ['Este campo es requerido.'] for nombre in faltan}
+            else:
+                error = self.entidad.validar_alta(datos)
+                if error:
+                    fila['errores'] = {'detail': [error]}
+
+    def _crear(self, objetos):
+        modelo = self.entidad.modelo
+        if connection.features.can_return_rows_from_bulk_insert:
+            modelo.objects.bulk_create(objetos)
+            return
+        # MySQL no devuelve ids: se buscan por las claves de alta de este bloque entre
+        # las filas posteriores al máximo previo. Si otra transacción confirmó en el medio
+        # una fila con la misma clave (posible donde la columna no es única, p.ej. el
+        # nombre de un producto) los ids no se pueden asignar con certeza y el bloque
+        # se deshace como conflicto.
+        altas = defaultdict(lambda: defaultdict(list))      # campo -> valor -> objetos
+        for objeto in objetos:
+            campo = next((c for c in self.entidad.claves_alta if getattr(objeto, c) not in (None, '')), None)
+            if campo is None:
+                raise IntegrityError(f"Alta sin {' ni '.join(self.entidad.claves_alta)}: no se puede identificar su id")
+            altas[campo][getattr(objeto, campo)].append(objeto)
+        antes = modelo.objects.aggregate(maximo=Max('id'))['maximo'] or 0
+        modelo.objects.bulk_create(objetos)
+        for campo, por_valor in altas.items():
+            nuevos = defaultdict(list)
+            filas = (modelo.objects
+                     .filter(id__gt=antes, **{f'{campo}__in': list(por_valor)})
+                     .order_by('id')
+                     .values_list('id', campo))
+            for pk, valor in filas:
+                nuevos[valor].append(pk)
+            for valor, grupo in por_valor.items():
+                ids = nuevos.get(valor, [])
+                if len(ids) != len(grupo):
+                    raise IntegrityError(
+                        f"No se pudieron identificar las altas con {campo}={valor}: "
+                        f"{len(ids)} filas nuevas para {len(grupo)} altas"
+                    )
+                # Dentro de un INSERT los ids siguen el orden de las filas
+                for objeto, pk in zip(grupo, ids):
+                    objeto.pk = pk
+
+    def _escribir(self, filas):
+        altas, modificadas, campos = [], [], set()
+        ahora = timezone.now()
+        for fila in filas:
+            valores = {c: v for c, v in fila['datos'].items() if c in self.entidad.campos_modelo}
+            if fila['objeto'] is None:
+                fila['objeto'] = self.entidad.modelo(**valores)
+                fila['accion'] = 'creado'
+                altas.append(fila['objeto'])
+                continue
+            objeto = fila['objeto']
+            cambiados = [c for c, v in valores.items() if getattr(objeto, c) != v]
+            if not cambiados:
+                fila['accion'] = 'actualizado' if self.entidad.cambios_externos(fila) else 'sin_cambios'
+                continue
+            fila['anteriores'] = {c: getattr(objeto, c) for c in cambiados}
+            for c in cambiados:
+                setattr(objeto, c, valores[c])
+            for c in self.entidad.campos_auto_now:
+                setattr(objeto, c, ahora)
+            campos.update(cambiados)
+            fila['accion'] = 'actualizado'
+            modificadas.append(objeto)
+        if altas:
+            self._crear(altas)
+        if modificadas:
+            self.entidad.modelo.objects.bulk_update(modificadas, sorted(campos | set(self.entidad.campos_auto_now)))
+        self.entidad.despues(filas, self.user)
+        cambios.registrar(self.entidad.nombre, [
+            fila['objeto'].pk for fila in filas if fila['accion'] in ('creado', 'actualizado')
+        ])
+
+    def _procesar(self, bloque):
+        filas = [self._validar(numero, registro) for numero, registro in bloque]
+        for fila in filas:
+            if not fila['errores']:
+                self._deduplicar(fila)
+        validas = [fila for fila in filas if not fila['errores']]
+        encontrados = self._existentes(validas)
+        for fila in validas:
+            self._identificar(fila, encontrados)
+        validas = [fila for fila in validas if not fila['errores']]
+        self.entidad.resolver(validas, self.crear_relacionados)
+        validas = [fila for fila in validas if not fila['errores']]
+
+        if validas:
+            try:
+                with transaction.atomic():
+                    self._escribir(validas)
+            except IntegrityError as e:
+                # Otro proceso escribió la misma clave entre la consulta y la escritura
+                for fila in validas:
+                    fila['errores'] = {'detail': [f"Conflicto al guardar el bloque: {e}"]}
+
+        return [
+            {
+                'fila': fila['numero'],
+                'accion': 'error' if fila['errores'] else fila['accion'],
+                'id': None if fila['errores'] or (self.simular and fila['accion'] == 'creado') else fila['objeto'].pk,
+                'errores': fila['errores'],
+            }
+            for fila in filas
+        ]
+
+
+def importar(entidad, registros, **opciones):
+    return Importador(entidad, **opciones).importar(registros)
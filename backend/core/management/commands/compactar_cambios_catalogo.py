@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.cambios import compactar
+
+
+class Command(BaseCommand):
+    help = (
+        'Compacta el registro de cambios del catálogo: borra los cambios reemplazados por uno '
+        'posterior del mismo objeto y las bajas más viejas que CATALOGO_RETENCION_DIAS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bloque', type=int, default=10000, help='Versiones revisadas por consulta')
+
+    def handle(self, *args, **options):
+        reemplazados, bajas = compactar(max(1, options['bloque']))
+        self.stdout.write(self.style.SUCCESS(f'Cambios reemplazados eliminados: {reemplazados}; bajas purgadas: {bajas}'))
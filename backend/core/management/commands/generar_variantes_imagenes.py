@@ -0,0 +1,78 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.imagenes import generar_variantes
+from core.models import Producto
+
+
+def _iniciar_proceso():
+    # Cada proceso del pool abre su propia conexión (no compartir la heredada del padre)
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def _generar(producto_id, forzar):
+    try:
+        variantes = generar_variantes(producto_id, forzar=forzar)
+        return producto_id, (variantes or {}).get('error')
+    except Exception as e:
+        return producto_id, str(e)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera las miniaturas WebP/JPEG de las imágenes de productos que no las tengan "
+        "(o de todas con --todos), repartiendo el trabajo entre varios procesos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--todos', action='store_true', help='Regenerar aunque ya estén al día')
+        parser.add_argument('--reintentar', action='store_true', help='Incluir las imágenes que dieron error')
+        parser.add_argument('--ids', type=int, nargs='+', help='Sólo estos productos')
+
+    def handle(self, *args, **options):
+        qs = Producto.objects.exclude(imagen='').exclude(imagen__isnull=True)
+        if options['ids']:
+            qs = qs.filter(id__in=options['ids'])
+        pendientes = []
+        for pk, imagen, variantes in qs.order_by('id').values_list('id', 'imagen', 'imagen_variantes').iterator():
+            variantes = variantes or {}
+            if options['todos'] or variantes.get('origen') != imagen:
+                pendientes.append(pk)
+            elif 'error' in variantes and options['reintentar']:
+                pendientes.append(pk)
+            elif 'error' not in variantes and not variantes.get('tamanos'):
+                pendientes.append(pk)
+        if not pendientes:
+            self.stdout.write('No hay imágenes pendientes')
+            return
+
+        errores = 0
+        procesos = max(1, min(options['procesos'], len(pendientes)))
+        if procesos == 1:
+            resultados = (_generar(pk, options['todos']) for pk in pendientes)
+        else:
+            # Los hijos no deben heredar la conexión abierta del padre
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso)
+            futuros = [pool.submit(_generar, pk, options['todos']) for pk in pendientes]
+            resultados = (futuro.result() for futuro in as_completed(futuros))
+        try:
+            for pk, error in resultados:
+                if error:
+                    errores += 1
+                    self.stderr.write(f'Producto {pk}: {error}')
+        finally:
+            if procesos > 1:
+                pool.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(pendientes) - errores} imágenes procesadas, {errores} con errores ({procesos} procesos)'
+        ))
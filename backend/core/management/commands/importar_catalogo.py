@@ -0,0 +1,60 @@
+import csv
+import json
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.importacion import ENTIDADES, MODOS, TAMANO_BLOQUE, importar, leer_registros
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa productos, clientes, proveedores, marcas o categorías desde CSV, XLSX, JSON o JSONL: "
+        "crea o actualiza por clave natural en bloques y escribe un reporte por fila."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('entidad', choices=sorted(ENTIDADES))
+        parser.add_argument('archivo', type=str)
+        parser.add_argument('--modo', choices=MODOS, default='upsert')
+        parser.add_argument('--crear-relacionados', action='store_true',
+                            help='Dar de alta las marcas y categorías que no existan')
+        parser.add_argument('--simular', action='store_true', help='Validar y escribir, pero deshacer todo al final')
+        parser.add_argument('--bloque', type=int, default=TAMANO_BLOQUE, help='Filas por bloque')
+        parser.add_argument('--reporte', type=str, help='CSV con el resultado de cada fila')
+        parser.add_argument('--usuario', type=str, help='Usuario al que se atribuyen los cambios de precio')
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        if not os.path.isfile(ruta):
+            raise CommandError(f'No existe el archivo {ruta}')
+        user = None
+        if options['usuario']:
+            user = get_user_model().objects.filter(username=options['usuario']).first()
+            if not user:
+                raise CommandError(f"No existe el usuario {options['usuario']}")
+
+        with open(ruta, 'rb') as archivo:
+            resultado = importar(
+                options['entidad'], leer_registros(archivo, os.path.basename(ruta)),
+                modo=options['modo'], crear_relacionados=options['crear_relacionados'],
+                simular=options['simular'], tamano=max(1, options['bloque']), user=user,
+            )
+
+        if options['reporte']:
+            with open(options['reporte'], 'w', newline='', encoding='utf-8') as salida:
+                escritor = csv.writer(salida)
+                escritor.writerow(['fila', 'accion', 'id', 'errores'])
+                for fila in resultado['filas']:
+                    errores = json.dumps(fila['errores'], ensure_ascii=False) if fila['errores'] else ''
+                    escritor.writerow([fila['fila'], fila['accion'], fila['id'] or '', errores])
+
+        errores = [fila for fila in resultado['filas'] if fila['accion'] == 'error']
+        self.stdout.write(json.dumps(
+            {'resumen': resultado['resumen'], 'errores': errores[:20]},
+            cls=DjangoJSONEncoder, indent=2, ensure_ascii=False,
+        ))
+        if errores:
+            self.stderr.write(f"{len(errores)} filas con errores" + ('' if options['reporte'] else ' (ver --reporte)'))
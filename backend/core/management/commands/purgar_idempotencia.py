@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Elimina las claves de idempotencia vencidas (IDEMPOTENCY_TTL_HORAS), de a bloques'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por DELETE')
+
+    def handle(self, *args, **options):
+        ahora = timezone.now()
+        lote = max(1, options['lote'])
+        eliminadas = 0
+        while True:
+            ids = list(
+                IdempotencyKey.objects.filter(expira__lte=ahora).order_by('expira').values_list('id', flat=True)[:lote]
+            )
+            if not ids:
+                break
+            eliminadas += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Claves de idempotencia eliminadas: {eliminadas}'))
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from core.consistencia import verificar
 from core.models import EmpleadoProfile
 
 
@@ -6,26 +7,22 @@ class Command(BaseCommand):
     help = 'Sincroniza el estado activo de EmpleadoProfile con User.is_active'
 
     def handle(self, *args, **options):
-        empleados = EmpleadoProfile.objects.select_related('user').all()
-        sincronizados = 0
-        
-        for empleado in empleados:
-            if empleado.user.is_active != empleado.activo:
-                empleado.user.is_active = empleado.activo
-                empleado.user.save(update_fields=['is_active'])
-                sincronizados += 1
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Sincronizado: {empleado.nombre} {empleado.apellido} - '
-                        f'activo={empleado.activo}'
-                    )
+        # Mismo chequeo que `verificar_consistencia --verificaciones empleado_activo --reparar`
+        resultado = verificar('empleado_activo', reparar=True, muestras=50)
+        sincronizados = resultado['reparadas']
+
+        for fila in resultado['muestras']:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Sincronizado: {fila["user__username"]} - activo={fila["activo"]}'
                 )
-        
+            )
+
         if sincronizados == 0:
             self.stdout.write(self.style.SUCCESS('Todos los empleados ya están sincronizados'))
         else:
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'Total sincronizados: {sincronizados} de {empleados.count()}'
+                    f'Total sincronizados: {sincronizados} de {EmpleadoProfile.objects.count()}'
                 )
             )
@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from core.consistencia import VERIFICACIONES, verificar
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica los campos desnormalizados (stock de productos, lotes activos, totales de venta, "
+        "cierres de caja, empleados activos) por bloques de ids y emite el resultado en JSON. "
+        "Con --reparar corrige cada bloque con UPDATEs agrupados. Para repartir el trabajo entre "
+        "procesos, lanzar uno por partición: --particion 0/4, 1/4, 2/4, 3/4."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificaciones', type=str, default=','.join(VERIFICACIONES),
+            help=f'Lista separada por comas (por defecto todas: {", ".join(VERIFICACIONES)})',
+        )
+        parser.add_argument('--tamano', type=int, default=5000, help='Ids por bloque/consulta')
+        parser.add_argument('--particion', type=str, default='0/1', help='K/N: procesa los bloques cuyo índice % N == K')
+        parser.add_argument('--reparar', action='store_true', help='Corrige las inconsistencias encontradas')
+        parser.add_argument('--muestras', type=int, default=100, help='Máximo de filas de ejemplo por verificación')
+
+    def _particion(self, valor):
+        try:
+            particion, particiones = (int(parte) for parte in valor.split('/'))
+        except ValueError:
+            raise CommandError('--particion debe tener formato K/N')
+        if particiones < 1 or not 0 <= particion < particiones:
+            raise CommandError('--particion: K debe estar entre 0 y N-1')
+        return particion, particiones
+
+    def handle(self, *args, **options):
+        nombres = [n.strip() for n in options['verificaciones'].split(',') if n.strip()]
+        desconocidas = [n for n in nombres if n not in VERIFICACIONES]
+        if desconocidas:
+            raise CommandError(f'Verificación desconocida: {desconocidas[0]}')
+        if options['tamano'] < 1:
+            raise CommandError('--tamano debe ser mayor a 0')
+        particion, particiones = self._particion(options['particion'])
+
+        inicio = timezone.now()
+        resultado = {
+            'inicio': inicio,
+            'particion': f'{particion}/{particiones}',
+            'reparar': options['reparar'],
+            'verificaciones': {},
+        }
+        for nombre in nombres:
+            resultado['verificaciones'][nombre] = verificar(
+                nombre, tamano=options['tamano'], particion=particion, particiones=particiones,
+                reparar=options['reparar'], muestras=options['muestras'],
+            )
+        resultado['segundos'] = round((timezone.now() - inicio).total_seconds(), 2)
+        self.stdout.write(json.dumps(resultado, cls=DjangoJSONEncoder, indent=2, ensure_ascii=False))
+
+        total = sum(v['inconsistencias'] for v in resultado['verificaciones'].values())
+        if total and not options['reparar']:
+            self.stderr.write(self.style.WARNING(f'{total} inconsistencias encontradas'))
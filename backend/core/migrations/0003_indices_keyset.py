@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_initial'),
+        ('marcas', '0001_initial'),
+        ('productos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['creado', 'id'], name='producto_creado_id_idx'),
+        ),
+    ]
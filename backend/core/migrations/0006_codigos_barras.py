@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_cambios_catalogo'),
+        ('lotes', '0009_conteos_inventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodigoBarras',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=64, unique=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('lote', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='codigos', to='lotes.lote')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='codigos', to='core.producto')),
+            ],
+            options={
+                'verbose_name': 'Código de barras',
+                'verbose_name_plural': 'Códigos de barras',
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_codigos_barras'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AjustePrecio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('PORCENTAJE', 'Porcentaje'), ('MONTO', 'Monto fijo'), ('PRECIO', 'Precio fijo')], max_length=12)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('multiplo', models.DecimalField(decimal_places=2, default=Decimal('0.01'), max_digits=12)),
+                ('direccion', models.CharField(choices=[('CERCANO', 'Al más cercano'), ('ARRIBA', 'Hacia arriba'), ('ABAJO', 'Hacia abajo')], default='CERCANO', max_length=8)),
+                ('restar', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12)),
+                ('filtros', models.JSONField(default=dict)),
+                ('productos', models.PositiveIntegerField(default=0)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PrecioHistorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio_anterior', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('origen', models.CharField(choices=[('AJUSTE', 'Ajuste masivo'), ('MANUAL', 'Edición manual'), ('IMPORTACION', 'Importación')], max_length=12)),
+                ('ajuste', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cambios', to='core.ajusteprecio')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial_precios', to='core.producto')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['producto', 'fecha', 'id'], name='precio_hist_producto_fecha_idx')],
+            },
+        ),
+    ]
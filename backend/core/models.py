@@ -3,6 +3,9 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_delete, pre_save, post_save
 from django.dispatch import receiver
+from rest_framework.utils.encoders import JSONEncoder
+from django.utils import timezone
+from decimal import Decimal
 import os
 
 # Perfil extendido para User para flag de cambio de contraseña
@@ -59,9 +62,16 @@ class Producto(models.Model):
         null=True, blank=True, related_name='productos'
     )
     imagen = models.ImageField(upload_to="productos/", blank=True, null=True)  # opcional
+    # Miniaturas generadas en segundo plano (core/imagenes.py): {origen, hash, tamanos: {"64": {...}}}
+    imagen_variantes = models.JSONField(default=dict, blank=True)
     creado = models.DateTimeField(auto_now_add=True)
     activo = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['creado', 'id'], name='producto_creado_id_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -73,26 +83,180 @@ def eliminar_imagen_producto(sender, instance, **kwargs):
     Elimina la imagen del disco cuando se elimina un producto
     """
     if instance.imagen:
+        from .imagenes import borrar_variantes
+        borrar_variantes(instance.imagen_variantes, instance.imagen.storage)
         if os.path.isfile(instance.imagen.path):
             os.remove(instance.imagen.path)
 
 @receiver(pre_save, sender=Producto)
-def eliminar_imagen_anterior(sender, instance, **kwargs):
+def eliminar_imagen_anterior(sender, instance, update_fields=None, **kwargs):
     """
     Elimina la imagen anterior cuando se actualiza con una nueva imagen
     """
     if not instance.pk:
         return False
+    # Guardados parciales que no tocan la imagen (p.ej. el recálculo de stock): nada que comparar
+    if update_fields is not None and 'imagen' not in update_fields:
+        return False
     
     try:
-        old_file = Producto.objects.get(pk=instance.pk).imagen
+        anterior = Producto.objects.only('imagen', 'imagen_variantes').get(pk=instance.pk)
     except Producto.DoesNotExist:
         return False
     
+    old_file = anterior.imagen
     new_file = instance.imagen
     if not old_file == new_file:
         if old_file and os.path.isfile(old_file.path):
             os.remove(old_file.path)
+        # Las miniaturas de la imagen anterior también sobran
+        from .imagenes import borrar_variantes
+        borrar_variantes(anterior.imagen_variantes, old_file.storage)
+        instance.imagen_variantes = {}
+
+# ==========================================================
+# CÓDIGOS DE BARRAS / SKU
+# ==========================================================
+# Uno o más códigos únicos por producto; un código GS1 propio de un lote
+# (p.ej. con vencimiento) apunta además al lote. Ver core/codigos.py (escaneo).
+
+class CodigoBarras(models.Model):
+    # Normalizado con core.gs1.normalizar_codigo (GTIN a 14 dígitos)
+    codigo = models.CharField(max_length=64, unique=True)
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='codigos')
+    lote = models.ForeignKey(
+        'lotes.Lote', on_delete=models.CASCADE,
+        null=True, blank=True, related_name='codigos'
+    )
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Código de barras'
+        verbose_name_plural = 'Códigos de barras'
+
+    def save(self, *args, **kwargs):
+        from .gs1 import normalizar_codigo
+        self.codigo = normalizar_codigo(self.codigo)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.codigo} -> {self.producto_id}"
+
+# ==========================================================
+# HISTORIAL DE PRECIOS
+# ==========================================================
+# Una fila por cambio de precio (ajustes masivos, edición manual e importación).
+# El precio a una fecha es el de la última fila anterior; ver core/precios.py.
+
+class AjustePrecio(models.Model):
+    TIPOS = (
+        ('PORCENTAJE', 'Porcentaje'),
+        ('MONTO', 'Monto fijo'),
+        ('PRECIO', 'Precio fijo'),
+    )
+    DIRECCIONES = (
+        ('CERCANO', 'Al más cercano'),
+        ('ARRIBA', 'Hacia arriba'),
+        ('ABAJO', 'Hacia abajo'),
+    )
+
+    tipo = models.CharField(max_length=12, choices=TIPOS)
+    valor = models.DecimalField(max_digits=12, decimal_places=2)
+    # Redondeo al múltiplo indicado (0.01, 1, 10...) y resta final opcional (0.01 -> precios terminados en ,99)
+    multiplo = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.01'))
+    direccion = models.CharField(max_length=8, choices=DIRECCIONES, default='CERCANO')
+    restar = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))
+    filtros = models.JSONField(default=dict)
+    productos = models.PositiveIntegerField(default=0)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Ajuste #{self.pk} {self.tipo} {self.valor} ({self.productos} productos)"
+
+
+class PrecioHistorico(models.Model):
+    ORIGENES = (
+        ('AJUSTE', 'Ajuste masivo'),
+        ('MANUAL', 'Edición manual'),
+        ('IMPORTACION', 'Importación'),
+    )
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='historial_precios')
+    precio_anterior = models.DecimalField(max_digits=12, decimal_places=2)
+    precio = models.DecimalField(max_digits=12, decimal_places=2)
+    fecha = models.DateTimeField(default=timezone.now)
+    origen = models.CharField(max_length=12, choices=ORIGENES)
+    ajuste = models.ForeignKey(AjustePrecio, on_delete=models.SET_NULL, null=True, blank=True, related_name='cambios')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        indexes = [
+            # Precio a una fecha: última fila con fecha <= X (o la primera posterior)
+            models.Index(fields=['producto', 'fecha', 'id'], name='precio_hist_producto_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id}: {self.precio_anterior} -> {self.precio} ({self.fecha:%Y-%m-%d})"
+
+# ==========================================================
+# IDEMPOTENCIA DE ENDPOINTS DE ESCRITURA
+# ==========================================================
+# Ver core/idempotency.py: la fila se reclama antes de ejecutar la vista
+# (estado EN_CURSO) y guarda la respuesta 2xx para reintentos posteriores.
+
+class IdempotencyKey(models.Model):
+    ESTADOS = (
+        ('EN_CURSO', 'En curso'),
+        ('COMPLETADA', 'Completada'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    endpoint = models.CharField(max_length=60)
+    clave = models.CharField(max_length=100)
+    # sha256 del cuerpo: la misma clave con otro cuerpo es un error del cliente
+    huella = models.CharField(max_length=64, blank=True)
+    estado = models.CharField(max_length=12, choices=ESTADOS, default='EN_CURSO')
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    respuesta = models.JSONField(null=True, blank=True, encoder=JSONEncoder)
+    creado = models.DateTimeField(auto_now_add=True)
+    actualizado = models.DateTimeField(auto_now=True)
+    expira = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'endpoint', 'clave'], name='idempotency_clave_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint}:{self.clave} ({self.estado})"
+
+
+# ==========================================================
+# REGISTRO DE CAMBIOS DEL CATÁLOGO
+# ==========================================================
+# Una fila por alta/modificación/baja de productos, lotes, clientes,
+# proveedores, marcas y categorías. El id es la versión: monótona y global.
+# Ver core/cambios.py (registro y ?since= en los listados).
+
+class CambioCatalogo(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    entidad = models.CharField(max_length=20)
+    objeto_id = models.PositiveBigIntegerField()
+    eliminado = models.BooleanField(default=False)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # ?since=: WHERE entidad IN (...) AND id > since ORDER BY id
+            models.Index(fields=['entidad', 'id'], name='cambio_entidad_version_idx'),
+            # Compactación: cambios anteriores del mismo objeto
+            models.Index(fields=['entidad', 'objeto_id'], name='cambio_objeto_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.entidad}#{self.objeto_id} v{self.id}{' (baja)' if self.eliminado else ''}"
+
 
 # ==========================================================
 # 3. VENTAS
@@ -0,0 +1,197 @@
+import base64
+import datetime
+import json
+from decimal import Decimal
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _valor_json(valor):
+    # isoformat completo: DjangoJSONEncoder recorta microsegundos y el cursor dejaría de ser exacto
+    if isinstance(valor, (datetime.datetime, datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f'Valor no serializable en cursor: {valor!r}')
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) opcional para los listados.
+
+    Sin parámetros el endpoint devuelve la lista completa como siempre; con
+    ?paginacion=cursor (o al seguir un ?cursor=...) responde
+    {"next", "previous", "results"} con páginas de `page_size` filas.
+
+    El orden lo define la vista con `keyset_ordering`, p.ej. ('-fecha_venta', '-id').
+    El último campo debe ser único para que el cursor sea exacto. Cada página se
+    obtiene con WHERE (campos) > (posición) ... LIMIT n sobre el índice compuesto
+    equivalente, así que cuesta lo mismo en la primera página que en la milésima.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    activar_query_param = 'paginacion'
+    default_ordering = ('id',)
+
+    def __init__(self):
+        self.page = None
+        self.request = None
+        self.next_cursor = None
+        self.previous_cursor = None
+        self.ordering = []
+
+    # ------------------------------------------------------------------
+    # Configuración
+    # ------------------------------------------------------------------
+    def activa(self, request, view=None):
+        if getattr(view, 'keyset_obligatorio', False):
+            return True
+        if request.query_params.get(self.cursor_query_param):
+            return True
+        return request.query_params.get(self.activar_query_param) == 'cursor'
+
+    def get_ordering(self, view):
+        ordering = getattr(view, 'keyset_ordering', None) or self.default_ordering
+        return [(campo.lstrip('-'), campo.startswith('-')) for campo in ordering]
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    # ------------------------------------------------------------------
+    # Cursor
+    # ------------------------------------------------------------------
+    def encode_cursor(self, obj, reverso):
+        posicion = [getattr(obj, campo) for campo, _ in self.ordering]
+        raw = json.dumps({'p': posicion, 'r': int(reverso)}, default=_valor_json)
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            posicion = data['p']
+            if len(posicion) != len(self.ordering):
+                raise ValueError
+            valores = [
+                model._meta.get_field(campo).to_python(valor)
+                for (campo, _), valor in zip(self.ordering, posicion)
+            ]
+            return valores, bool(data.get('r'))
+        except Exception:
+            raise NotFound('Cursor inválido')
+
+    def filtro_posicion(self, valores, reverso):
+        """
+        Expande (a, b, c) > (x, y, z) como
+        a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+        con el sentido de cada comparación según el orden de cada campo.
+        """
+        condicion = Q()
+        iguales = {}
+        for (campo, desc), valor in zip(self.ordering, valores):
+            lookup = 'lt' if desc != reverso else 'gt'
+            condicion |= Q(**iguales, **{f'{campo}__{lookup}': valor})
+            iguales[campo] = valor
+        # Cota sobre el primer campo: ayuda al planner a usar un range scan del índice
+        campo, desc = self.ordering[0]
+        cota = 'lte' if desc != reverso else 'gte'
+        return Q(**{f'{campo}__{cota}': valores[0]}) & condicion
+
+    # ------------------------------------------------------------------
+    # API de DRF
+    # ------------------------------------------------------------------
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.activa(request, view):
+            return None
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        page_size = self.get_page_size(request)
+        valores, reverso = self.decode_cursor(request, queryset.model)
+
+        order_by = [
+            f"{'-' if desc != reverso else ''}{campo}" for campo, desc in self.ordering
+        ]
+        queryset = queryset.order_by(*order_by)
+        if valores is not None:
+            queryset = queryset.filter(self.filtro_posicion(valores, reverso))
+
+        filas = list(queryset[:page_size + 1])
+        hay_mas = len(filas) > page_size
+        filas = filas[:page_size]
+        if reverso:
+            filas.reverse()
+
+        hay_siguiente = hay_mas if not reverso else valores is not None
+        hay_anterior = valores is not None if not reverso else hay_mas
+        self.next_cursor = self.encode_cursor(filas[-1], False) if filas and hay_siguiente else None
+        self.previous_cursor = self.encode_cursor(filas[0], True) if filas and hay_anterior else None
+        self.page = filas
+        return filas
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.activar_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.activar_query_param,
+                'required': False,
+                'in': 'query',
+                'description': "Usar 'cursor' para paginar por keyset",
+                'schema': {'type': 'string', 'enum': ['cursor']},
+            },
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor opaco devuelto en next/previous',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Filas por página (máx. {self.max_page_size})',
+                'schema': {'type': 'integer'},
+            },
+        ]
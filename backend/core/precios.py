@@ -0,0 +1,172 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Max, OuterRef, Subquery, Value, When
+from django.db.models.functions import Ceil, Coalesce, Floor, Round
+from rest_framework import serializers
+
+from lotes.models import Lote
+from . import cambios
+from .models import AjustePrecio, PrecioHistorico, Producto
+
+
+# ==========================================================
+# AJUSTE MASIVO DE PRECIOS
+# ==========================================================
+# El precio nuevo se calcula en SQL con la misma expresión para la vista previa,
+# la lectura de los precios anteriores (para el historial) y el UPDATE: un
+# SELECT ... FOR UPDATE, un INSERT en bloque en PrecioHistorico y un UPDATE
+# por cada TAMANO_BLOQUE productos.
+
+TAMANO_BLOQUE = 1000
+MAX_VISTA_PREVIA = 1000
+CENTAVO = Decimal('0.01')
+_DECIMAL = DecimalField(max_digits=14, decimal_places=4)
+
+# Mayor precio que admite Producto.precio (max_digits=12, decimal_places=2)
+_campo_precio = Producto._meta.get_field('precio')
+PRECIO_MAXIMO = Decimal(10) ** (_campo_precio.max_digits - _campo_precio.decimal_places) - CENTAVO
+
+
+def _valor(numero):
+    return Value(Decimal(numero), output_field=_DECIMAL)
+
+
+def expresion_precio(tipo, valor, multiplo=Decimal('0.01'), direccion='CERCANO', restar=Decimal('0')):
+    """Expresión SQL del precio nuevo a partir de F('precio')."""
+    if tipo == 'PORCENTAJE':
+        base = F('precio') * _valor(1 + Decimal(valor) / 100)
+    elif tipo == 'MONTO':
+        base = F('precio') + _valor(valor)
+    elif tipo == 'PRECIO':
+        base = _valor(valor)
+    else:
+        raise ValueError(f"Tipo de ajuste desconocido: {tipo}")
+    base = ExpressionWrapper(base, output_field=_DECIMAL)
+
+    redondeo = {'CERCANO': Round, 'ARRIBA': Ceil, 'ABAJO': Floor}[direccion]
+    multiplo = _valor(multiplo)
+    precio = ExpressionWrapper(redondeo(base / multiplo) * multiplo - _valor(restar), output_field=_DECIMAL)
+    return Round(precio, 2, output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def filtrar(qs, marcas=None, categorias=None, categoria=None, ids=None, solo_activos=True):
+    """Productos alcanzados: cualquiera de las listas combinadas con AND."""
+    if marcas:
+        qs = qs.filter(marca_id__in=marcas)
+    if categorias:
+        qs = qs.filter(categoria_ref_id__in=categorias)
+    if categoria:
+        qs = qs.filter(categoria__iexact=categoria)
+    if ids:
+        qs = qs.filter(id__in=ids)
+    if solo_activos:
+        qs = qs.filter(activo=True)
+    return qs
+
+
+def _costo_reciente():
+    return Subquery(
+        Lote.objects.filter(producto=OuterRef('pk'), costo_unitario__isnull=False)
+        .order_by('-creado', '-id').values('costo_unitario')[:1]
+    )
+
+
+def calcular(filtros, tipo, valor, multiplo=Decimal('0.01'), direccion='CERCANO', restar=Decimal('0')):
+    """
+    Productos alcanzados con su precio nuevo anotado. Los que no cambian quedan
+    fuera; los que darían un precio <= 0 se informan aparte.
+    """
+    qs = (filtrar(Producto.objects.all(), **filtros)
+          .annotate(precio_nuevo=expresion_precio(tipo, valor, multiplo, direccion, restar)))
+    cambian = qs.exclude(precio_nuevo=F('precio'))
+    return cambian.filter(precio_nuevo__gt=0), cambian.filter(precio_nuevo__lte=0)
+
+
+def precio_nuevo_maximo(filtros, tipo, valor, **redondeo):
+    """Mayor precio que dejaría el ajuste (None si no alcanza a ningún producto)."""
+    validos, _ = calcular(filtros, tipo, valor, **redondeo)
+    return validos.aggregate(maximo=Max('precio_nuevo'))['maximo']
+
+
+def vista_previa(filtros, tipo, valor, **redondeo):
+    """Qué haría el ajuste, sin escribir: precios, variación y margen sobre el costo del último lote."""
+    validos, invalidos = calcular(filtros, tipo, valor, **redondeo)
+    filas = (validos.annotate(costo=_costo_reciente())
+             .order_by('id')
+             .values('id', 'nombre', 'precio', 'precio_nuevo', 'costo')[:MAX_VISTA_PREVIA])
+    productos = []
+    for fila in filas:
+        # Según la base el ROUND llega con más decimales: se muestra como quedará guardado
+        precio, nuevo, costo = fila['precio'], Decimal(fila['precio_nuevo']).quantize(CENTAVO), fila['costo']
+        productos.append({
+            'id': fila['id'],
+            'nombre': fila['nombre'],
+            'precio_actual': precio,
+            'precio_nuevo': nuevo,
+            'variacion_porcentaje': ((nuevo / precio - 1) * 100).quantize(CENTAVO) if precio else None,
+            'costo_reciente': costo,
+            'margen_actual': ((1 - costo / precio) * 100).quantize(CENTAVO) if costo is not None and precio else None,
+            'margen_nuevo': ((1 - costo / nuevo) * 100).quantize(CENTAVO) if costo is not None else None,
+        })
+    return {
+        'total': validos.count(),
+        'productos': productos,
+        'precio_invalido': list(invalidos.values_list('id', flat=True)[:MAX_VISTA_PREVIA]),
+    }
+
+
+def registrar(cambios_precio, origen, user=None, ajuste=None):
+    """cambios_precio = [(producto_id, precio_anterior, precio)]: un INSERT para todo el historial."""
+    PrecioHistorico.objects.bulk_create([
+        PrecioHistorico(
+            producto_id=producto_id, precio_anterior=anterior, precio=precio,
+            origen=origen, ajuste=ajuste, user=user,
+        )
+        for producto_id, anterior, precio in cambios_precio
+        if anterior != precio
+    ], batch_size=TAMANO_BLOQUE)
+
+
+def aplicar(filtros, tipo, valor, user=None, multiplo=Decimal('0.01'), direccion='CERCANO', restar=Decimal('0')):
+    """Aplica el ajuste y devuelve el AjustePrecio con `productos` = cantidad de precios cambiados."""
+    expresion = expresion_precio(tipo, valor, multiplo, direccion, restar)
+    with transaction.atomic():
+        validos, _ = calcular(filtros, tipo, valor, multiplo, direccion, restar)
+        filas = list(validos.select_for_update().order_by('id').values_list('id', 'precio', 'precio_nuevo'))
+        # El serializer ya lo validó; con las filas bloqueadas se vuelve a mirar por si cambiaron
+        if any(nuevo > PRECIO_MAXIMO for _, _, nuevo in filas):
+            raise serializers.ValidationError({"valor": f"El precio resultante supera el máximo admitido ({PRECIO_MAXIMO})"})
+        ajuste = AjustePrecio.objects.create(
+            tipo=tipo, valor=valor, multiplo=multiplo, direccion=direccion, restar=restar,
+            filtros=filtros, productos=len(filas), user=user,
+        )
+        registrar(filas, 'AJUSTE', user=user, ajuste=ajuste)
+        ids = [fila[0] for fila in filas]
+        for desde in range(0, len(ids), TAMANO_BLOQUE):
+            Producto.objects.filter(id__in=ids[desde:desde + TAMANO_BLOQUE]).update(precio=expresion)
+        cambios.registrar('producto', ids)
+    return ajuste
+
+
+def precios_al(producto_ids, fecha):
+    """
+    {producto_id: precio vigente en `fecha`} con una consulta sobre
+    precio_hist_producto_fecha_idx: el precio del último cambio anterior, si no el
+    precio_anterior del primer cambio posterior y si no hubo cambios, el actual.
+    Los productos creados después de `fecha` quedan en None.
+    """
+    historial = PrecioHistorico.objects.filter(producto=OuterRef('pk'))
+    filas = (Producto.objects
+             .filter(id__in=producto_ids)
+             .annotate(precio_al=Case(
+                 When(creado__gt=fecha, then=Value(None)),
+                 default=Coalesce(
+                     Subquery(historial.filter(fecha__lte=fecha).order_by('-fecha', '-id').values('precio')[:1]),
+                     Subquery(historial.filter(fecha__gt=fecha).order_by('fecha', 'id').values('precio_anterior')[:1]),
+                     F('precio'),
+                 ),
+                 output_field=DecimalField(max_digits=12, decimal_places=2),
+             ))
+             .values_list('id', 'precio_al'))
+    return dict(filas)
@@ -2,7 +2,9 @@ from .models import UserProfile
 from django.contrib.auth.models import User, Group
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
-from .models import Producto, EmpleadoProfile, UserProfile
+from .models import Producto, EmpleadoProfile, UserProfile, CodigoBarras, AjustePrecio, PrecioHistorico
+from .gs1 import normalizar_codigo
+from . import imagenes, precios
 from marcas.models import Marca
 from marcas.serializers import MarcaSerializer
 from productos.models import Categoria
@@ -17,6 +19,7 @@ import string
 import random
 import string
 import logging
+from decimal import Decimal
 
 logger = logging.getLogger(__name__)
 
@@ -162,6 +165,11 @@ class ProductoSerializer(serializers.ModelSerializer):
         source='marca', queryset=Marca.objects.all(), allow_null=True, required=False
     )
     marca = MarcaSerializer(read_only=True)
+    # Alta y baja de códigos por /api/codigos-barras/
+    codigos = serializers.SlugRelatedField(many=True, read_only=True, slug_field='codigo')
+    # Miniaturas WebP/JPEG por tamaño (core/imagenes.py); {} mientras se generan
+    imagen_variantes = serializers.SerializerMethodField()
+    imagen_miniatura = serializers.SerializerMethodField()
 
     class Meta:
         model = Producto
@@ -172,7 +180,8 @@ class ProductoSerializer(serializers.ModelSerializer):
             'categoria_nombre',   # derivado
             'marca_id',           # FK writable
             'marca',              # nested read-only
-            'imagen', 'creado'
+            'codigos',            # códigos de barras / SKU (read-only)
+            'imagen', 'imagen_variantes', 'imagen_miniatura', 'creado'
         ]
         read_only_fields = ['id', 'creado']
 
@@ -181,6 +190,19 @@ class ProductoSerializer(serializers.ModelSerializer):
             return obj.categoria_ref.nombre
         return obj.categoria or None
 
+    def get_imagen_variantes(self, obj):
+        return imagenes.variantes_urls(obj, self.context.get('request'))
+
+    def get_imagen_miniatura(self, obj):
+        # Para listados: la variante de TAMANO_MINIATURA px, o la original si todavía no existe
+        variante = self.get_imagen_variantes(obj).get(str(imagenes.TAMANO_MINIATURA))
+        if variante:
+            return variante['webp']
+        if not obj.imagen:
+            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(obj.imagen.url) if request else obj.imagen.url
+
     def validate_precio(self, value):
         if value <= 0:
             raise serializers.ValidationError("El precio debe ser mayor a 0")
@@ -191,6 +213,95 @@ class ProductoSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("La cantidad no puede ser negativa")
         return value
 
+class CodigoBarrasSerializer(serializers.ModelSerializer):
+    producto_nombre = serializers.CharField(source='producto.nombre', read_only=True)
+
+    class Meta:
+        model = CodigoBarras
+        fields = ['id', 'codigo', 'producto', 'producto_nombre', 'lote', 'creado']
+        read_only_fields = ['id', 'creado']
+        # La unicidad se valida sobre el código normalizado (validate_codigo)
+        extra_kwargs = {'codigo': {'validators': []}}
+
+    def validate_codigo(self, value):
+        codigo = normalizar_codigo(value)
+        if not codigo:
+            raise serializers.ValidationError("El código no puede estar vacío")
+        existente = CodigoBarras.objects.filter(codigo=codigo)
+        if self.instance is not None:
+            existente = existente.exclude(pk=self.instance.pk)
+        if existente.exists():
+            raise serializers.ValidationError(f"El código {codigo} ya está asignado a otro producto")
+        return codigo
+
+    def validate(self, attrs):
+        producto = attrs.get('producto', getattr(self.instance, 'producto', None))
+        lote = attrs.get('lote', getattr(self.instance, 'lote', None))
+        if lote is not None and lote.producto_id != producto.id:
+            raise serializers.ValidationError({"lote": "El lote no pertenece al producto"})
+        return attrs
+
+class ImportarCatalogoSerializer(serializers.Serializer):
+    ENTIDADES = ('producto', 'cliente', 'proveedor', 'marca', 'categoria')
+
+    entidad = serializers.ChoiceField(choices=ENTIDADES)
+    # Archivo CSV/XLSX/JSON/JSONL (multipart) o las filas en el cuerpo JSON
+    archivo = serializers.FileField(required=False)
+    filas = serializers.ListField(child=serializers.DictField(), required=False, allow_empty=False, max_length=5000)
+    modo = serializers.ChoiceField(choices=('upsert', 'crear', 'actualizar'), default='upsert')
+    # Dar de alta las marcas y categorías que no existan (productos)
+    crear_relacionados = serializers.BooleanField(default=False)
+    simular = serializers.BooleanField(default=False)
+    # Informar todas las filas y no sólo las que tienen errores
+    detalle = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if bool(attrs.get('archivo')) == bool(attrs.get('filas')):
+            raise serializers.ValidationError({"detail": "Indique archivo o filas (uno de los dos)"})
+        return attrs
+
+class AjustePreciosSerializer(serializers.Serializer):
+    # Filtros (combinados con AND); hace falta al menos uno
+    marcas = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    categorias = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    categoria = serializers.CharField(max_length=80, required=False)
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, max_length=10000)
+    solo_activos = serializers.BooleanField(default=True)
+
+    tipo = serializers.ChoiceField(choices=AjustePrecio.TIPOS)
+    valor = serializers.DecimalField(max_digits=12, decimal_places=2)
+    multiplo = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'), default=Decimal('0.01'))
+    direccion = serializers.ChoiceField(choices=AjustePrecio.DIRECCIONES, default='CERCANO')
+    restar = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0'), default=Decimal('0'))
+    # Vista previa: calcula y devuelve los precios nuevos sin escribir
+    simular = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if not any(attrs.get(filtro) for filtro in ('marcas', 'categorias', 'categoria', 'ids')):
+            raise serializers.ValidationError({"detail": "Indique al menos un filtro: marcas, categorias, categoria o ids"})
+        if attrs['tipo'] == 'PORCENTAJE' and attrs['valor'] <= -100:
+            raise serializers.ValidationError({"valor": "El porcentaje debe ser mayor a -100"})
+        if attrs['tipo'] == 'PRECIO' and attrs['valor'] <= 0:
+            raise serializers.ValidationError({"valor": "El precio debe ser mayor a 0"})
+        # El precio nuevo tiene que entrar en Producto.precio (max_digits=12, decimal_places=2)
+        filtros = {clave: attrs[clave] for clave in ('marcas', 'categorias', 'categoria', 'ids', 'solo_activos') if clave in attrs}
+        maximo = precios.precio_nuevo_maximo(
+            filtros, attrs['tipo'], attrs['valor'],
+            multiplo=attrs['multiplo'], direccion=attrs['direccion'], restar=attrs['restar'],
+        )
+        if maximo is not None and maximo > precios.PRECIO_MAXIMO:
+            raise serializers.ValidationError({
+                "valor": f"El precio resultante ({Decimal(maximo).quantize(precios.CENTAVO)}) supera el máximo admitido ({precios.PRECIO_MAXIMO})"
+            })
+        return attrs
+
+class PrecioHistoricoSerializer(serializers.ModelSerializer):
+    usuario = serializers.CharField(source='user.username', read_only=True, default=None)
+
+    class Meta:
+        model = PrecioHistorico
+        fields = ['id', 'fecha', 'precio_anterior', 'precio', 'origen', 'ajuste', 'usuario']
+
 class EmpleadoCreateSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         email = validated_data.get('email', instance.email)
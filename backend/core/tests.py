@@ -1,3 +1,174 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from . import cambios, importacion
+from .gs1 import normalizar_codigo
+from .models import CambioCatalogo, CodigoBarras, Producto
+
+
+@override_settings(CATALOGO_MARGEN_SEGUNDOS=0)
+class SincronizacionCatalogoTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('gerente', 'gerente@example.com', 'x')
+        user.groups.add(Group.objects.get_or_create(name='gerente')[0])
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.productos = [Producto.objects.create(nombre=f'P{i}', precio=Decimal('10')) for i in range(3)]
+
+    def version(self):
+        respuesta = self.client.get('/api/productos/')
+        return int(respuesta[cambios.HEADER_VERSION])
+
+    def delta(self, since):
+        respuesta = self.client.get('/api/productos/', {'since': since})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_delta_con_altas_modificaciones_y_bajas(self):
+        version = self.version()
+        self.assertEqual(self.delta(version)['cambios'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo = Producto.objects.create(nombre='Nuevo', precio=Decimal('5'))
+            self.productos[0].nombre = 'Renombrado'
+            self.productos[0].save()
+            borrado = self.productos[1].pk
+            self.productos[1].delete()
+        delta = self.delta(version)
+        self.assertEqual(sorted(p['id'] for p in delta['cambios']), sorted([nuevo.pk, self.productos[0].pk]))
+        self.assertEqual(delta['eliminados'], [borrado])
+        self.assertGreater(delta['version'], version)
+        self.assertEqual(self.delta(delta['version'])['cambios'], [])
+
+    def test_la_version_sigue_el_orden_de_los_commits(self):
+        version = self.version()
+        # Una transacción larga cambia un producto pero todavía no confirmó
+        with self.captureOnCommitCallbacks() as pendientes_larga:
+            cambios.registrar('producto', [self.productos[0].pk])
+        self.assertFalse(CambioCatalogo.objects.filter(id__gt=version).exists())
+        # Otra más corta confirma antes y un cliente avanza su versión
+        with self.captureOnCommitCallbacks(execute=True):
+            cambios.registrar('producto', [self.productos[1].pk])
+        delta = self.delta(version)
+        self.assertEqual([p['id'] for p in delta['cambios']], [self.productos[1].pk])
+        # Al confirmar la larga, su cambio queda por encima de lo que el cliente ya leyó
+        for callback in pendientes_larga:
+            callback()
+        self.assertEqual([p['id'] for p in self.delta(delta['version'])['cambios']], [self.productos[0].pk])
+
+    def test_savepoint_deshecho_no_anota_cambios(self):
+        version = self.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    cambios.registrar('producto', [self.productos[2].pk], eliminado=True)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertFalse(CambioCatalogo.objects.filter(id__gt=version).exists())
+
+
+class ImportacionCatalogoTests(TestCase):
+    def setUp(self):
+        self.existente = Producto.objects.create(nombre='Yerba', precio=Decimal('10'))
+        CodigoBarras.objects.create(codigo='7790001000012', producto=self.existente)
+
+    def importar(self, filas, **opciones):
+        return importacion.importar('producto', enumerate(filas, start=1), **opciones)
+
+    def test_upsert_por_id_y_por_codigo(self):
+        filas = [
+            {'codigo': '7790001000012', 'precio': '12'},
+            {'codigo': '7790001000029', 'nombre': 'Fideos', 'precio': '5'},
+            {'id': self.existente.pk, 'codigo': '7790001000029', 'nombre': 'Otro'},
+            {'id': 999999, 'nombre': 'X', 'precio': '1'},
+        ]
+        resultado = self.importar(filas)
+        acciones = [(f['fila'], f['accion']) for f in resultado['filas']]
+        self.assertEqual(acciones, [(1, 'actualizado'), (2, 'creado'), (3, 'error'), (4, 'error')])
+        self.existente.refresh_from_db()
+        self.assertEqual(self.existente.precio, Decimal('12'))
+        nuevo = Producto.objects.get(pk=resultado['filas'][1]['id'])
+        self.assertEqual(CodigoBarras.objects.get(codigo=normalizar_codigo('7790001000029')).producto_id, nuevo.pk)
+        # La misma importación otra vez: nada cambia y no se duplica nada
+        resultado = self.importar(filas[:2])
+        self.assertEqual([f['accion'] for f in resultado['filas']], ['sin_cambios', 'sin_cambios'])
+        self.assertEqual(Producto.objects.count(), 2)
+
+    def test_altas_sin_ids_devueltos_por_la_base(self):
+        # Como en MySQL: bulk_create no devuelve ids y se buscan por la clave de alta
+        filas = [
+            {'codigo': '7790001000029', 'nombre': 'Fideos', 'precio': '5'},
+            {'codigo': '7790001000036', 'nombre': 'Fideos', 'precio': '6'},
+            {'nombre': 'Yerba', 'precio': '7'},
+        ]
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            resultado = self.importar(filas)
+        ids = [f['id'] for f in resultado['filas']]
+        self.assertEqual([f['accion'] for f in resultado['filas']], ['creado', 'creado', 'actualizado'])
+        self.assertEqual(ids[2], self.existente.pk)
+        self.assertEqual(
+            [(p.nombre, p.precio) for p in Producto.objects.filter(pk__in=ids[:2]).order_by('id')],
+            [('Fideos', Decimal('5')), ('Fideos', Decimal('6'))],
+        )
+        self.assertEqual(CodigoBarras.objects.get(codigo=normalizar_codigo('7790001000036')).producto_id, ids[1])
+
+    def test_alta_concurrente_con_la_misma_clave_es_conflicto(self):
+        bulk_create = Producto.objects.bulk_create
+
+        def con_otra_alta(objetos, *args, **kwargs):
+            # Otra transacción confirma un producto con el mismo nombre entre el máximo y la lectura
+            Producto.objects.create(nombre='Fideos', precio=Decimal('1'))
+            return bulk_create(objetos, *args, **kwargs)
+
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+                mock.patch.object(Producto.objects, 'bulk_create', side_effect=con_otra_alta):
+            resultado = self.importar([{'nombre': 'Fideos', 'precio': '5'}])
+        fila = resultado['filas'][0]
+        self.assertEqual(fila['accion'], 'error')
+        self.assertIn('No se pudieron identificar las altas', str(fila['errores']))
+        self.assertFalse(Producto.objects.filter(precio=Decimal('5')).exists())
+
+
+class AjustePreciosTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('gerente', 'gerente@example.com', 'x')
+        user.groups.add(Group.objects.get_or_create(name='gerente')[0])
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.productos = [
+            Producto.objects.create(nombre='A', precio=Decimal('99.99')),
+            Producto.objects.create(nombre='B', precio=Decimal('10.40')),
+        ]
+        self.ids = [p.pk for p in self.productos]
+
+    def ajustar(self, **datos):
+        return self.client.post('/api/productos/ajustar-precios/', {'ids': self.ids, **datos}, format='json')
+
+    def test_redondeo_vista_previa_igual_a_lo_aplicado(self):
+        # +10%: 109.989 y 11.44 -> múltiplo de 1 hacia arriba (110, 12) menos 0.01
+        ajuste = {'tipo': 'PORCENTAJE', 'valor': '10', 'multiplo': '1', 'direccion': 'ARRIBA', 'restar': '0.01'}
+        previa = self.ajustar(simular=True, **ajuste)
+        self.assertEqual(previa.status_code, 200)
+        nuevos = {fila['id']: Decimal(str(fila['precio_nuevo'])) for fila in previa.json()['productos']}
+        self.assertEqual(nuevos, {self.ids[0]: Decimal('109.99'), self.ids[1]: Decimal('11.99')})
+
+        respuesta = self.ajustar(**ajuste)
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.json()['productos'], 2)
+        guardados = dict(Producto.objects.filter(pk__in=self.ids).values_list('id', 'precio'))
+        self.assertEqual(guardados, nuevos)
+        historial = self.productos[0].historial_precios.values_list('precio_anterior', 'precio', 'origen')
+        self.assertEqual(list(historial), [(Decimal('99.99'), Decimal('109.99'), 'AJUSTE')])
+
+    def test_precio_resultante_fuera_del_campo(self):
+        Producto.objects.filter(pk=self.ids[0]).update(precio=Decimal('9999999000.00'))
+        respuesta = self.ajustar(tipo='PORCENTAJE', valor='10')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('máximo admitido', str(respuesta.json()['valor']))
+        self.assertEqual(Producto.objects.get(pk=self.ids[1]).precio, Decimal('10.40'))
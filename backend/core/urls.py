@@ -1,9 +1,10 @@
 from django.urls import path
 from .views import ping
-from .views import UserProfileDetail, ChangePasswordView
+from .views import UserProfileDetail, ChangePasswordView, ImportarCatalogoView
 
 urlpatterns = [
     path('api/ping/', ping),
     path('api/user-profile/<int:pk>/', UserProfileDetail.as_view(), name='user-profile-detail'),
     path('api/change-password/', ChangePasswordView.as_view(), name='change-password'),
+    path('api/importar-catalogo/', ImportarCatalogoView.as_view(), name='importar-catalogo'),
 ]
@@ -1,16 +1,23 @@
 from django.contrib.auth.models import User, Group
+from django.db import transaction
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework import viewsets, status
+from rest_framework import viewsets, status, serializers
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework import parsers
 from rest_framework_simplejwt.views import TokenObtainPairView
-from .models import Producto
+from .models import Producto, CodigoBarras
+from . import codigos
+from .cambios import SincronizacionMixin
+from .pagination import KeysetPagination
+from lotes import kardex
 from lotes.models import Lote
-from lotes.serializers import LoteSerializer
-from .serializers import ProductoSerializer
+from lotes.serializers import LoteSerializer, KardexFiltroSerializer
+from .serializers import ProductoSerializer, CodigoBarrasSerializer, ImportarCatalogoSerializer
+from .serializers import AjustePreciosSerializer, PrecioHistoricoSerializer
+from . import importacion, precios
 from .serializers import UserSerializer
 from .serializers import EmpleadoCreateSerializer, EmpleadoSerializer
 from .serializers import CustomTokenObtainPairSerializer
@@ -68,11 +75,13 @@ class UserViewSet(viewsets.ModelViewSet):
 
 
 # ViewSet para operaciones CRUD completas de productos
-class ProductoViewSet(viewsets.ModelViewSet):
-    queryset = Producto.objects.all()
+class ProductoViewSet(SincronizacionMixin, viewsets.ModelViewSet):
+    entidad_cambios = 'producto'
+    queryset = Producto.objects.prefetch_related('codigos')
     serializer_class = ProductoSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = None  # Desactivar paginación para devolver todos los productos
+    pagination_class = KeysetPagination  # Lista completa salvo ?paginacion=cursor
+    keyset_ordering = ('-creado', '-id')
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['categoria', 'categoria_ref', 'marca']
     search_fields = ['nombre', 'categoria', 'categoria_ref__nombre', 'marca__nombre_marca']
@@ -102,7 +111,11 @@ class ProductoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         
         if serializer.is_valid():
-            serializer.save()
+            # El precio y su historial se guardan juntos; el anterior se lee con la fila bloqueada
+            with transaction.atomic():
+                precio_anterior = Producto.objects.select_for_update().values_list('precio', flat=True).get(pk=instance.pk)
+                serializer.save()
+                precios.registrar([(instance.id, precio_anterior, instance.precio)], 'MANUAL', user=request.user)
             return Response({
                 'message': 'Producto actualizado exitosamente',
                 'data': serializer.data
@@ -140,20 +153,194 @@ class ProductoViewSet(viewsets.ModelViewSet):
         except ValueError:
             umbral = 10
         
-        productos = Producto.objects.filter(cantidad__lt=umbral).order_by('cantidad')
+        productos = self.get_queryset().filter(cantidad__lt=umbral).order_by('cantidad')
         serializer = self.get_serializer(productos, many=True)
         return Response({
             'message': f'Productos con menos de {umbral} unidades',
             'data': serializer.data
         })
 
+    @action(detail=True, methods=['patch'])
+    def actualizar_stock(self, request, pk=None):
+        """Actualizar solo el stock de un producto (ajusta sus lotes y queda en el kardex)"""
+        producto = self.get_object()
+        nueva_cantidad = request.data.get('cantidad')
+
+        if nueva_cantidad is None:
+            return Response({
+                'message': 'Debe proporcionar la nueva cantidad'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            nueva_cantidad = int(nueva_cantidad)
+            if nueva_cantidad < 0:
+                raise ValueError("La cantidad no puede ser negativa")
+        except ValueError as e:
+            return Response({
+                'message': f'Error en la cantidad: {str(e)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        kardex.ajustar_producto(producto, nueva_cantidad, user=request.user, notas=request.data.get('notas'))
+        producto.refresh_from_db()
+        serializer = self.get_serializer(producto)
+        return Response({
+            'message': f'Stock actualizado a {nueva_cantidad} unidades',
+            'data': serializer.data
+        })
+
+    @action(detail=True, methods=['get'])
+    def lotes(self, request, pk=None):
+        """Historial de lotes del producto"""
+        producto = self.get_object()
+        lotes = Lote.objects.filter(producto=producto).select_related('producto', 'compra__id_proveedor').order_by('-creado')
+        serializer = LoteSerializer(lotes, many=True)
+        return Response({
+            'producto': producto.id,
+            'total_lotes': len(serializer.data),
+            'data': serializer.data
+        })
+
+    @action(detail=True, methods=['get'], url_path='kardex')
+    def kardex_producto(self, request, pk=None):
+        """Movimientos de stock del producto con saldo corrido (?desde=, ?hasta= en ISO 8601)"""
+        producto = self.get_object()
+        filtro = KardexFiltroSerializer(data=request.query_params)
+        filtro.is_valid(raise_exception=True)
+        saldo_inicial, movimientos = kardex.kardex(producto_id=producto.id, **filtro.validated_data)
+        return Response({
+            'producto': producto.id,
+            'saldo_inicial': saldo_inicial,
+            'saldo_final': movimientos[-1]['saldo'] if movimientos else saldo_inicial,
+            'movimientos': movimientos,
+        })
+
+    @action(detail=True, methods=['get'], url_path='stock-historico')
+    def stock_historico(self, request, pk=None):
+        """Stock del producto a una fecha: ?fecha= (ISO 8601)"""
+        producto = self.get_object()
+        fecha = serializers.DateTimeField().run_validation(request.query_params.get('fecha'))
+        return Response({
+            'producto': producto.id,
+            'fecha': fecha,
+            'cantidad': kardex.saldo_al(producto.id, fecha),
+        })
+
+    @action(detail=False, methods=['post'], url_path='ajustar-precios')
+    def ajustar_precios(self, request):
+        """
+        Ajuste masivo por porcentaje, monto o precio fijo, con redondeo, sobre los
+        productos filtrados por marcas, categorias, categoria (texto) o ids.
+        Con simular=true devuelve la vista previa sin escribir.
+        """
+        ser = AjustePreciosSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        datos = dict(ser.validated_data)
+        filtros = {clave: datos.pop(clave) for clave in ('marcas', 'categorias', 'categoria', 'ids', 'solo_activos') if clave in datos}
+        simular = datos.pop('simular')
+        if simular:
+            return Response(precios.vista_previa(filtros, **datos))
+        ajuste = precios.aplicar(filtros, user=request.user, **datos)
+        return Response({
+            'ajuste_id': ajuste.id,
+            'productos': ajuste.productos,
+            'fecha': ajuste.fecha,
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'], url_path='historial-precios')
+    def historial_precios(self, request, pk=None):
+        """Cambios de precio del producto, del más reciente al más antiguo"""
+        producto = self.get_object()
+        historial = producto.historial_precios.select_related('user').order_by('-fecha', '-id')
+        return Response({
+            'producto': producto.id,
+            'precio_actual': producto.precio,
+            'data': PrecioHistoricoSerializer(historial, many=True).data,
+        })
+
+    @action(detail=False, methods=['get'], url_path='precios-al')
+    def precios_al(self, request):
+        """Precio vigente a una fecha de varios productos: ?fecha= (ISO 8601)&productos=1,2,3 (hasta 1000)"""
+        fecha = serializers.DateTimeField().run_validation(request.query_params.get('fecha'))
+        crudos = [v for valor in request.query_params.getlist('productos') for v in valor.split(',') if v.strip()]
+        try:
+            producto_ids = list(dict.fromkeys(int(v) for v in crudos))
+        except ValueError:
+            return Response({"detail": "productos debe ser una lista de ids separados por coma"}, status=status.HTTP_400_BAD_REQUEST)
+        if not producto_ids or len(producto_ids) > 1000:
+            return Response({"detail": "Indique entre 1 y 1000 productos"}, status=status.HTTP_400_BAD_REQUEST)
+        vigentes = precios.precios_al(producto_ids, fecha)
+        return Response({
+            'fecha': fecha,
+            'precios': [{'producto_id': pid, 'precio': vigentes[pid]} for pid in producto_ids if pid in vigentes],
+        })
+
+    @action(detail=False, methods=['get'], url_path=r'scan/(?P<codigo>[^/]+)')
+    def scan(self, request, codigo=None):
+        """
+        Lectura del escáner (EAN/UPC, SKU o GS1 con lote y vencimiento): producto,
+        precio y lotes vendibles en orden FEFO. Se sirve desde el caché de códigos
+        del proceso (core/codigos.py); el stock reservado no se incluye.
+        """
+        resultado = codigos.resolver(codigo)
+        if resultado is None:
+            return Response({"detail": f"Código no registrado: {codigo}"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(resultado)
+
+    @action(detail=False, methods=['post'], url_path='scan')
+    def scan_varios(self, request):
+        """Varias lecturas en una llamada: {"codigos": [...]} (hasta 500)."""
+        lecturas = request.data.get('codigos')
+        if not isinstance(lecturas, list) or not lecturas:
+            return Response({"detail": "Indique codigos: una lista de lecturas"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(lecturas) > 500:
+            return Response({"detail": "Máximo 500 códigos por consulta"}, status=status.HTTP_400_BAD_REQUEST)
+        resultados, no_encontrados = codigos.resolver_varios([str(lectura) for lectura in lecturas])
+        return Response({'productos': resultados, 'no_encontrados': no_encontrados})
+
+
+# ViewSet para alta/baja de códigos de barras y SKU de los productos
+class CodigoBarrasViewSet(viewsets.ModelViewSet):
+    queryset = CodigoBarras.objects.select_related('producto').order_by('id')
+    serializer_class = CodigoBarrasSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = None  # Se consulta por producto o código: pocas filas
+    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filterset_fields = ['producto', 'lote']
+    search_fields = ['codigo']
+
 
 # Endpoint de salud para /api/ping/
 @csrf_exempt
 def ping(request):
     return JsonResponse({"status": "ok"}, status=200)
 
-@action(detail=True, methods=['patch'])
+# Carga masiva del catálogo (productos, clientes, proveedores, marcas, categorías)
+class ImportarCatalogoView(APIView):
+    """
+    Alta y actualización en bloque por clave natural, desde un archivo
+    (CSV/XLSX/JSON/JSONL) o {"entidad", "filas": [...]} en JSON. Devuelve un resumen
+    y las filas con errores (todas con detalle=true). Para archivos muy grandes
+    usar `manage.py importar_catalogo`.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [parsers.MultiPartParser, parsers.FormParser, parsers.JSONParser]
+
+    def post(self, request):
+        ser = ImportarCatalogoSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        datos = ser.validated_data
+        if datos.get('archivo'):
+            registros = importacion.leer_registros(datos['archivo'], datos['archivo'].name)
+        else:
+            registros = enumerate(datos['filas'], start=1)
+        resultado = importacion.importar(
+            datos['entidad'], registros,
+            modo=datos['modo'], crear_relacionados=datos['crear_relacionados'], simular=datos['simular'],
+            user=request.user,
+        )
+        if not datos['detalle']:
+            resultado['filas'] = [fila for fila in resultado['filas'] if fila['accion'] == 'error']
+        return Response(resultado, status=status.HTTP_200_OK)
 
 # Endpoint para cambio de contraseña
 class ChangePasswordView(APIView):
@@ -174,45 +361,6 @@ class ChangePasswordView(APIView):
             user.profile.must_change_password = False
             user.profile.save()
         return Response({'detail': 'Contraseña cambiada correctamente.'}, status=status.HTTP_200_OK)
-    def actualizar_stock(self, request, pk=None):
-        """Actualizar solo el stock de un producto"""
-        producto = self.get_object()
-        nueva_cantidad = request.data.get('cantidad')
-        
-        if nueva_cantidad is None:
-            return Response({
-                'message': 'Debe proporcionar la nueva cantidad'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        try:
-            nueva_cantidad = int(nueva_cantidad)
-            if nueva_cantidad < 0:
-                raise ValueError("La cantidad no puede ser negativa")
-            
-            producto.cantidad = nueva_cantidad
-            producto.save()
-            
-            serializer = self.get_serializer(producto)
-            return Response({
-                'message': f'Stock actualizado a {nueva_cantidad} unidades',
-                'data': serializer.data
-            })
-        except ValueError as e:
-            return Response({
-                'message': f'Error en la cantidad: {str(e)}'
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-    @action(detail=True, methods=['get'])
-    def lotes(self, request, pk=None):
-        """Historial de lotes del producto"""
-        producto = self.get_object()
-        lotes = Lote.objects.filter(producto=producto).order_by('-creado')
-        serializer = LoteSerializer(lotes, many=True)
-        return Response({
-            'producto': producto.id,
-            'total_lotes': lotes.count(),
-            'data': serializer.data
-        })
 
 # ViewSet para operaciones CRUD completas de empleados
 class EmpleadoViewSet(viewsets.ModelViewSet):
@@ -226,7 +374,8 @@ class EmpleadoViewSet(viewsets.ModelViewSet):
             return EmpleadoSerializer
         return EmpleadoCreateSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = None  # Desactivar paginación para devolver todos los empleados
+    pagination_class = KeysetPagination  # Lista completa salvo ?paginacion=cursor
+    keyset_ordering = ('id',)
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['user__email']  # Permite filtrar por email
     search_fields = ['user__username', 'user__email', 'numero_empleado']
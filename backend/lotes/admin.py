@@ -1,3 +1,21 @@
 from django.contrib import admin
+from .models import MovimientoStock
 
 # Register your models here.
+
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(admin.ModelAdmin):
+    # Libro append-only: sólo lectura
+    list_display = ('fecha', 'producto', 'lote', 'tipo', 'cantidad', 'ref_type', 'ref_id', 'user')
+    list_filter = ('tipo',)
+    search_fields = ('producto__nombre', 'lote__numero_lote')
+    raw_id_fields = ('producto', 'lote', 'user')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
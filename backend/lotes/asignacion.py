@@ -0,0 +1,130 @@
+from datetime import date
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Lote
+
+
+# ==========================================================
+# ESTRATEGIAS DE ASIGNACIÓN DE LOTES
+# ==========================================================
+# Cada estrategia es una función clave de ordenamiento sobre Lote:
+# los lotes se consumen en el orden que devuelve sorted(lotes, key=estrategia).
+
+def orden_fefo(lote):
+    """First Expired, First Out: vence antes, sale antes. Sin vencimiento va al final."""
+    return (
+        lote.fecha_vencimiento is None,
+        lote.fecha_vencimiento or date.max,
+        lote.creado,
+        lote.id,
+    )
+
+
+def orden_fifo(lote):
+    """First In, First Out: el lote más antiguo sale primero."""
+    return (lote.creado, lote.id)
+
+
+def orden_costo(lote):
+    """Primero el lote de menor costo_unitario_final; desempata por FEFO."""
+    costo = lote.costo_unitario_final()
+    return (costo is None, costo or 0) + orden_fefo(lote)
+
+
+ESTRATEGIAS = {
+    'FEFO': orden_fefo,
+    'FIFO': orden_fifo,
+    'COSTO': orden_costo,
+}
+
+
+def registrar_estrategia(nombre, clave):
+    """Permite sumar estrategias propias (p.ej. desde AppConfig.ready)."""
+    ESTRATEGIAS[nombre.upper()] = clave
+
+
+def obtener_estrategia(nombre=None):
+    """
+    Devuelve la función de orden de una estrategia registrada o, si no se indica,
+    la configurada. `nombre` puede venir de un request: nunca se importa.
+    """
+    if not nombre:
+        return obtener_estrategia_configurada()
+    clave = ESTRATEGIAS.get(str(nombre).upper())
+    if clave is None:
+        raise ValueError(f"Estrategia de asignación desconocida: {nombre}")
+    return clave
+
+
+def obtener_estrategia_configurada():
+    """La de settings.LOTES_ESTRATEGIA_ASIGNACION: nombre registrado o ruta importable."""
+    nombre = getattr(settings, 'LOTES_ESTRATEGIA_ASIGNACION', 'FEFO')
+    clave = ESTRATEGIAS.get(str(nombre).upper())
+    if clave is None and '.' in str(nombre):
+        clave = import_string(nombre)
+    if not callable(clave):
+        raise ValueError(f"Estrategia de asignación desconocida: {nombre}")
+    return clave
+
+
+def filtro_vendibles(hoy=None):
+    """Lotes activos, con stock y no vencidos (coincide con el índice lote_vendible_idx)."""
+    hoy = hoy or timezone.localdate()
+    return (
+        Q(activo=True, cantidad_disponible__gt=0)
+        & (Q(fecha_vencimiento__isnull=True) | Q(fecha_vencimiento__gte=hoy))
+    )
+
+
+def es_vendible(lote, hoy=None):
+    """Equivalente en memoria de filtro_vendibles() para un lote ya cargado."""
+    hoy = hoy or timezone.localdate()
+    return (
+        lote.activo and lote.cantidad_disponible > 0
+        and (lote.fecha_vencimiento is None or lote.fecha_vencimiento >= hoy)
+    )
+
+
+def asignar(lotes, cantidad, estrategia, disponible):
+    """
+    Reparte `cantidad` entre `lotes` siguiendo `estrategia`.
+
+    `disponible` es un dict lote_id -> unidades libres que se va descontando,
+    de modo que varias líneas del mismo ticket no asignen dos veces la misma unidad.
+    Devuelve (asignaciones, faltante) con asignaciones = [(lote, unidades), ...].
+    """
+    asignaciones = []
+    restante = cantidad
+    for lote in sorted(lotes, key=estrategia):
+        if restante <= 0:
+            break
+        libre = disponible.get(lote.id, 0)
+        if libre <= 0:
+            continue
+        tomar = min(libre, restante)
+        disponible[lote.id] = libre - tomar
+        asignaciones.append((lote, tomar))
+        restante -= tomar
+    return asignaciones, restante
+
+
+def lotes_vendibles(producto_ids, hoy=None):
+    """
+    {producto_id: [lotes vendibles en orden FEFO]} en una sola consulta sobre
+    lote_vendible_idx. Trae sólo las columnas que usan la asignación y el POS.
+    """
+    por_producto = {producto_id: [] for producto_id in producto_ids}
+    lotes = (Lote.objects
+             .filter(Q(producto_id__in=por_producto) & filtro_vendibles(hoy))
+             .only('id', 'producto_id', 'numero_lote', 'cantidad_inicial', 'cantidad_disponible',
+                   'costo_unitario', 'descuento_tipo', 'descuento_valor', 'fecha_vencimiento', 'creado', 'activo')
+             .order_by())
+    for lote in lotes:
+        por_producto[lote.producto_id].append(lote)
+    for lista in por_producto.values():
+        lista.sort(key=orden_fefo)
+    return por_producto
@@ -0,0 +1,295 @@
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import serializers
+
+from core import codigos
+from . import kardex
+from .asignacion import asignar, obtener_estrategia
+from .models import ConteoInventario, ConteoLinea, Lote, MovimientoStock, diferir_recalculo_stock, recalcular_stock_productos
+
+
+# ==========================================================
+# CONTEOS DE INVENTARIO
+# ==========================================================
+# abrir() congela el disponible de los lotes del alcance; contar() recibe los
+# conteos en lote (por lote o por producto); diferencias() y aplicar() trabajan
+# sobre ConteoLinea con consultas agrupadas, sin una petición por lote.
+# Un lote del alcance que aparece con el conteo abierto (p.ej. una compra) se
+# suma al contarlo, con su disponible al corte: lo que entró después llega como
+# movimientos y diferencias() ya lo concilia.
+
+TAMANO_BLOQUE = 500
+
+
+def abrir(user, categoria=None, marca=None, notas=None):
+    """Crea el conteo y congela el disponible de cada lote con stock o activo del alcance."""
+    with transaction.atomic():
+        conteo = ConteoInventario.objects.create(
+            user=user, categoria=categoria, marca=marca, notas=notas,
+            corte_movimiento=MovimientoStock.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0,
+        )
+        lotes = _alcance(Lote.objects.filter(Q(cantidad_disponible__gt=0) | Q(activo=True)), conteo)
+        filas = lotes.order_by('id').values_list('id', 'producto_id', 'cantidad_disponible')
+        bloque = []
+        for lote_id, producto_id, cantidad in filas.iterator(chunk_size=2000):
+            bloque.append(ConteoLinea(conteo=conteo, lote_id=lote_id, producto_id=producto_id, esperado=cantidad))
+            if len(bloque) >= TAMANO_BLOQUE:
+                ConteoLinea.objects.bulk_create(bloque)
+                bloque = []
+        ConteoLinea.objects.bulk_create(bloque)
+    return conteo
+
+
+def _alcance(lotes, conteo):
+    if conteo.categoria_id:
+        lotes = lotes.filter(producto__categoria_ref=conteo.categoria_id)
+    if conteo.marca_id:
+        lotes = lotes.filter(producto__marca=conteo.marca_id)
+    return lotes
+
+
+def _sumar_lotes_nuevos(conteo, lote_ids, producto_ids):
+    """
+    Agrega las líneas de los lotes del alcance que no estaban al abrir (de los
+    lotes o productos que se están contando). Su esperado es el disponible al
+    corte: el actual menos los movimientos posteriores (0 para un lote comprado
+    durante el conteo).
+    """
+    en_conteo = ConteoLinea.objects.filter(conteo=conteo, lote__isnull=False).values('lote')
+    posteriores = (MovimientoStock.objects
+                   .filter(lote=OuterRef('pk'), id__gt=conteo.corte_movimiento)
+                   .order_by().values('lote').annotate(total=Sum('cantidad')).values('total'))
+    nuevos = (_alcance(Lote.objects.filter(Q(id__in=lote_ids) | Q(producto_id__in=producto_ids)), conteo)
+              .exclude(id__in=en_conteo)
+              .annotate(movimientos=Coalesce(Subquery(posteriores), 0))
+              .order_by('id')
+              .values_list('id', 'producto_id', 'cantidad_disponible', 'movimientos'))
+    ConteoLinea.objects.bulk_create([
+        ConteoLinea(conteo=conteo, lote_id=lote_id, producto_id=producto_id, esperado=max(disponible - movimientos, 0))
+        for lote_id, producto_id, disponible, movimientos in nuevos
+    ])
+
+
+def lotes_contados():
+    """
+    Para anotar sobre ConteoInventario: líneas de lote ya contadas, por lote o
+    porque su producto se contó entero (las líneas sin lote no suman aparte).
+    """
+    entero = ConteoLinea.objects.filter(
+        conteo=OuterRef('conteo'), producto=OuterRef('producto'), lote__isnull=True, contado__isnull=False,
+    )
+    contadas = (ConteoLinea.objects
+                .filter(Q(contado__isnull=False) | Exists(entero), conteo=OuterRef('pk'), lote__isnull=False)
+                .order_by().values('conteo').annotate(total=Count('id')).values('total'))
+    return Coalesce(Subquery(contadas), 0)
+
+
+def _abierto(conteo_id):
+    conteo = ConteoInventario.objects.select_for_update().get(pk=conteo_id)
+    if conteo.estado != 'ABIERTO':
+        raise serializers.ValidationError({"detail": f"El conteo #{conteo.id} está {conteo.get_estado_display().lower()}"})
+    return conteo
+
+
+def _resolver_codigos(items):
+    """
+    Convierte los items con `codigo` en items por lote (código propio de un lote o
+    GS1 con número de lote) o por producto, con el caché de escaneo del POS.
+    """
+    lecturas = list(dict.fromkeys(it['codigo'] for it in items if it.get('codigo')))
+    if not lecturas:
+        return items
+    resultados, no_encontrados = codigos.resolver_varios(lecturas)
+    if no_encontrados:
+        raise serializers.ValidationError({"detail": f"Código no registrado: {no_encontrados[0]}"})
+    por_lectura = {resultado['lectura']: resultado for resultado in resultados}
+    convertidos = []
+    for it in items:
+        resultado = por_lectura.get(it.get('codigo'))
+        if resultado is None:
+            convertidos.append(it)
+        elif resultado['lote']:
+            convertidos.append({'lote_id': resultado['lote']['id'], 'cantidad': it['cantidad']})
+        else:
+            convertidos.append({'producto_id': resultado['producto']['id'], 'cantidad': it['cantidad']})
+    return convertidos
+
+
+def contar(conteo_id, items, sumar=False):
+    """
+    Registra cantidades contadas: items = [{'lote_id' | 'producto_id' | 'codigo', 'cantidad'}].
+    Con `sumar` se acumulan a lo ya contado (lecturas sucesivas del escáner);
+    si no, reemplazan. Un producto se cuenta entero o por lote, no de las dos formas.
+    Devuelve la cantidad de líneas actualizadas.
+    """
+    items = _resolver_codigos(items)
+    por_lote, por_producto = {}, {}
+    for it in items:
+        destino, clave = (por_lote, it['lote_id']) if it.get('lote_id') else (por_producto, it['producto_id'])
+        destino[clave] = destino.get(clave, 0) + it['cantidad'] if sumar else it['cantidad']
+
+    with transaction.atomic():
+        conteo = _abierto(conteo_id)
+        _sumar_lotes_nuevos(conteo, list(por_lote), list(por_producto))
+        lineas = list(
+            ConteoLinea.objects.select_for_update()
+            .filter(
+                Q(lote_id__in=list(por_lote))
+                | Q(producto_id__in=list(por_producto))
+                # Conteo entero previo de los productos que ahora llegan por lote
+                | Q(lote__isnull=True, producto__in=Lote.objects.filter(id__in=list(por_lote)).values('producto')),
+                conteo=conteo,
+            )
+        )
+        de_lote = {l.lote_id: l for l in lineas if l.lote_id in por_lote}
+        faltantes = sorted(set(por_lote) - de_lote.keys())
+        if faltantes:
+            raise serializers.ValidationError({"detail": f"El lote {faltantes[0]} no forma parte del conteo"})
+        productos_en_conteo = {l.producto_id for l in lineas if l.lote_id is not None}
+        faltantes = sorted(set(por_producto) - productos_en_conteo)
+        if faltantes:
+            raise serializers.ValidationError({"detail": f"El producto {faltantes[0]} no forma parte del conteo"})
+
+        enteros = {l.producto_id: l for l in lineas if l.lote_id is None}
+        contados_por_lote = {l.producto_id for l in lineas if l.lote_id is not None and l.contado is not None}
+        mezclados = sorted(
+            ({l.producto_id for l in de_lote.values()} & (enteros.keys() | set(por_producto)))
+            | (set(por_producto) & contados_por_lote)
+        )
+        if mezclados:
+            raise serializers.ValidationError({"detail": f"El producto {mezclados[0]} ya se contó de otra forma (por lote o entero)"})
+
+        nuevos = [pid for pid in por_producto if pid not in enteros]
+        if nuevos:
+            esperados = dict(
+                ConteoLinea.objects.filter(conteo=conteo, producto_id__in=nuevos, lote__isnull=False)
+                .order_by().values('producto_id').annotate(total=Sum('esperado')).values_list('producto_id', 'total')
+            )
+            creadas = [ConteoLinea(conteo=conteo, producto_id=pid, esperado=esperados[pid]) for pid in nuevos]
+            ConteoLinea.objects.bulk_create(creadas)
+            # bulk_create no devuelve ids en MySQL: se releen
+            for linea in ConteoLinea.objects.filter(conteo=conteo, producto_id__in=nuevos, lote__isnull=True):
+                enteros[linea.producto_id] = linea
+
+        actualizadas = []
+        for lote_id, cantidad in por_lote.items():
+            linea = de_lote[lote_id]
+            linea.contado = (linea.contado or 0) + cantidad if sumar else cantidad
+            actualizadas.append(linea)
+        for producto_id, cantidad in por_producto.items():
+            linea = enteros[producto_id]
+            linea.contado = (linea.contado or 0) + cantidad if sumar else cantidad
+            actualizadas.append(linea)
+        negativos = [linea for linea in actualizadas if linea.contado < 0]
+        if negativos:
+            raise serializers.ValidationError({"detail": f"El conteo del producto {negativos[0].producto_id} quedaría negativo"})
+        ahora = timezone.now()
+        for linea in actualizadas:
+            linea.actualizado = ahora
+        ConteoLinea.objects.bulk_update(actualizadas, ['contado', 'actualizado'], batch_size=TAMANO_BLOQUE)
+    return len(actualizadas)
+
+
+def diferencias(conteo, solo_con_diferencia=True):
+    """
+    Líneas contadas con su diferencia, en una sola consulta. `movimientos` son
+    los movimientos de stock entre el congelamiento y el momento en que se contó
+    la línea (ConteoLinea.actualizado): en la estantería se esperaba
+    esperado + movimientos, y diferencia = contado - eso. Lo que se vendió o
+    compró después de contar ya está en el disponible actual y no la cambia.
+    """
+    posteriores = (MovimientoStock.objects
+                   .filter(id__gt=conteo.corte_movimiento, fecha__lte=OuterRef('actualizado'))
+                   .exclude(tipo='CONTEO')
+                   .order_by())
+    por_lote = posteriores.filter(lote=OuterRef('lote')).values('lote').annotate(total=Sum('cantidad')).values('total')
+    por_producto = posteriores.filter(producto=OuterRef('producto')).values('producto').annotate(total=Sum('cantidad')).values('total')
+    lineas = (ConteoLinea.objects
+              .filter(conteo=conteo, contado__isnull=False)
+              .annotate(movimientos=Case(
+                  When(lote__isnull=True, then=Coalesce(Subquery(por_producto), 0)),
+                  default=Coalesce(Subquery(por_lote), 0),
+                  output_field=IntegerField(),
+              ))
+              .annotate(diferencia=F('contado') - F('esperado') - F('movimientos'))
+              .order_by('producto_id', 'lote_id')
+              .values('id', 'producto_id', 'producto__nombre', 'lote_id', 'lote__numero_lote',
+                      'esperado', 'contado', 'movimientos', 'diferencia'))
+    if solo_con_diferencia:
+        lineas = lineas.exclude(diferencia=0)
+    return lineas
+
+
+def _repartir_producto(lotes, delta):
+    """Deltas por lote para llevar un producto contado entero: bajas por estrategia, altas al lote más reciente."""
+    if delta > 0:
+        lote = max(lotes, key=lambda l: (l.creado, l.id))
+        return {lote.id: delta}
+    disponible = {lote.id: lote.cantidad_disponible for lote in lotes}
+    asignaciones, _ = asignar(lotes, -delta, obtener_estrategia(), disponible)
+    return {lote.id: -unidades for lote, unidades in asignaciones}
+
+
+def aplicar(conteo_id, user=None):
+    """
+    Aplica todas las diferencias en una transacción: un UPDATE agrupado por bloque
+    de lotes, los movimientos CONTEO en el kardex y un único recálculo de stock.
+    La diferencia de cada línea ya descuenta lo movido antes de contarla (ver
+    diferencias()) y se suma al disponible actual, que incluye lo movido
+    después: una venta hecha durante el conteo se cuenta una sola vez.
+    """
+    with diferir_recalculo_stock():
+        conteo = _abierto(conteo_id)
+        filas = list(diferencias(conteo).values('lote_id', 'producto_id', 'diferencia'))
+        deltas = {fila['lote_id']: fila['diferencia'] for fila in filas if fila['lote_id']}
+        enteros = {fila['producto_id']: fila['diferencia'] for fila in filas if not fila['lote_id']}
+
+        lotes = {
+            lote.id: lote
+            for lote in Lote.objects.select_for_update()
+            .filter(Q(id__in=list(deltas)) | Q(producto_id__in=list(enteros)))
+            .order_by('id')
+        }
+        por_producto = {}
+        for lote in lotes.values():
+            if lote.producto_id in enteros:
+                por_producto.setdefault(lote.producto_id, []).append(lote)
+        for producto_id, delta in enteros.items():
+            if por_producto.get(producto_id):
+                deltas.update(_repartir_producto(por_producto[producto_id], delta))
+        # Un lote borrado durante el conteo ya no se puede ajustar
+        deltas = {lote_id: delta for lote_id, delta in deltas.items() if lote_id in lotes and delta}
+
+        movimientos, ajustados = [], []
+        for lote_id in sorted(deltas):
+            lote = lotes[lote_id]
+            # Valores literales sobre la fila bloqueada: nada de F() que MySQL pueda
+            # evaluar ya modificado (SET de izquierda a derecha) o desbordar (UNSIGNED)
+            nuevo = max(lote.cantidad_disponible + deltas[lote_id], 0)
+            movimientos.append(kardex.movimiento(lote, 'CONTEO', nuevo - lote.cantidad_disponible, 'conteo', conteo.id, user))
+            lote.cantidad_disponible = nuevo
+            lote.cantidad_inicial = max(lote.cantidad_inicial, nuevo)
+            lote.activo = nuevo > 0
+            ajustados.append(lote)
+        Lote.objects.bulk_update(ajustados, ['cantidad_disponible', 'cantidad_inicial', 'activo'], batch_size=TAMANO_BLOQUE)
+        kardex.registrar(movimientos)
+        recalcular_stock_productos({lote.producto_id for lote in ajustados})
+
+        conteo.estado = 'APLICADO'
+        conteo.aplicado = timezone.now()
+        conteo.save(update_fields=['estado', 'aplicado'])
+    return {
+        'lotes_ajustados': sum(1 for m in movimientos if m.cantidad),
+        'unidades_sumadas': sum(m.cantidad for m in movimientos if m.cantidad > 0),
+        'unidades_restadas': -sum(m.cantidad for m in movimientos if m.cantidad < 0),
+    }
+
+
+def cancelar(conteo_id):
+    with transaction.atomic():
+        conteo = _abierto(conteo_id)
+        conteo.estado = 'CANCELADO'
+        conteo.save(update_fields=['estado'])
+    return conteo
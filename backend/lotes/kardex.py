@@ -0,0 +1,243 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Max, OuterRef, PositiveIntegerField, Subquery, Sum, Value, When
+from django.utils import timezone
+from rest_framework import serializers
+
+from core import cambios
+from .asignacion import asignar, obtener_estrategia
+from .models import Lote, MovimientoStock, SnapshotStock, diferir_recalculo_stock, recalcular_stock_productos
+
+
+# ==========================================================
+# KARDEX: REGISTRO Y CONSULTA
+# ==========================================================
+# Quien cambia cantidad_disponible arma los MovimientoStock y los escribe con
+# registrar() dentro de su propia transacción (venta, compra, edición), en un
+# único INSERT.
+#
+# Saldo de un producto a una fecha = último SnapshotStock anterior a la fecha
+# + movimientos posteriores a ese corte, así no se recorre toda la historia.
+
+
+def movimiento(lote, tipo, cantidad, ref_type=None, ref_id=None, user=None, notas=None):
+    return MovimientoStock(
+        producto_id=lote.producto_id, lote_id=lote.id, tipo=tipo, cantidad=cantidad,
+        ref_type=ref_type, ref_id=ref_id, user=user, notas=notas,
+    )
+
+
+def registrar(movimientos):
+    """Guarda los movimientos con un solo bulk_create; descarta los deltas en cero y anota los lotes tocados."""
+    movimientos = [m for m in movimientos if m.cantidad]
+    if movimientos:
+        MovimientoStock.objects.bulk_create(movimientos)
+        # Los lotes se actualizan con UPDATE sin señales: el cambio se anota aquí
+        cambios.registrar('lote', (m.lote_id for m in movimientos if m.lote_id))
+    return movimientos
+
+
+def saldo_al(producto_id, fecha):
+    """Stock del producto en `fecha`: un snapshot más la cola de movimientos desde su corte."""
+    snapshot = (SnapshotStock.objects
+                .filter(producto_id=producto_id, fecha__lte=fecha)
+                .order_by('-hasta_movimiento')
+                .first())
+    movimientos = MovimientoStock.objects.filter(producto_id=producto_id, fecha__lte=fecha)
+    base = 0
+    if snapshot:
+        base = snapshot.cantidad
+        movimientos = movimientos.filter(id__gt=snapshot.hasta_movimiento)
+    return base + (movimientos.aggregate(total=Sum('cantidad'))['total'] or 0)
+
+
+def saldo_lote_al(lote_id, fecha):
+    return MovimientoStock.objects.filter(lote_id=lote_id, fecha__lte=fecha).aggregate(total=Sum('cantidad'))['total'] or 0
+
+
+def kardex(producto_id=None, lote_id=None, desde=None, hasta=None):
+    """
+    Movimientos de un producto o de un lote entre `desde` y `hasta` con el saldo
+    corrido. Devuelve (saldo_inicial, filas).
+    """
+    movimientos = MovimientoStock.objects.select_related('user').order_by('fecha', 'id')
+    if lote_id is not None:
+        movimientos = movimientos.filter(lote_id=lote_id)
+    else:
+        movimientos = movimientos.filter(producto_id=producto_id)
+    saldo = 0
+    if desde:
+        movimientos = movimientos.filter(fecha__gt=desde)
+        saldo = saldo_lote_al(lote_id, desde) if lote_id is not None else saldo_al(producto_id, desde)
+    if hasta:
+        movimientos = movimientos.filter(fecha__lte=hasta)
+    saldo_inicial = saldo
+    filas = []
+    for mov in movimientos:
+        saldo += mov.cantidad
+        filas.append({
+            'id': mov.id,
+            'fecha': mov.fecha,
+            'tipo': mov.tipo,
+            'lote_id': mov.lote_id,
+            'cantidad': mov.cantidad,
+            'saldo': saldo,
+            'ref_type': mov.ref_type,
+            'ref_id': mov.ref_id,
+            'notas': mov.notas,
+            'usuario': mov.user.username if mov.user else None,
+        })
+    return saldo_inicial, filas
+
+
+def tomar_snapshots(tamano=1000, margen=None):
+    """
+    Guarda un SnapshotStock por cada producto con movimientos desde el corte
+    anterior (los demás siguen representados por su último snapshot).
+
+    El corte no es MAX(id): en READ COMMITTED un id menor puede pertenecer a una
+    transacción todavía abierta (ventas por bloque, importación de facturas,
+    conteos) y saldo_al() no volvería a mirar debajo del corte. Se toma el último
+    movimiento con más de `margen` segundos (KARDEX_SNAPSHOT_MARGEN_SEGUNDOS) y,
+    además, cada corrida recalcula la ventana anterior y corrige los snapshots a
+    los que les faltaban filas confirmadas tarde.
+    Devuelve la cantidad de snapshots creados o corregidos.
+    """
+    fecha = timezone.now()
+    if margen is None:
+        margen = settings.KARDEX_SNAPSHOT_MARGEN_SEGUNDOS
+    corte = (MovimientoStock.objects
+             .filter(fecha__lte=fecha - timedelta(seconds=margen))
+             .aggregate(ultimo=Max('id'))['ultimo'])
+    cortes = list(SnapshotStock.objects.order_by('-hasta_movimiento')
+                  .values_list('hasta_movimiento', flat=True).distinct()[:2])
+    anterior = cortes[0] if cortes else 0
+    escritos = 0
+    if anterior:
+        escritos += _snapshots_ventana(cortes[1] if len(cortes) > 1 else 0, anterior, fecha, tamano)
+    if corte is not None and corte > anterior:
+        escritos += _snapshots_ventana(anterior, corte, fecha, tamano)
+    return escritos
+
+
+def _snapshots_ventana(desde, hasta, fecha, tamano):
+    """
+    Snapshots al corte `hasta` de los productos con movimientos en (desde, hasta]:
+    su snapshot previo (corte <= desde) más esos movimientos. Crea los que faltan
+    y corrige los existentes que no coinciden.
+    """
+    deltas = dict(
+        MovimientoStock.objects
+        .filter(id__gt=desde, id__lte=hasta)
+        .order_by()
+        .values('producto_id')
+        .annotate(total=Sum('cantidad'))
+        .values_list('producto_id', 'total')
+    )
+    ultimo = (SnapshotStock.objects
+              .filter(producto=OuterRef('producto'), hasta_movimiento__lte=desde)
+              .order_by('-hasta_movimiento')
+              .values('hasta_movimiento')[:1])
+    producto_ids = sorted(deltas)
+    escritos = 0
+    for i in range(0, len(producto_ids), tamano):
+        bloque = producto_ids[i:i + tamano]
+        previos = dict(
+            SnapshotStock.objects
+            .filter(producto_id__in=bloque, hasta_movimiento=Subquery(ultimo))
+            .values_list('producto_id', 'cantidad')
+        )
+        existentes = {
+            snapshot.producto_id: snapshot
+            for snapshot in SnapshotStock.objects.filter(producto_id__in=bloque, hasta_movimiento=hasta)
+        }
+        nuevos, corregidos = [], []
+        for pid in bloque:
+            cantidad = previos.get(pid, 0) + deltas[pid]
+            snapshot = existentes.get(pid)
+            if snapshot is None:
+                nuevos.append(SnapshotStock(producto_id=pid, fecha=fecha, hasta_movimiento=hasta, cantidad=cantidad))
+            elif snapshot.cantidad != cantidad:
+                snapshot.cantidad = cantidad
+                corregidos.append(snapshot)
+        SnapshotStock.objects.bulk_create(nuevos)
+        SnapshotStock.objects.bulk_update(corregidos, ['cantidad'])
+        escritos += len(nuevos) + len(corregidos)
+    return escritos
+
+
+# ==========================================================
+# AJUSTES MANUALES
+# ==========================================================
+
+def ajustar_lote(lote_id, delta, tipo='AJUSTE', user=None, notas=None, ref_type=None, ref_id=None):
+    """
+    Suma `delta` (puede ser negativo) al disponible del lote y lo deja en el kardex.
+    Si el disponible supera la cantidad inicial (p.ej. una devolución), ésta acompaña.
+    """
+    with transaction.atomic():
+        lote = Lote.objects.select_for_update().get(pk=lote_id)
+        nuevo = lote.cantidad_disponible + delta
+        if nuevo < 0:
+            raise serializers.ValidationError({"detail": f"El lote {lote.id} tiene {lote.cantidad_disponible} unidades disponibles"})
+        lote.cantidad_disponible = nuevo
+        lote.cantidad_inicial = max(lote.cantidad_inicial, nuevo)
+        if delta > 0:
+            lote.activo = True
+        elif nuevo == 0:
+            lote.activo = False
+        # Sin señales: el stock del producto se recalcula una vez abajo
+        Lote.objects.filter(pk=lote.pk).update(
+            cantidad_disponible=lote.cantidad_disponible,
+            cantidad_inicial=lote.cantidad_inicial,
+            activo=lote.activo,
+        )
+        registrar([movimiento(lote, tipo, delta, ref_type, ref_id, user, notas)])
+        recalcular_stock_productos([lote.producto_id])
+    return lote
+
+
+def ajustar_producto(producto, nueva_cantidad, user=None, notas=None):
+    """
+    Lleva el stock del producto a `nueva_cantidad` moviendo sus lotes: una baja
+    se descuenta según la estrategia de asignación y un alta se suma al lote más
+    reciente (o a un lote nuevo si el producto no tiene lotes).
+    """
+    with diferir_recalculo_stock():
+        lotes = list(Lote.objects.select_for_update().filter(producto=producto).order_by('id'))
+        delta = nueva_cantidad - sum(lote.cantidad_disponible for lote in lotes)
+        if delta == 0:
+            return 0
+        notas = notas or 'Ajuste de stock del producto'
+        if delta > 0:
+            if not lotes:
+                lote = Lote.objects.create(producto=producto, cantidad_inicial=delta, cantidad_disponible=delta, notas=notas)
+                registrar([movimiento(lote, 'AJUSTE', delta, 'producto', producto.id, user, notas)])
+                return delta
+            lote = max(lotes, key=lambda l: (l.creado, l.id))
+            # Valores calculados sobre la fila bloqueada: MySQL evalúa el SET de izquierda a
+            # derecha y un F('cantidad_disponible') posterior vería el valor ya sumado
+            nuevo = lote.cantidad_disponible + delta
+            Lote.objects.filter(pk=lote.pk).update(
+                cantidad_disponible=nuevo,
+                cantidad_inicial=max(lote.cantidad_inicial, nuevo),
+                activo=True,
+            )
+            movimientos = [movimiento(lote, 'AJUSTE', delta, 'producto', producto.id, user, notas)]
+        else:
+            disponible = {lote.id: lote.cantidad_disponible for lote in lotes}
+            asignaciones, _ = asignar(lotes, -delta, obtener_estrategia(), disponible)
+            agotados = [lote.id for lote, unidades in asignaciones if lote.cantidad_disponible == unidades]
+            Lote.objects.filter(id__in=[lote.id for lote, _ in asignaciones]).update(
+                cantidad_disponible=Case(
+                    *[When(id=lote.id, then=F('cantidad_disponible') - unidades) for lote, unidades in asignaciones],
+                    output_field=PositiveIntegerField(),
+                ),
+                activo=Case(When(id__in=agotados, then=Value(False)), default=F('activo')),
+            )
+            movimientos = [movimiento(lote, 'AJUSTE', -unidades, 'producto', producto.id, user, notas) for lote, unidades in asignaciones]
+        registrar(movimientos)
+        recalcular_stock_productos([producto.id])
+    return delta
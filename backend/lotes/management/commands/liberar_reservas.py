@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from lotes.reservas import liberar_vencidas
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las reservas de stock vencidas. Las vencidas ya no descuentan disponible; "
+        "esto sólo mantiene chica la tabla (programar cada pocos minutos)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por DELETE')
+
+    def handle(self, *args, **options):
+        eliminadas = liberar_vencidas(max(1, options['lote']))
+        self.stdout.write(self.style.SUCCESS(f'Reservas vencidas liberadas: {eliminadas}'))
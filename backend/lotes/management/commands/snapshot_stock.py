@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from lotes.kardex import tomar_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda el stock de cada producto con movimientos desde el último corte. "
+        "El saldo a una fecha lee un snapshot más los movimientos posteriores, así que "
+        "conviene programarlo a diario."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Productos por INSERT')
+        parser.add_argument('--margen', type=int, help='Segundos de antigüedad mínima del corte (KARDEX_SNAPSHOT_MARGEN_SEGUNDOS)')
+
+    def handle(self, *args, **options):
+        escritos = tomar_snapshots(max(1, options['lote']), options['margen'])
+        self.stdout.write(self.style.SUCCESS(f'Snapshots de stock creados o corregidos: {escritos}'))
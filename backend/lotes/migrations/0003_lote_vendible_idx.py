@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0002_initial'),
+        ('core', '0002_initial'),
+        ('lotes', '0002_remove_lote_proveedor'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(fields=['producto', 'activo', 'fecha_vencimiento', 'creado'], name='lote_vendible_idx'),
+        ),
+    ]
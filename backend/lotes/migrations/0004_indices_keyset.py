@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0002_initial'),
+        ('core', '0003_indices_keyset'),
+        ('lotes', '0003_lote_vendible_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(fields=['fecha_compra', 'id'], name='lote_fecha_compra_id_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0002_initial'),
+        ('core', '0004_idempotency_key'),
+        ('lotes', '0005_reservas_stock'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lote',
+            name='lote_vendible_idx',
+        ),
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(fields=['producto', 'activo', 'fecha_vencimiento', 'creado', 'cantidad_disponible'], name='lote_vendible_idx'),
+        ),
+    ]
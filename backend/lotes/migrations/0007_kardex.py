@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_idempotency_key'),
+        ('lotes', '0006_lote_vendible_idx_disponible'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('APERTURA', 'Saldo inicial'), ('COMPRA', 'Compra'), ('VENTA', 'Venta'), ('EDICION', 'Edición manual'), ('AJUSTE', 'Ajuste'), ('DEVOLUCION', 'Devolución'), ('BAJA', 'Baja de lote')], max_length=12)),
+                ('cantidad', models.IntegerField()),
+                ('ref_type', models.CharField(blank=True, max_length=30, null=True)),
+                ('ref_id', models.IntegerField(blank=True, null=True)),
+                ('notas', models.CharField(blank=True, max_length=255, null=True)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('lote', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to='lotes.lote')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_stock', to='core.producto')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Movimiento de stock',
+                'verbose_name_plural': 'Movimientos de stock',
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='movstock_producto_fecha_idx'), models.Index(fields=['lote', 'fecha'], name='movstock_lote_fecha_idx'), models.Index(fields=['ref_type', 'ref_id'], name='movstock_ref_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField()),
+                ('hasta_movimiento', models.BigIntegerField()),
+                ('cantidad', models.IntegerField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots_stock', to='core.producto')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de stock',
+                'verbose_name_plural': 'Snapshots de stock',
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='snapshot_producto_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'hasta_movimiento'), name='snapshot_producto_corte_uniq')],
+            },
+        ),
+    ]
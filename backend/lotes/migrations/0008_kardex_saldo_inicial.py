@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+LOTE = 1000
+
+
+def saldo_inicial(apps, schema_editor):
+    """Un movimiento APERTURA por lote con stock: el kardex arranca igual al disponible actual."""
+    Lote = apps.get_model('lotes', 'Lote')
+    MovimientoStock = apps.get_model('lotes', 'MovimientoStock')
+    ultimo_id = 0
+    while True:
+        lotes = list(
+            Lote.objects.filter(id__gt=ultimo_id).order_by('id')
+            .values_list('id', 'producto_id', 'cantidad_disponible')[:LOTE]
+        )
+        if not lotes:
+            break
+        ultimo_id = lotes[-1][0]
+        MovimientoStock.objects.bulk_create([
+            MovimientoStock(producto_id=producto_id, lote_id=lote_id, tipo='APERTURA', cantidad=cantidad, ref_type='lote', ref_id=lote_id)
+            for lote_id, producto_id, cantidad in lotes
+            if cantidad
+        ])
+
+
+def borrar_saldo_inicial(apps, schema_editor):
+    apps.get_model('lotes', 'MovimientoStock').objects.filter(tipo='APERTURA').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lotes', '0007_kardex'),
+    ]
+
+    operations = [
+        migrations.RunPython(saldo_inicial, borrar_saldo_inicial),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_idempotency_key'),
+        ('lotes', '0008_kardex_saldo_inicial'),
+        ('marcas', '0001_initial'),
+        ('productos', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimientostock',
+            name='tipo',
+            field=models.CharField(choices=[('APERTURA', 'Saldo inicial'), ('COMPRA', 'Compra'), ('VENTA', 'Venta'), ('EDICION', 'Edición manual'), ('AJUSTE', 'Ajuste'), ('DEVOLUCION', 'Devolución'), ('BAJA', 'Baja de lote'), ('CONTEO', 'Conteo de inventario')], max_length=12),
+        ),
+        migrations.CreateModel(
+            name='ConteoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('ABIERTO', 'Abierto'), ('APLICADO', 'Aplicado'), ('CANCELADO', 'Cancelado')], default='ABIERTO', max_length=10)),
+                ('notas', models.TextField(blank=True, null=True)),
+                ('corte_movimiento', models.BigIntegerField(default=0)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('aplicado', models.DateTimeField(blank=True, null=True)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='conteos', to='productos.categoria')),
+                ('marca', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='conteos', to='marcas.marca')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='conteos_inventario', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Conteo de inventario',
+                'verbose_name_plural': 'Conteos de inventario',
+            },
+        ),
+        migrations.CreateModel(
+            name='ConteoLinea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('esperado', models.IntegerField()),
+                ('contado', models.IntegerField(blank=True, null=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('conteo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='lotes.conteoinventario')),
+                ('lote', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='lotes.lote')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.producto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['conteo', 'producto'], name='conteo_linea_producto_idx')],
+                'constraints': [models.UniqueConstraint(fields=('conteo', 'lote'), name='conteo_linea_lote_uniq')],
+            },
+        ),
+    ]
@@ -1,6 +1,13 @@
-from django.db import models
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
+from core import cambios
 from core.models import Producto
 from proveedores.models import Proveedores
 
@@ -27,6 +34,13 @@ class Lote(models.Model):
         ordering = ['-creado']
         verbose_name = 'Lote'
         verbose_name_plural = 'Lotes'
+        indexes = [
+            # Asignación automática (FEFO/FIFO) y /lotes/disponibles/: lotes activos de un producto
+            # por vencimiento; cantidad_disponible al final resuelve "> 0" dentro del índice
+            models.Index(fields=['producto', 'activo', 'fecha_vencimiento', 'creado', 'cantidad_disponible'], name='lote_vendible_idx'),
+            # Orden del listado y paginación keyset: (-fecha_compra, -id)
+            models.Index(fields=['fecha_compra', 'id'], name='lote_fecha_compra_id_idx'),
+        ]
 
     def __str__(self):
         return f"Lote {self.numero_lote or '-'} de {self.producto.nombre}"
@@ -41,16 +55,236 @@ class Lote(models.Model):
                 return float(self.costo_unitario) - (float(self.descuento_valor) / self.cantidad_inicial)
         return float(self.costo_unitario)
 
+# ==========================================================
+# RESERVAS DE STOCK (carrito del POS)
+# ==========================================================
+# Retención temporal de unidades de un lote mientras el cajero escanea.
+# Sólo cuentan las reservas con expira > ahora; las vencidas se ignoran y
+# `manage.py liberar_reservas` las borra. Ver lotes/reservas.py.
+
+class ReservaStock(models.Model):
+    carrito = models.CharField(max_length=64)
+    lote = models.ForeignKey(Lote, on_delete=models.CASCADE, related_name='reservas')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='reservas_stock')
+    cantidad = models.PositiveIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservas_stock')
+    creado = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Reserva de stock'
+        verbose_name_plural = 'Reservas de stock'
+        indexes = [
+            # Reservado por lote: SUM(cantidad) WHERE lote IN (...) AND expira > ahora, sólo desde el índice
+            models.Index(fields=['lote', 'expira', 'cantidad'], name='reserva_lote_expira_idx'),
+            models.Index(fields=['carrito', 'user'], name='reserva_carrito_idx'),
+            models.Index(fields=['expira'], name='reserva_expira_idx'),
+        ]
+
+    def __str__(self):
+        return f"Reserva {self.cantidad} u. lote {self.lote_id} (carrito {self.carrito})"
+
+
+# ==========================================================
+# KARDEX (libro de movimientos de stock)
+# ==========================================================
+# Append-only: cada cambio de Lote.cantidad_disponible deja una fila con el
+# delta (positivo entra, negativo sale) y el documento que lo originó
+# (ref_type/ref_id, igual que MovimientoDeCaja). La suma de los movimientos de
+# un lote es su cantidad_disponible. Ver lotes/kardex.py.
+
+class MovimientoStock(models.Model):
+    TIPOS = (
+        ('APERTURA', 'Saldo inicial'),
+        ('COMPRA', 'Compra'),
+        ('VENTA', 'Venta'),
+        ('EDICION', 'Edición manual'),
+        ('AJUSTE', 'Ajuste'),
+        ('DEVOLUCION', 'Devolución'),
+        ('BAJA', 'Baja de lote'),
+        ('CONTEO', 'Conteo de inventario'),
+    )
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='movimientos_stock')
+    # Se conserva el movimiento aunque el lote se borre
+    lote = models.ForeignKey(Lote, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_stock')
+    tipo = models.CharField(max_length=12, choices=TIPOS)
+    cantidad = models.IntegerField()
+    ref_type = models.CharField(max_length=30, blank=True, null=True)
+    ref_id = models.IntegerField(blank=True, null=True)
+    notas = models.CharField(max_length=255, blank=True, null=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_stock')
+    # Hora de registro (no la del documento: una venta offline se registra al subirse)
+    fecha = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        verbose_name = 'Movimiento de stock'
+        verbose_name_plural = 'Movimientos de stock'
+        indexes = [
+            # Kardex y saldo a una fecha de un producto (el id va implícito al final en InnoDB)
+            models.Index(fields=['producto', 'fecha'], name='movstock_producto_fecha_idx'),
+            models.Index(fields=['lote', 'fecha'], name='movstock_lote_fecha_idx'),
+            models.Index(fields=['ref_type', 'ref_id'], name='movstock_ref_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.cantidad:+d} lote {self.lote_id}"
+
+
+class SnapshotStock(models.Model):
+    """
+    Stock de un producto al corte `hasta_movimiento` (id del último
+    MovimientoStock incluido). Los genera `manage.py snapshot_stock` sólo para
+    los productos con movimientos desde el corte anterior.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='snapshots_stock')
+    fecha = models.DateTimeField()
+    hasta_movimiento = models.BigIntegerField()
+    cantidad = models.IntegerField()
+
+    class Meta:
+        verbose_name = 'Snapshot de stock'
+        verbose_name_plural = 'Snapshots de stock'
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'hasta_movimiento'], name='snapshot_producto_corte_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['producto', 'fecha'], name='snapshot_producto_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"Stock {self.producto_id} al {self.fecha:%Y-%m-%d %H:%M}: {self.cantidad}"
+
+# ==========================================================
+# CONTEOS DE INVENTARIO
+# ==========================================================
+# Al abrir el conteo se congela el disponible de cada lote del alcance
+# (ConteoLinea.esperado). Al contar una línea se esperaba esperado más lo
+# movido desde el congelamiento hasta ese momento; la diferencia contra eso se
+# suma al disponible actual, que ya incluye lo movido después de contar.
+# Ver lotes/conteos.py.
+
+class ConteoInventario(models.Model):
+    ESTADOS = (
+        ('ABIERTO', 'Abierto'),
+        ('APLICADO', 'Aplicado'),
+        ('CANCELADO', 'Cancelado'),
+    )
+
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='ABIERTO')
+    # Alcance opcional; sin ninguno se cuenta todo el catálogo
+    categoria = models.ForeignKey('productos.Categoria', on_delete=models.SET_NULL, null=True, blank=True, related_name='conteos')
+    marca = models.ForeignKey('marcas.Marca', on_delete=models.SET_NULL, null=True, blank=True, related_name='conteos')
+    notas = models.TextField(blank=True, null=True)
+    # Último MovimientoStock al congelar: lo posterior son movimientos durante el conteo
+    corte_movimiento = models.BigIntegerField(default=0)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='conteos_inventario')
+    creado = models.DateTimeField(auto_now_add=True)
+    aplicado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Conteo de inventario'
+        verbose_name_plural = 'Conteos de inventario'
+
+    def __str__(self):
+        return f"Conteo #{self.id} ({self.get_estado_display()})"
+
+
+class ConteoLinea(models.Model):
+    """
+    Una fila por lote del alcance (creada al abrir o, si el lote apareció después,
+    al contarlo) o, si se cuenta el producto entero, una fila sin lote cuyo
+    esperado es la suma congelada de sus lotes.
+    """
+    conteo = models.ForeignKey(ConteoInventario, on_delete=models.CASCADE, related_name='lineas')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='+')
+    lote = models.ForeignKey(Lote, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    esperado = models.IntegerField()
+    contado = models.IntegerField(null=True, blank=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['conteo', 'lote'], name='conteo_linea_lote_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['conteo', 'producto'], name='conteo_linea_producto_idx'),
+        ]
+
+    def __str__(self):
+        return f"Conteo {self.conteo_id} lote {self.lote_id}: {self.contado}/{self.esperado}"
+
 def _recalcular_stock_producto(producto):
     total = producto.lotes.aggregate(models.Sum('cantidad_disponible'))['cantidad_disponible__sum'] or 0
     if producto.cantidad != total:
         producto.cantidad = total
         producto.save(update_fields=['cantidad'])
 
+# Productos pendientes de recalcular dentro de diferir_recalculo_stock() (None fuera del bloque)
+_diferido = threading.local()
+
+
+def _pendientes():
+    return getattr(_diferido, 'productos', None)
+
+
+@contextmanager
+def diferir_recalculo_stock():
+    """
+    Modo escritura masiva: dentro del bloque, guardar o borrar lotes (y
+    recalcular_stock_productos) sólo anota el producto; al final se recalcula
+    Producto.cantidad con un único UPDATE agrupado, justo antes del commit.
+
+    Abre su propia transacción (savepoint si ya hay una). Anidado, lo pendiente
+    se resuelve en el bloque exterior. Sirve también como decorador.
+    """
+    if _pendientes() is not None:
+        yield
+        return
+    _diferido.productos = set()
+    try:
+        with transaction.atomic():
+            yield
+            productos = _diferido.productos
+            _diferido.productos = None
+            recalcular_stock_productos(productos)
+    finally:
+        _diferido.productos = None
+
+def recalcular_stock_productos(producto_ids):
+    """
+    Recalcula Producto.cantidad de varios productos con un único UPDATE agrupado.
+    No dispara señales: pensado para escrituras en lote (ventas, compras).
+    """
+    producto_ids = set(producto_ids)
+    if not producto_ids:
+        return
+    pendientes = _pendientes()
+    if pendientes is not None:
+        pendientes.update(producto_ids)
+        return
+    stock = (Lote.objects
+             .filter(producto=models.OuterRef('pk'))
+             .order_by()
+             .values('producto')
+             .annotate(total=models.Sum('cantidad_disponible'))
+             .values('total'))
+    Producto.objects.filter(id__in=producto_ids).update(
+        cantidad=Coalesce(models.Subquery(stock), 0)
+    )
+    cambios.registrar('producto', producto_ids)
+
+def _actualizar_stock(instance):
+    pendientes = _pendientes()
+    if pendientes is not None:
+        pendientes.add(instance.producto_id)
+    else:
+        _recalcular_stock_producto(instance.producto)
+
 @receiver(post_save, sender=Lote)
 def actualizar_stock_post_save(sender, instance, **kwargs):
-    _recalcular_stock_producto(instance.producto)
+    _actualizar_stock(instance)
 
 @receiver(post_delete, sender=Lote)
 def actualizar_stock_post_delete(sender, instance, **kwargs):
-    _recalcular_stock_producto(instance.producto)
\ No newline at end of file
+    _actualizar_stock(instance)
\ No newline at end of file
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from rest_framework import serializers
+
+from .asignacion import asignar, filtro_vendibles, obtener_estrategia
+from .models import Lote, ReservaStock
+
+
+# ==========================================================
+# RESERVAS DE STOCK (carrito del POS)
+# ==========================================================
+# Disponible real de un lote = cantidad_disponible - reservas vigentes de otros carritos.
+# Reservar bloquea los lotes del producto sólo lo que dura esta transacción corta,
+# así los conflictos aparecen al escanear y no al cobrar.
+
+def vigentes(ahora=None):
+    return ReservaStock.objects.filter(expira__gt=ahora or timezone.now())
+
+
+def reservado_por_lote(lote_ids, excluir_carrito=None, user=None):
+    """
+    {lote_id: unidades reservadas} por reservas vigentes. `excluir_carrito` (junto
+    con `user`) deja afuera las reservas propias del carrito que se está cobrando.
+    """
+    lote_ids = list(lote_ids)
+    if not lote_ids:
+        return {}
+    qs = vigentes().filter(lote_id__in=lote_ids)
+    if excluir_carrito:
+        qs = qs.exclude(carrito=excluir_carrito, user=user)
+    return dict(qs.order_by().values('lote_id').annotate(total=Sum('cantidad')).values_list('lote_id', 'total'))
+
+
+def reservar(user, carrito, producto, cantidad, lote_id=None, estrategia=None):
+    """
+    Retiene `cantidad` unidades de `producto` para el carrito. Si no se indica
+    lote, se reparten según la estrategia de asignación sobre el disponible real.
+    Renueva el vencimiento de todas las reservas del carrito.
+    Devuelve la lista de ReservaStock creadas.
+    """
+    ahora = timezone.now()
+    expira = ahora + timedelta(seconds=settings.RESERVAS_TTL_SEGUNDOS)
+    with transaction.atomic():
+        condicion = Q(producto=producto) & filtro_vendibles()
+        if lote_id:
+            condicion &= Q(id=lote_id)
+        lotes = list(Lote.objects.select_for_update().filter(condicion).order_by('id'))
+        if lote_id and not lotes:
+            raise serializers.ValidationError({"detail": f"El lote {lote_id} no está disponible para el producto {producto.id}"})
+        reservado = reservado_por_lote([lote.id for lote in lotes])
+        disponible = {lote.id: lote.cantidad_disponible - reservado.get(lote.id, 0) for lote in lotes}
+        asignaciones, faltante = asignar(lotes, cantidad, obtener_estrategia(estrategia), disponible)
+        if faltante > 0:
+            raise serializers.ValidationError({
+                "detail": f"Stock insuficiente para producto {producto.id}: disponibles {cantidad - faltante}",
+            })
+        creadas = [
+            ReservaStock.objects.create(
+                carrito=carrito, lote=lote, producto=producto, cantidad=unidades, user=user, expira=expira,
+            )
+            for lote, unidades in asignaciones
+        ]
+        ReservaStock.objects.filter(carrito=carrito, user=user).update(expira=expira)
+    for reserva in creadas:
+        reserva.expira = expira
+    return creadas
+
+
+def renovar(user, carrito):
+    expira = timezone.now() + timedelta(seconds=settings.RESERVAS_TTL_SEGUNDOS)
+    actualizadas = vigentes().filter(carrito=carrito, user=user).update(expira=expira)
+    return actualizadas, expira
+
+
+def liberar(user, carrito):
+    return ReservaStock.objects.filter(carrito=carrito, user=user).delete()[0]
+
+
+def liberar_vencidas(lote=1000):
+    """Borra las reservas vencidas de a `lote` filas. Devuelve la cantidad borrada."""
+    ahora = timezone.now()
+    eliminadas = 0
+    while True:
+        ids = list(ReservaStock.objects.filter(expira__lte=ahora).order_by('expira').values_list('id', flat=True)[:lote])
+        if not ids:
+            return eliminadas
+        eliminadas += ReservaStock.objects.filter(id__in=ids).delete()[0]
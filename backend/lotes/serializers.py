@@ -1,15 +1,20 @@
 from rest_framework import serializers
-from .models import Lote
+from .asignacion import ESTRATEGIAS
+from .models import ConteoInventario, Lote, ReservaStock
 
 class LoteSerializer(serializers.ModelSerializer):
     proveedor = serializers.SerializerMethodField()
     costo_unitario_final = serializers.SerializerMethodField()
     producto_nombre = serializers.CharField(source='producto.nombre', read_only=True)
+    # Anotada por LoteViewSet: unidades retenidas por reservas de carrito vigentes
+    cantidad_reservada = serializers.IntegerField(read_only=True, default=0)
+    cantidad_libre = serializers.SerializerMethodField()
 
     class Meta:
         model = Lote
         fields = [
             'id','producto','producto_nombre','numero_lote','cantidad_inicial','cantidad_disponible',
+            'cantidad_reservada','cantidad_libre',
             'costo_unitario','descuento_tipo','descuento_valor','costo_unitario_final',
             'fecha_compra','fecha_vencimiento','notas','creado','proveedor'
         ]
@@ -22,6 +27,9 @@ class LoteSerializer(serializers.ModelSerializer):
         return None
         read_only_fields = ['id','creado','costo_unitario_final']
     
+    def get_cantidad_libre(self, obj):
+        return max(obj.cantidad_disponible - (getattr(obj, 'cantidad_reservada', 0) or 0), 0)
+
     def get_costo_unitario_final(self, obj):
         return obj.costo_unitario_final()
 
@@ -31,3 +39,96 @@ class LoteSerializer(serializers.ModelSerializer):
         if cantidad_disponible is not None and cantidad_inicial is not None and cantidad_disponible > cantidad_inicial:
             raise serializers.ValidationError('cantidad_disponible no puede ser mayor que cantidad_inicial')
         return attrs
+
+
+class ReservaStockSerializer(serializers.ModelSerializer):
+    producto_nombre = serializers.CharField(source='producto.nombre', read_only=True)
+
+    class Meta:
+        model = ReservaStock
+        fields = ['id', 'carrito', 'producto', 'producto_nombre', 'lote', 'cantidad', 'creado', 'expira']
+        read_only_fields = fields
+
+
+class ReservaCreateSerializer(serializers.Serializer):
+    carrito = serializers.CharField(max_length=64)
+    producto_id = serializers.IntegerField()
+    cantidad = serializers.IntegerField(min_value=1)
+    # Opcional: reservar de un lote puntual en lugar de usar la estrategia de asignación
+    lote_id = serializers.IntegerField(required=False, allow_null=True)
+    estrategia = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+    def validate_estrategia(self, value):
+        if not value:
+            return None
+        # Sólo estrategias registradas: las rutas importables quedan para settings
+        if value.upper() not in ESTRATEGIAS:
+            raise serializers.ValidationError('estrategia inválida')
+        return value.upper()
+
+
+class CarritoSerializer(serializers.Serializer):
+    carrito = serializers.CharField(max_length=64)
+
+
+class AjusteStockSerializer(serializers.Serializer):
+    # Delta sobre cantidad_disponible: positivo ingresa, negativo egresa
+    cantidad = serializers.IntegerField()
+    tipo = serializers.ChoiceField(choices=['AJUSTE', 'DEVOLUCION'], default='AJUSTE')
+    notas = serializers.CharField(required=False, allow_blank=True, allow_null=True, max_length=255)
+    # Devolución de una venta: queda como documento de origen del movimiento
+    venta_id = serializers.IntegerField(required=False, allow_null=True)
+
+    def validate_cantidad(self, value):
+        if value == 0:
+            raise serializers.ValidationError('La cantidad no puede ser cero')
+        return value
+
+    def validate(self, attrs):
+        if attrs['tipo'] == 'DEVOLUCION' and attrs['cantidad'] < 0:
+            raise serializers.ValidationError({'cantidad': 'Una devolución ingresa unidades'})
+        return attrs
+
+
+class KardexFiltroSerializer(serializers.Serializer):
+    desde = serializers.DateTimeField(required=False)
+    hasta = serializers.DateTimeField(required=False)
+
+
+class ConteoInventarioSerializer(serializers.ModelSerializer):
+    lineas_total = serializers.IntegerField(read_only=True, default=0)
+    lineas_contadas = serializers.IntegerField(read_only=True, default=0)
+
+    class Meta:
+        model = ConteoInventario
+        fields = ['id', 'estado', 'categoria', 'marca', 'notas', 'user', 'creado', 'aplicado', 'lineas_total', 'lineas_contadas']
+        read_only_fields = ['id', 'estado', 'user', 'creado', 'aplicado']
+
+
+class ConteoItemSerializer(serializers.Serializer):
+    lote_id = serializers.IntegerField(required=False, allow_null=True)
+    producto_id = serializers.IntegerField(required=False, allow_null=True)
+    # Lectura del escáner (EAN/UPC, SKU o GS1); se resuelve a lote o producto con core.codigos
+    codigo = serializers.CharField(required=False, allow_blank=False, max_length=120)
+    # Con código, una lectura vale una unidad si no se indica otra cantidad
+    cantidad = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if sum(1 for campo in ('lote_id', 'producto_id', 'codigo') if attrs.get(campo)) != 1:
+            raise serializers.ValidationError('Indique lote_id, producto_id o codigo (uno solo)')
+        if attrs.get('cantidad') is None:
+            if not attrs.get('codigo'):
+                raise serializers.ValidationError({'cantidad': 'Este campo es requerido.'})
+            attrs['cantidad'] = 1
+        return attrs
+
+
+class ConteoCargaSerializer(serializers.Serializer):
+    items = ConteoItemSerializer(many=True, allow_empty=False, max_length=5000)
+    # Acumular sobre lo ya contado (lecturas de escáner) en lugar de reemplazar
+    sumar = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if not attrs['sumar'] and any(it['cantidad'] < 0 for it in attrs['items']):
+            raise serializers.ValidationError({'items': 'Las cantidades contadas no pueden ser negativas'})
+        return attrs
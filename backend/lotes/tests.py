@@ -1,3 +1,178 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db.models import Sum
 from django.test import TestCase
+from django.utils import timezone
+
+from compras.services import RegistroCompra
+from core import codigos
+from core.models import CodigoBarras, Producto
+from proveedores.models import Proveedores
+
+from . import conteos, kardex
+from .models import Lote, MovimientoStock, SnapshotStock
+from .views import ConteoInventarioViewSet
+
+
+def saldo_kardex(**filtro):
+    return MovimientoStock.objects.filter(**filtro).aggregate(total=Sum('cantidad'))['total'] or 0
+
+
+class KardexTests(TestCase):
+    def setUp(self):
+        self.producto = Producto.objects.create(nombre='Fideos', precio=Decimal('10'))
+        self.viejo = Lote.objects.create(producto=self.producto, cantidad_inicial=10, cantidad_disponible=10)
+        self.nuevo = Lote.objects.create(producto=self.producto, cantidad_inicial=5, cantidad_disponible=5)
+        kardex.registrar([
+            kardex.movimiento(self.viejo, 'APERTURA', 10),
+            kardex.movimiento(self.nuevo, 'APERTURA', 5),
+        ])
+
+    def assertKardexCuadra(self):
+        self.producto.refresh_from_db()
+        for lote in Lote.objects.filter(producto=self.producto):
+            self.assertEqual(saldo_kardex(lote=lote), lote.cantidad_disponible)
+        self.assertEqual(saldo_kardex(producto=self.producto), self.producto.cantidad)
+
+    def test_ajustes_de_lote(self):
+        kardex.ajustar_lote(self.viejo.id, -10)
+        kardex.ajustar_lote(self.nuevo.id, 3)
+        self.viejo.refresh_from_db()
+        self.assertEqual(self.viejo.cantidad_disponible, 0)
+        self.assertFalse(self.viejo.activo)
+        self.assertKardexCuadra()
+
+    def test_ajuste_de_producto_en_alta_y_en_baja(self):
+        self.assertEqual(kardex.ajustar_producto(self.producto, 25), 10)
+        lote = Lote.objects.get(pk=self.nuevo.pk)
+        self.assertEqual((lote.cantidad_disponible, lote.cantidad_inicial), (15, 15))
+        self.assertKardexCuadra()
+        self.assertEqual(kardex.ajustar_producto(self.producto, 4), -21)
+        self.assertKardexCuadra()
+        self.assertEqual(self.producto.cantidad, 4)
+
+    def test_snapshot_y_saldo_a_una_fecha(self):
+        self.assertEqual(kardex.tomar_snapshots(margen=0), 1)
+        kardex.ajustar_lote(self.viejo.id, -4)
+        self.assertEqual(kardex.saldo_al(self.producto.id, timezone.now()), 11)
+        self.assertEqual(SnapshotStock.objects.get().cantidad, 15)
+
+    def test_snapshot_corrige_filas_confirmadas_despues_del_corte(self):
+        kardex.ajustar_lote(self.viejo.id, -3)
+        tardio = MovimientoStock.objects.filter(producto=self.producto).latest('id')
+        kardex.ajustar_lote(self.nuevo.id, 1)
+        # La fila del medio todavía no era visible cuando se tomó el corte
+        datos = {f.attname: getattr(tardio, f.attname) for f in MovimientoStock._meta.concrete_fields}
+        tardio.delete()
+        kardex.tomar_snapshots(margen=0)
+        self.assertEqual(SnapshotStock.objects.get().cantidad, 16)
+
+        MovimientoStock.objects.create(**datos)
+        self.assertEqual(kardex.tomar_snapshots(margen=0), 1)
+        self.assertEqual(SnapshotStock.objects.get().cantidad, 13)
+        self.assertEqual(kardex.saldo_al(self.producto.id, timezone.now()), saldo_kardex(producto=self.producto))
+
+    def test_el_corte_respeta_el_margen(self):
+        self.assertEqual(kardex.tomar_snapshots(margen=3600), 0)
+        self.assertFalse(SnapshotStock.objects.exists())
+
+
+class ConteoInventarioTests(TestCase):
+    def setUp(self):
+        codigos.limpiar()
+        self.producto = Producto.objects.create(nombre='Arroz', precio=Decimal('10'))
+        self.lote = Lote.objects.create(producto=self.producto, cantidad_inicial=10, cantidad_disponible=10)
+        self.conteo = conteos.abrir(None)
+
+    def vender(self, unidades):
+        kardex.ajustar_lote(self.lote.id, -unidades, tipo='VENTA')
+
+    def disponible(self):
+        self.lote.refresh_from_db()
+        return self.lote.cantidad_disponible
+
+    def test_venta_antes_de_contar_no_se_descuenta_dos_veces(self):
+        self.vender(2)
+        conteos.contar(self.conteo.id, [{'lote_id': self.lote.id, 'cantidad': 8}])
+        self.assertEqual(list(conteos.diferencias(self.conteo)), [])
+        conteos.aplicar(self.conteo.id)
+        self.assertEqual(self.disponible(), 8)
+
+    def test_venta_despues_de_contar_se_conserva(self):
+        conteos.contar(self.conteo.id, [{'lote_id': self.lote.id, 'cantidad': 9}])
+        self.vender(2)
+        conteos.aplicar(self.conteo.id)
+        self.assertEqual(self.disponible(), 7)
+
+    def test_faltante_con_ventas_durante_el_conteo(self):
+        self.vender(2)
+        conteos.contar(self.conteo.id, [{'lote_id': self.lote.id, 'cantidad': 7}])
+        self.vender(1)
+        linea = conteos.diferencias(self.conteo).get()
+        self.assertEqual((linea['movimientos'], linea['diferencia']), (-2, -1))
+        resultado = conteos.aplicar(self.conteo.id)
+        self.assertEqual(resultado['unidades_restadas'], 1)
+        self.assertEqual(self.disponible(), 6)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.cantidad, 6)
+        self.assertEqual(saldo_kardex(lote=self.lote, tipo='CONTEO'), -1)
+
+    def test_diferencia_mayor_que_el_disponible_deja_el_lote_en_cero(self):
+        conteos.contar(self.conteo.id, [{'lote_id': self.lote.id, 'cantidad': 0}])
+        self.vender(10)
+        self.assertEqual(self.disponible(), 0)
+        conteos.aplicar(self.conteo.id)
+        self.lote.refresh_from_db()
+        self.assertEqual((self.lote.cantidad_disponible, self.lote.activo), (0, False))
+
+    def test_conteo_por_codigo_de_barras(self):
+        CodigoBarras.objects.create(codigo='7790001000017', producto=self.producto)
+        items = [{'codigo': '7790001000017', 'cantidad': 1} for _ in range(12)]
+        conteos.contar(self.conteo.id, items, sumar=True)
+        linea = conteos.diferencias(self.conteo).get()
+        self.assertEqual((linea['lote_id'], linea['contado'], linea['diferencia']), (None, 12, 2))
+        conteos.aplicar(self.conteo.id)
+        self.assertEqual(self.disponible(), 12)
+
+    def comprar(self, unidades):
+        registro = RegistroCompra(User.objects.create_user('comprador'), None, None)
+        compra = registro.crear_compra(Proveedores.objects.create(nombre='Molino'))
+        return registro.agregar_lotes(compra, [{
+            'producto': self.producto, 'cantidad_inicial': unidades, 'cantidad_disponible': unidades,
+            'costo_unitario': Decimal('5'),
+        }])[0]
+
+    def sin_contar(self):
+        conteo = ConteoInventarioViewSet.queryset.get(pk=self.conteo.pk)
+        return conteo.lineas_total - conteo.lineas_contadas
+
+    def test_producto_contado_entero_cubre_sus_lotes(self):
+        otro = Producto.objects.create(nombre='Fideos', precio=Decimal('5'))
+        Lote.objects.create(producto=otro, cantidad_inicial=1, cantidad_disponible=1)
+        for _ in range(2):
+            Lote.objects.create(producto=self.producto, cantidad_inicial=3, cantidad_disponible=3)
+        self.conteo = conteos.abrir(None)
+        self.assertEqual(self.sin_contar(), 4)
+        conteos.contar(self.conteo.id, [{'producto_id': self.producto.id, 'cantidad': 16}])
+        self.assertEqual(self.sin_contar(), 1)
+        conteos.contar(self.conteo.id, [{'producto_id': otro.id, 'cantidad': 1}])
+        self.assertEqual(self.sin_contar(), 0)
+
+    def test_compra_durante_el_conteo_por_lote(self):
+        nuevo = self.comprar(5)
+        conteos.contar(self.conteo.id, [{'lote_id': self.lote.id, 'cantidad': 10}, {'lote_id': nuevo.id, 'cantidad': 4}])
+        linea = conteos.diferencias(self.conteo).get()
+        self.assertEqual((linea['lote_id'], linea['esperado'], linea['movimientos'], linea['diferencia']), (nuevo.id, 0, 5, -1))
+        conteos.aplicar(self.conteo.id)
+        nuevo.refresh_from_db()
+        self.assertEqual((self.disponible(), nuevo.cantidad_disponible), (10, 4))
 
-# Create your tests here.
+    def test_compra_durante_el_conteo_por_producto(self):
+        self.comprar(5)
+        conteos.contar(self.conteo.id, [{'producto_id': self.producto.id, 'cantidad': 15}])
+        self.assertEqual(list(conteos.diferencias(self.conteo)), [])
+        self.assertEqual(self.sin_contar(), 0)
+        conteos.aplicar(self.conteo.id)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.cantidad, 15)
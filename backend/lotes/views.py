@@ -1,12 +1,45 @@
-from rest_framework import viewsets, permissions, filters
-from .models import Lote
-from .serializers import LoteSerializer
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.db import transaction
+from rest_framework import viewsets, permissions, filters, mixins, serializers, status
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .models import ConteoInventario, Lote
+from core import codigos
+from core.cambios import SincronizacionMixin
+from core.models import Producto
+from core.pagination import KeysetPagination
+from ventas import trazabilidad
+from . import conteos, kardex, reservas as reservas_stock
+from .asignacion import lotes_vendibles
+from .serializers import (
+	LoteSerializer, ReservaStockSerializer, ReservaCreateSerializer, CarritoSerializer,
+	AjusteStockSerializer, KardexFiltroSerializer,
+	ConteoInventarioSerializer, ConteoCargaSerializer,
+)
 
-class LoteViewSet(viewsets.ModelViewSet):
-	queryset = Lote.objects.select_related('producto').all()
+class VentasDeLotePagination(KeysetPagination):
+	"""Las ventas de /trazabilidad/ van siempre por páginas, en el orden de detalle_lote_venta_idx."""
+	page_size = 200
+	max_page_size = 1000
+
+	def activa(self, request, view=None):
+		return True
+
+	def get_ordering(self, view):
+		return [('id_venta_id', False), ('id', False)]
+
+
+class LoteViewSet(SincronizacionMixin, viewsets.ModelViewSet):
+	entidad_cambios = 'lote'
+	# compra__id_proveedor: LoteSerializer.get_proveedor lo lee por fila
+	queryset = Lote.objects.select_related('producto', 'compra__id_proveedor').all()
 	serializer_class = LoteSerializer
 	permission_classes = [permissions.IsAuthenticated]
-	pagination_class = None  # Desactivar paginación para devolver todos los lotes
+	pagination_class = KeysetPagination  # Lista completa salvo ?paginacion=cursor
+	keyset_ordering = ('-fecha_compra', '-id')
 	filter_backends = [filters.SearchFilter, filters.OrderingFilter]
 	search_fields = ['numero_lote', 'producto__nombre', 'proveedor']
 	ordering_fields = ['fecha_compra', 'fecha_vencimiento', 'cantidad_inicial', 'cantidad_disponible']
@@ -17,4 +50,267 @@ class LoteViewSet(viewsets.ModelViewSet):
 		producto_id = self.request.query_params.get('producto')
 		if producto_id:
 			qs = qs.filter(producto_id=producto_id)
+		# Reservas vigentes por lote (índice reserva_lote_expira_idx)
+		qs = qs.annotate(cantidad_reservada=Coalesce(Subquery(
+			reservas_stock.vigentes()
+			.filter(lote=OuterRef('pk'))
+			.order_by()
+			.values('lote')
+			.annotate(total=Sum('cantidad'))
+			.values('total')
+		), 0))
+		return qs
+
+	# Ediciones manuales: cada cambio de cantidad_disponible queda en el kardex
+	def perform_create(self, serializer):
+		with transaction.atomic():
+			lote = serializer.save()
+			kardex.registrar([kardex.movimiento(lote, 'EDICION', lote.cantidad_disponible, 'lote', lote.id, self.request.user, 'Alta manual')])
+
+	def perform_update(self, serializer):
+		with transaction.atomic():
+			anterior = Lote.objects.select_for_update().values_list('cantidad_disponible', flat=True).get(pk=serializer.instance.pk)
+			lote = serializer.save()
+			kardex.registrar([kardex.movimiento(lote, 'EDICION', lote.cantidad_disponible - anterior, 'lote', lote.id, self.request.user)])
+
+	def perform_destroy(self, instance):
+		with transaction.atomic():
+			kardex.registrar([kardex.movimiento(instance, 'BAJA', -instance.cantidad_disponible, 'lote', instance.id, self.request.user)])
+			instance.delete()
+
+	@action(detail=True, methods=['post'])
+	def ajustar(self, request, pk=None):
+		"""
+		Ajuste de stock del lote (rotura, diferencia de inventario, devolución):
+		{"cantidad": delta, "tipo": "AJUSTE" | "DEVOLUCION", "notas", "venta_id"}.
+		"""
+		ser = AjusteStockSerializer(data=request.data)
+		ser.is_valid(raise_exception=True)
+		datos = ser.validated_data
+		lote = self.get_object()
+		ref_type, ref_id = ('venta', datos['venta_id']) if datos.get('venta_id') else ('lote', lote.id)
+		kardex.ajustar_lote(lote.id, datos['cantidad'], datos['tipo'], request.user, datos.get('notas') or None, ref_type, ref_id)
+		return Response(self.get_serializer(self.get_object()).data)
+
+	@action(detail=True, methods=['get'], url_path='kardex')
+	def kardex_lote(self, request, pk=None):
+		"""Movimientos del lote con saldo corrido; ?desde= y ?hasta= (ISO 8601) acotan el período."""
+		lote = self.get_object()
+		filtro = KardexFiltroSerializer(data=request.query_params)
+		filtro.is_valid(raise_exception=True)
+		saldo_inicial, movimientos = kardex.kardex(lote_id=lote.id, **filtro.validated_data)
+		return Response({
+			'lote_id': lote.id,
+			'saldo_inicial': saldo_inicial,
+			'saldo_final': movimientos[-1]['saldo'] if movimientos else saldo_inicial,
+			'movimientos': movimientos,
+		})
+
+	@action(detail=True, methods=['get'])
+	def trazabilidad(self, request, pk=None):
+		"""
+		Ventas y clientes que recibieron unidades del lote (recall de proveedor),
+		con la compra y el proveedor de origen.
+		Las ventas vienen por páginas ({next, previous, results}; ?page_size= hasta 1000);
+		?formato=csv devuelve todas, una línea por venta, en CSV generado en streaming.
+		"""
+		lote = get_object_or_404(Lote.objects.select_related('producto', 'compra__id_proveedor'), pk=pk)
+		if request.query_params.get('formato', '').lower() == 'csv':
+			response = StreamingHttpResponse(trazabilidad.filas_csv_lote(lote.id), content_type='text/csv; charset=utf-8')
+			response['Content-Disposition'] = f'attachment; filename="trazabilidad_lote_{lote.id}.csv"'
+			return response
+
+		resumen, clientes = trazabilidad.resumen_lote(lote.id)
+		paginador = VentasDeLotePagination()
+		detalles = paginador.paginate_queryset(trazabilidad.detalles_de_lote(lote.id), request, self)
+		compra = lote.compra
+		proveedor = compra.id_proveedor if compra else None
+		return Response({
+			'lote': {
+				'id': lote.id,
+				'numero_lote': lote.numero_lote,
+				'producto': {'id': lote.producto_id, 'nombre': lote.producto.nombre},
+				'cantidad_inicial': lote.cantidad_inicial,
+				'cantidad_disponible': lote.cantidad_disponible,
+				'fecha_vencimiento': lote.fecha_vencimiento,
+			},
+			'compra': {'id': compra.id, 'fecha_compra': compra.fecha_compra} if compra else None,
+			'proveedor': {'id': proveedor.id, 'nombre': proveedor.nombre} if proveedor else None,
+			'resumen': resumen,
+			'clientes': clientes,
+			'ventas': {
+				'next': paginador.get_next_link(),
+				'previous': paginador.get_previous_link(),
+				'results': trazabilidad.lineas_lote_json(detalles),
+			},
+		})
+
+	@action(detail=False, methods=['get'])
+	def disponibles(self, request):
+		"""
+		Lotes vendibles (activos, con stock y sin vencer) de varios productos en orden
+		FEFO, para armar el carrito del POS: ?productos=1,2,3 y/o ?codigos=779...,SKU-1
+		(códigos de barras, SKU o GS1; hasta 200 en total).
+		Tres consultas: productos, lotes y reservas vigentes; los códigos que no
+		estén en el caché de escaneo suman dos más.
+		"""
+		crudos = [v for valor in request.query_params.getlist('productos') for v in valor.split(',') if v.strip()]
+		lecturas = list(dict.fromkeys(
+			v.strip() for valor in request.query_params.getlist('codigos') for v in valor.split(',') if v.strip()
+		))
+		try:
+			producto_ids = list(dict.fromkeys(int(v) for v in crudos))
+		except ValueError:
+			return Response({"detail": "productos debe ser una lista de ids separados por coma"}, status=status.HTTP_400_BAD_REQUEST)
+		if not producto_ids and not lecturas:
+			return Response({"detail": "Indique ?productos=<id>,<id>,... o ?codigos=<codigo>,..."}, status=status.HTTP_400_BAD_REQUEST)
+		if len(producto_ids) + len(lecturas) > 200:
+			return Response({"detail": "Máximo 200 productos por consulta"}, status=status.HTTP_400_BAD_REQUEST)
+		por_codigo, codigos_no_encontrados = {}, []
+		if lecturas:
+			resultados, codigos_no_encontrados = codigos.resolver_varios(lecturas)
+			por_codigo = {resultado['lectura']: resultado['producto']['id'] for resultado in resultados}
+			producto_ids = list(dict.fromkeys(producto_ids + list(por_codigo.values())))
+
+		productos = Producto.objects.only('id', 'nombre', 'precio', 'cantidad').in_bulk(producto_ids)
+		lotes = lotes_vendibles(productos.keys())
+		reservado = reservas_stock.reservado_por_lote(l.id for lista in lotes.values() for l in lista)
+
+		resultado = []
+		for producto_id in producto_ids:
+			producto = productos.get(producto_id)
+			if producto is None:
+				continue
+			resultado.append({
+				'producto_id': producto.id,
+				'nombre': producto.nombre,
+				'precio': producto.precio,
+				'stock': producto.cantidad,
+				'lotes': [
+					{
+						'id': lote.id,
+						'numero_lote': lote.numero_lote,
+						'cantidad_disponible': lote.cantidad_disponible,
+						'cantidad_reservada': reservado.get(lote.id, 0),
+						'cantidad_libre': max(lote.cantidad_disponible - reservado.get(lote.id, 0), 0),
+						'fecha_vencimiento': lote.fecha_vencimiento,
+						'costo_unitario_final': lote.costo_unitario_final(),
+						'precio_unitario': producto.precio,
+					}
+					for lote in lotes[producto.id]
+				],
+			})
+		no_encontrados = [producto_id for producto_id in producto_ids if producto_id not in productos]
+		respuesta = {'productos': resultado, 'no_encontrados': no_encontrados}
+		if lecturas:
+			respuesta['codigos'] = por_codigo
+			respuesta['codigos_no_encontrados'] = codigos_no_encontrados
+		return Response(respuesta)
+
+
+class ReservaStockViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+	"""
+	Reservas temporales de stock del carrito del POS.
+	POST reserva unidades al escanear (409 si no alcanza el disponible real),
+	la venta con el mismo `carrito` las consume y el resto vence solo.
+	"""
+	serializer_class = ReservaStockSerializer
+	permission_classes = [permissions.IsAuthenticated]
+	pagination_class = None  # Un carrito tiene pocas reservas
+
+	def get_queryset(self):
+		qs = reservas_stock.vigentes().filter(user=self.request.user).select_related('producto').order_by('id')
+		carrito = self.request.query_params.get('carrito')
+		if carrito:
+			qs = qs.filter(carrito=carrito)
 		return qs
+
+	def create(self, request, *args, **kwargs):
+		ser = ReservaCreateSerializer(data=request.data)
+		ser.is_valid(raise_exception=True)
+		data = ser.validated_data
+		producto = Producto.objects.filter(id=data['producto_id']).first()
+		if not producto:
+			return Response({"detail": f"Producto inexistente: {data['producto_id']}"}, status=status.HTTP_404_NOT_FOUND)
+		try:
+			reservas = reservas_stock.reservar(
+				request.user, data['carrito'], producto, data['cantidad'],
+				lote_id=data.get('lote_id'), estrategia=data.get('estrategia'),
+			)
+		except serializers.ValidationError as exc:
+			# Conflicto de stock al escanear: el POS puede avisar antes de cobrar
+			return Response(exc.detail, status=status.HTTP_409_CONFLICT)
+		return Response(ReservaStockSerializer(reservas, many=True).data, status=status.HTTP_201_CREATED)
+
+	@action(detail=False, methods=['post'])
+	def renovar(self, request):
+		ser = CarritoSerializer(data=request.data)
+		ser.is_valid(raise_exception=True)
+		actualizadas, expira = reservas_stock.renovar(request.user, ser.validated_data['carrito'])
+		return Response({"renovadas": actualizadas, "expira": serializers.DateTimeField().to_representation(expira)})
+
+	@action(detail=False, methods=['post'])
+	def liberar(self, request):
+		ser = CarritoSerializer(data=request.data)
+		ser.is_valid(raise_exception=True)
+		return Response({"liberadas": reservas_stock.liberar(request.user, ser.validated_data['carrito'])})
+
+
+class ConteoInventarioViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
+	"""
+	Conteos físicos de inventario. POST abre el conteo (opcionalmente por categoria
+	o marca) y congela el disponible de sus lotes; /contar/ recibe cantidades en
+	lote, /diferencias/ compara contra lo congelado y /aplicar/ ajusta todo junto.
+	"""
+	permission_classes = [permissions.IsAuthenticated]
+	serializer_class = ConteoInventarioSerializer
+	queryset = ConteoInventario.objects.annotate(
+		lineas_total=Count('lineas', filter=Q(lineas__lote__isnull=False)),
+		lineas_contadas=conteos.lotes_contados(),
+	).order_by('-id')
+	pagination_class = KeysetPagination  # Lista completa salvo ?paginacion=cursor
+	keyset_ordering = ('-id',)
+
+	def perform_create(self, serializer):
+		datos = serializer.validated_data
+		serializer.instance = conteos.abrir(self.request.user, datos.get('categoria'), datos.get('marca'), datos.get('notas'))
+
+	def create(self, request, *args, **kwargs):
+		serializer = self.get_serializer(data=request.data)
+		serializer.is_valid(raise_exception=True)
+		self.perform_create(serializer)
+		return Response(self.get_serializer(self.get_queryset().get(pk=serializer.instance.pk)).data, status=status.HTTP_201_CREATED)
+
+	@action(detail=True, methods=['post'])
+	def contar(self, request, pk=None):
+		"""{"items": [{"lote_id" | "producto_id" | "codigo", "cantidad"}, ...], "sumar": false}"""
+		ser = ConteoCargaSerializer(data=request.data)
+		ser.is_valid(raise_exception=True)
+		conteo = self.get_object()
+		actualizadas = conteos.contar(conteo.id, ser.validated_data['items'], ser.validated_data['sumar'])
+		return Response({'lineas_actualizadas': actualizadas})
+
+	@action(detail=True, methods=['get'])
+	def diferencias(self, request, pk=None):
+		"""Líneas contadas con diferencia; ?todas=true incluye las que coinciden."""
+		conteo = self.get_object()
+		todas = request.query_params.get('todas', '').lower() in ('true', '1', 'si')
+		lineas = list(conteos.diferencias(conteo, solo_con_diferencia=not todas))
+		return Response({
+			'conteo': conteo.id,
+			'estado': conteo.estado,
+			'sin_contar': conteo.lineas_total - conteo.lineas_contadas if conteo.estado == 'ABIERTO' else None,
+			'diferencia_neta': sum(linea['diferencia'] for linea in lineas),
+			'lineas': lineas,
+		})
+
+	@action(detail=True, methods=['post'])
+	def aplicar(self, request, pk=None):
+		conteo = self.get_object()
+		resultado = conteos.aplicar(conteo.id, request.user)
+		return Response({'conteo': conteo.id, 'estado': 'APLICADO', **resultado})
+
+	@action(detail=True, methods=['post'])
+	def cancelar(self, request, pk=None):
+		conteo = conteos.cancelar(self.get_object().id)
+		return Response({'conteo': conteo.id, 'estado': conteo.estado})
@@ -3,11 +3,15 @@ from django.shortcuts import render
 # Create your views here.
 from rest_framework import viewsets, filters
 from .models import Marca
+from core.cambios import SincronizacionMixin
+from core.pagination import KeysetPagination
 from .serializers import MarcaSerializer
 
-class MarcaViewSet(viewsets.ModelViewSet):
+class MarcaViewSet(SincronizacionMixin, viewsets.ModelViewSet):
+	entidad_cambios = 'marca'
 	queryset = Marca.objects.all()
 	serializer_class = MarcaSerializer
-	pagination_class = None  # Desactivar paginación para devolver todas las marcas
+	pagination_class = KeysetPagination  # Lista completa salvo ?paginacion=cursor
+	keyset_ordering = ('nombre_marca',)
 	filter_backends = [filters.SearchFilter]
 	search_fields = ['nombre_marca']
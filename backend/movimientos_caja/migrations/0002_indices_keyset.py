@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_indices_keyset'),
+        ('movimientos_caja', '0001_initial'),
+        ('tipo_movimientos', '0001_initial'),
+        ('tipo_pago', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='caja',
+            index=models.Index(fields=['fecha_apertura', 'id'], name='caja_apertura_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientodecaja',
+            index=models.Index(fields=['created_at', 'id'], name='movcaja_created_id_idx'),
+        ),
+    ]
@@ -40,6 +40,9 @@ class Caja(models.Model):
     
     class Meta:
         verbose_name_plural = "Cajas"
+        indexes = [
+            models.Index(fields=['fecha_apertura', 'id'], name='caja_apertura_id_idx'),
+        ]
         permissions = [
             ("can_open_cash_register", "Puede abrir y cerrar la caja"),
         ]
@@ -177,6 +180,9 @@ class MovimientoDeCaja(models.Model):
     
     class Meta:
         verbose_name_plural = "Movimientos de Caja"
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='movcaja_created_id_idx'),
+        ]
 
     def __str__(self):
         return f'Mov. #{self.id} de {self.monto}'
@@ -8,7 +8,9 @@ from django.db import transaction
 
 from .models import Caja, MovimientoDeCaja
 from .serializers import CajaSerializer, MovimientoDeCajaSerializer
+from core.idempotency import idempotente
 from core.models import EmpleadoProfile
+from core.pagination import KeysetPagination
 from tipo_movimientos.models import TipoMovimiento
 from tipo_pago.models import TipoPago
 
@@ -17,7 +19,8 @@ class CajaViewSet(viewsets.ModelViewSet):
 	queryset = Caja.objects.all().order_by('-fecha_apertura')
 	serializer_class = CajaSerializer
 	permission_classes = [IsAuthenticated]
-	pagination_class = None  # Desactivar paginación para devolver todas las cajas
+	pagination_class = KeysetPagination  # Lista completa salvo ?paginacion=cursor
+	keyset_ordering = ('-fecha_apertura', '-id')
 	filter_backends = [filters.SearchFilter]
 	search_fields = ['estado']
 
@@ -137,7 +140,8 @@ class MovimientoDeCajaViewSet(viewsets.ModelViewSet):
 	queryset = MovimientoDeCaja.objects.all().order_by('-created_at')
 	serializer_class = MovimientoDeCajaSerializer
 	permission_classes = [IsAuthenticated]
-	pagination_class = None  # Desactivar paginación para devolver todos los movimientos
+	pagination_class = KeysetPagination  # Lista completa salvo ?paginacion=cursor
+	keyset_ordering = ('-created_at', '-id')
 	filter_backends = [DjangoFilterBackend, filters.SearchFilter]
 	filterset_fields = ['caja', 'origen', 'ref_type', 'ref_id']
 	search_fields = ['origen', 'ref_type']
@@ -159,6 +163,10 @@ class MovimientoDeCajaViewSet(viewsets.ModelViewSet):
 		# Caja global, todos pueden ver movimientos
 		return super().list(request, *args, **kwargs)
 
+	@idempotente('caja-movimientos')
+	def create(self, request, *args, **kwargs):
+		return super().create(request, *args, **kwargs)
+
 	def perform_create(self, serializer):
 		empleado = self.get_empleado(self.request.user)
 		# Opción C: permitir omitir "caja" y tomar la sesión abierta global
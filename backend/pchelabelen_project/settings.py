@@ -51,6 +51,7 @@ INSTALLED_APPS = [
     'proveedores',
     'tipo_movimientos',
     'tipo_pago',
+    'promociones',
     'core.apps.CoreConfig',
     'rest_framework',
     'corsheaders',
@@ -176,6 +177,47 @@ REST_FRAMEWORK = {
     "DATETIME_FORMAT": "%Y-%m-%dT%H:%M:%S%z",
 }
 
+# Estrategia por defecto para asignar lotes en ventas sin lotes_asignados (FEFO | FIFO | COSTO)
+LOTES_ESTRATEGIA_ASIGNACION = config('LOTES_ESTRATEGIA_ASIGNACION', default='FEFO')
+# Vigencia de una reserva de stock de carrito (se renueva con cada escaneo del mismo carrito)
+RESERVAS_TTL_SEGUNDOS = config('RESERVAS_TTL_SEGUNDOS', default=600, cast=int)
+# Antigüedad mínima de los movimientos de stock que entran en un snapshot (snapshot_stock):
+# debe superar la transacción más larga que escribe en el kardex (importación de facturas, conteos)
+KARDEX_SNAPSHOT_MARGEN_SEGUNDOS = config('KARDEX_SNAPSHOT_MARGEN_SEGUNDOS', default=600, cast=int)
+
+# Punto de venta (secuencia de numeración de tickets) cuando la venta no indica punto_venta
+VENTAS_PUNTO_VENTA = config('VENTAS_PUNTO_VENTA', default='PRINCIPAL')
+# Precios y descuentos de las ventas calculados por el motor de promociones (la venta puede pedirlo con precio_servidor)
+VENTAS_PRECIO_SERVIDOR = config('VENTAS_PRECIO_SERVIDOR', default=False, cast=bool)
+# Cada cuánto un proceso verifica si cambiaron las reglas de precio de otro proceso
+PROMOCIONES_VERIFICAR_SEGUNDOS = config('PROMOCIONES_VERIFICAR_SEGUNDOS', default=5, cast=int)
+
+# Sincronización incremental del catálogo (?since=): los cambios se anotan después del commit y
+# los más recientes que este margen se entregan en la consulta siguiente (cubre dos INSERT
+# concurrentes que confirman en otro orden que el de sus ids)
+CATALOGO_MARGEN_SEGUNDOS = config('CATALOGO_MARGEN_SEGUNDOS', default=2, cast=int)
+# Días que se conservan las bajas (tombstones); un cliente más atrasado recarga todo
+CATALOGO_RETENCION_DIAS = config('CATALOGO_RETENCION_DIAS', default=30, cast=int)
+
+# Caché de escaneo del POS (/api/productos/scan/): códigos por proceso, cada cuánto se leen los
+# cambios de otros procesos y vida máxima de una entrada
+CODIGOS_CACHE_TAMANO = config('CODIGOS_CACHE_TAMANO', default=2000, cast=int)
+CODIGOS_VERIFICAR_SEGUNDOS = config('CODIGOS_VERIFICAR_SEGUNDOS', default=2, cast=int)
+CODIGOS_CACHE_SEGUNDOS = config('CODIGOS_CACHE_SEGUNDOS', default=60, cast=int)
+
+# Variantes de las imágenes de productos (lado mayor en px, WebP y JPEG), generadas por un pool de
+# hilos del proceso; IMAGENES_SINCRONICO las genera dentro del request (desarrollo, pruebas)
+IMAGENES_TAMANOS = (64, 256, 1024)
+IMAGENES_HILOS = config('IMAGENES_HILOS', default=2, cast=int)
+IMAGENES_SINCRONICO = config('IMAGENES_SINCRONICO', default=False, cast=bool)
+
+# Idempotencia (Idempotency-Key): vigencia de la respuesta guardada, espera máxima de un
+# reintento mientras el original sigue en curso y tiempo tras el cual un reclamo EN_CURSO
+# se considera abandonado (proceso caído)
+IDEMPOTENCY_TTL_HORAS = config('IDEMPOTENCY_TTL_HORAS', default=24, cast=int)
+IDEMPOTENCY_ESPERA_SEGUNDOS = config('IDEMPOTENCY_ESPERA_SEGUNDOS', default=5, cast=float)
+IDEMPOTENCY_ABANDONO_SEGUNDOS = config('IDEMPOTENCY_ABANDONO_SEGUNDOS', default=120, cast=int)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=8),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
@@ -1,14 +1,16 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenRefreshView
-from core.views import me, get_users, UserViewSet, ProductoViewSet, EmpleadoViewSet, CustomTokenObtainPairView
+from core.views import me, get_users, UserViewSet, ProductoViewSet, CodigoBarrasViewSet, EmpleadoViewSet, CustomTokenObtainPairView
 from productos.views import CategoriaViewSet
-from lotes.views import LoteViewSet
+from lotes.views import LoteViewSet, ReservaStockViewSet, ConteoInventarioViewSet
 from proveedores.views import ProveedorViewSet
 from clientes.views import ClienteViewSet
 from marcas.views import MarcaViewSet
 from movimientos_caja.views import CajaViewSet, MovimientoDeCajaViewSet
 from ventas.views import VentaViewSet
+from promociones.views import ReglaPrecioViewSet
+from compras.views import CompraViewSet, CodigoProveedorViewSet
 from rest_framework.routers import DefaultRouter
 from django.conf import settings
 from django.conf.urls.static import static
@@ -18,14 +20,20 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, Sp
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
 router.register(r'productos', ProductoViewSet)
+router.register(r'codigos-barras', CodigoBarrasViewSet)
 router.register(r'categorias', CategoriaViewSet)
 router.register(r'lotes', LoteViewSet)
+router.register(r'reservas', ReservaStockViewSet, basename='reservas')
+router.register(r'conteos', ConteoInventarioViewSet)
 router.register(r'proveedores', ProveedorViewSet)
 router.register(r'clientes', ClienteViewSet)
 router.register(r'marcas', MarcaViewSet)
 router.register(r'caja', CajaViewSet, basename='caja')
 router.register(r'caja-movimientos', MovimientoDeCajaViewSet, basename='caja-movimientos')
 router.register(r'ventas', VentaViewSet, basename='ventas')
+router.register(r'reglas-precio', ReglaPrecioViewSet)
+router.register(r'compras', CompraViewSet, basename='compras')
+router.register(r'codigos-proveedor', CodigoProveedorViewSet, basename='codigos-proveedor')
 router.register(r'empleados', EmpleadoViewSet, basename='empleados')
 
 urlpatterns = [
@@ -1,9 +1,13 @@
 from rest_framework import viewsets, permissions
 from .models import Categoria
+from core.cambios import SincronizacionMixin
+from core.pagination import KeysetPagination
 from .serializers import CategoriaSerializer
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaViewSet(SincronizacionMixin, viewsets.ModelViewSet):
+	entidad_cambios = 'categoria'
 	queryset = Categoria.objects.all().order_by('nombre')
 	serializer_class = CategoriaSerializer
 	permission_classes = [permissions.IsAuthenticated]
-	pagination_class = None  # Desactivar paginación para devolver todas las categorías
+	pagination_class = KeysetPagination  # Lista completa salvo ?paginacion=cursor
+	keyset_ordering = ('nombre',)
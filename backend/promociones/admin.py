@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import ReglaPrecio
+
+@admin.register(ReglaPrecio)
+class ReglaPrecioAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'tipo', 'valor', 'producto', 'categoria', 'marca', 'prioridad', 'activo', 'vigente_desde', 'vigente_hasta')
+    list_filter = ('tipo', 'activo')
+    search_fields = ('nombre',)
+    raw_id_fields = ('producto',)
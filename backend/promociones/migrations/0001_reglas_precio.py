@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0004_idempotency_key'),
+        ('marcas', '0001_initial'),
+        ('productos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReglaPrecio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('tipo', models.CharField(choices=[('PORCENTAJE', '% de descuento'), ('MONTO', '$ de descuento por unidad'), ('PRECIO_FIJO', 'Precio fijo por unidad'), ('NXM', 'Lleva N, paga M')], max_length=12)),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('lleva_n', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('paga_m', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('cantidad_minima', models.PositiveIntegerField(default=1)),
+                ('condicion_iva', models.CharField(blank=True, choices=[('CF', 'Consumidor Final'), ('RI', 'Responsable Inscripto'), ('MT', 'Monotributo'), ('EX', 'Exento'), ('NR', 'No Responsable')], max_length=2, null=True)),
+                ('vigente_desde', models.DateTimeField(blank=True, null=True)),
+                ('vigente_hasta', models.DateTimeField(blank=True, null=True)),
+                ('prioridad', models.PositiveSmallIntegerField(default=100)),
+                ('activo', models.BooleanField(default=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reglas_precio', to='productos.categoria')),
+                ('marca', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reglas_precio', to='marcas.marca')),
+                ('producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reglas_precio', to='core.producto')),
+            ],
+            options={
+                'verbose_name': 'Regla de precio',
+                'verbose_name_plural': 'Reglas de precio',
+                'ordering': ['prioridad', 'id'],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from clientes.models import Clientes
+
+
+# ==========================================================
+# REGLAS DE PRECIO / PROMOCIONES
+# ==========================================================
+# Cada regla aplica a un producto, una categoría, una marca o (sin ninguno) a
+# todo el catálogo. Por línea se aplica la regla que deja el menor subtotal;
+# no se acumulan. Ver promociones/motor.py.
+
+class ReglaPrecioQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # update() (y bulk_update) no pasa por auto_now ni dispara señales: sin
+        # tocar `actualizado` los demás procesos no verían el cambio en la firma
+        kwargs.setdefault('actualizado', timezone.now())
+        filas = super().update(**kwargs)
+        from .motor import invalidar
+        invalidar()
+        return filas
+
+
+class ReglaPrecio(models.Model):
+    TIPOS = (
+        ('PORCENTAJE', '% de descuento'),
+        ('MONTO', '$ de descuento por unidad'),
+        ('PRECIO_FIJO', 'Precio fijo por unidad'),
+        ('NXM', 'Lleva N, paga M'),
+    )
+
+    nombre = models.CharField(max_length=100)
+    tipo = models.CharField(max_length=12, choices=TIPOS)
+    # Porcentaje, monto por unidad o precio fijo según `tipo` (no se usa en NXM)
+    valor = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    lleva_n = models.PositiveSmallIntegerField(null=True, blank=True)
+    paga_m = models.PositiveSmallIntegerField(null=True, blank=True)
+    # Escalón por cantidad: la regla aplica desde esta cantidad en la línea
+    cantidad_minima = models.PositiveIntegerField(default=1)
+
+    producto = models.ForeignKey('core.Producto', on_delete=models.CASCADE, null=True, blank=True, related_name='reglas_precio')
+    categoria = models.ForeignKey('productos.Categoria', on_delete=models.CASCADE, null=True, blank=True, related_name='reglas_precio')
+    marca = models.ForeignKey('marcas.Marca', on_delete=models.CASCADE, null=True, blank=True, related_name='reglas_precio')
+    condicion_iva = models.CharField(max_length=2, choices=Clientes.CONDICION_IVA, blank=True, null=True)
+
+    vigente_desde = models.DateTimeField(null=True, blank=True)
+    vigente_hasta = models.DateTimeField(null=True, blank=True)
+    # A igual subtotal gana la de menor prioridad
+    prioridad = models.PositiveSmallIntegerField(default=100)
+    activo = models.BooleanField(default=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    objects = ReglaPrecioQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['prioridad', 'id']
+        verbose_name = 'Regla de precio'
+        verbose_name_plural = 'Reglas de precio'
+
+    def __str__(self):
+        return f"{self.nombre} ({self.get_tipo_display()})"
+
+
+@receiver(post_save, sender=ReglaPrecio)
+@receiver(post_delete, sender=ReglaPrecio)
+def invalidar_indice_reglas(sender, **kwargs):
+    # Los demás procesos lo detectan por la firma (ver motor.obtener_indice)
+    from .motor import invalidar
+    invalidar()
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import ReglaPrecio
+
+
+# ==========================================================
+# MOTOR DE PRECIOS
+# ==========================================================
+# Las reglas activas se compilan en un índice en memoria por producto,
+# categoría y marca. Cotizar una línea son unas pocas búsquedas en diccionarios;
+# la base sólo se consulta para reconstruir el índice cuando las reglas cambian.
+#
+# Cambio detectado por: la señal post_save/post_delete (mismo proceso) o la
+# firma (MAX(actualizado), COUNT(*)) que cada proceso revisa cada
+# PROMOCIONES_VERIFICAR_SEGUNDOS. Los update() masivos también tocan
+# `actualizado` (ReglaPrecioQuerySet), así que cambian la firma.
+
+CIEN = Decimal('100')
+CENTAVO = Decimal('0.01')
+
+
+class Indice:
+    def __init__(self, reglas):
+        self.por_producto = defaultdict(list)
+        self.por_categoria = defaultdict(list)
+        self.por_marca = defaultdict(list)
+        self.globales = []
+        for regla in reglas:
+            if regla.producto_id:
+                self.por_producto[regla.producto_id].append(regla)
+            elif regla.categoria_id:
+                self.por_categoria[regla.categoria_id].append(regla)
+            elif regla.marca_id:
+                self.por_marca[regla.marca_id].append(regla)
+            else:
+                self.globales.append(regla)
+
+    def candidatas(self, producto):
+        return (
+            self.por_producto.get(producto.id, [])
+            + self.por_categoria.get(producto.categoria_ref_id, [])
+            + self.por_marca.get(producto.marca_id, [])
+            + self.globales
+        )
+
+
+_lock = threading.Lock()
+_estado = {'indice': None, 'firma': None, 'verificado': 0.0}
+
+
+def _firma():
+    agregado = ReglaPrecio.objects.aggregate(ultima=Max('actualizado'), total=Count('id'))
+    return agregado['ultima'], agregado['total']
+
+
+def invalidar():
+    with _lock:
+        _estado['indice'] = None
+
+
+def obtener_indice():
+    intervalo = getattr(settings, 'PROMOCIONES_VERIFICAR_SEGUNDOS', 5)
+    ahora = time.monotonic()
+    with _lock:
+        indice = _estado['indice']
+        if indice is not None and ahora - _estado['verificado'] < intervalo:
+            return indice
+    firma = _firma()
+    with _lock:
+        if _estado['indice'] is None or firma != _estado['firma']:
+            reglas = list(ReglaPrecio.objects.filter(activo=True).order_by('prioridad', 'id'))
+            _estado['indice'] = Indice(reglas)
+            _estado['firma'] = firma
+        _estado['verificado'] = ahora
+        return _estado['indice']
+
+
+# ==========================================================
+# COTIZACIÓN
+# ==========================================================
+
+class LineaCotizada(NamedTuple):
+    producto: object
+    cantidad: int
+    precio_unitario: Decimal
+    # Porcentaje equivalente sobre el bruto, con precisión completa (DetalleVenta lo guarda a 2 decimales)
+    descuento_por_item: Decimal
+    bruto: Decimal
+    subtotal: Decimal
+    regla: Optional[ReglaPrecio]
+
+
+def _aplica(regla, cantidad, condicion_iva, ahora):
+    if cantidad < regla.cantidad_minima:
+        return False
+    if regla.condicion_iva and regla.condicion_iva != condicion_iva:
+        return False
+    if regla.vigente_desde and ahora < regla.vigente_desde:
+        return False
+    if regla.vigente_hasta and ahora > regla.vigente_hasta:
+        return False
+    return True
+
+
+def subtotal_regla(regla, precio, cantidad):
+    """Subtotal de `cantidad` unidades a `precio` de lista con la regla aplicada (nunca mayor al bruto)."""
+    bruto = precio * cantidad
+    if regla.tipo == 'PORCENTAJE':
+        total = bruto * (1 - min(regla.valor, CIEN) / CIEN)
+    elif regla.tipo == 'MONTO':
+        total = max(precio - regla.valor, Decimal('0')) * cantidad
+    elif regla.tipo == 'PRECIO_FIJO':
+        total = min(regla.valor, precio) * cantidad
+    elif regla.tipo == 'NXM' and regla.lleva_n and regla.paga_m is not None:
+        grupos, resto = divmod(cantidad, regla.lleva_n)
+        total = (grupos * min(regla.paga_m, regla.lleva_n) + resto) * precio
+    else:
+        total = bruto
+    return min(total.quantize(CENTAVO, rounding=ROUND_HALF_UP), bruto)
+
+
+def cotizar_linea(indice, producto, cantidad, condicion_iva=None, ahora=None):
+    ahora = ahora or timezone.now()
+    precio = Decimal(producto.precio)
+    bruto = precio * cantidad
+    mejor, subtotal = None, bruto
+    for regla in indice.candidatas(producto):
+        if not _aplica(regla, cantidad, condicion_iva, ahora):
+            continue
+        total = subtotal_regla(regla, precio, cantidad)
+        if total < subtotal or (mejor is not None and total == subtotal and (regla.prioridad, regla.id) < (mejor.prioridad, mejor.id)):
+            mejor, subtotal = regla, total
+    descuento = (1 - subtotal / bruto) * CIEN if bruto else Decimal('0')
+    return LineaCotizada(producto, cantidad, precio, descuento, bruto, subtotal, mejor)
+
+
+def cotizar(items, productos, cliente=None, ahora=None):
+    """
+    Cotiza `items` ([{'producto_id', 'cantidad'}, ...]) con los precios de lista
+    de `productos` ({id: Producto}) y las reglas vigentes. No escribe nada.
+    """
+    indice = obtener_indice()
+    ahora = ahora or timezone.now()
+    condicion_iva = getattr(cliente, 'condicion_iva', None)
+    return [
+        cotizar_linea(indice, productos[it['producto_id']], it['cantidad'], condicion_iva, ahora)
+        for it in items
+    ]
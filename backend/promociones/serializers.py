@@ -0,0 +1,37 @@
+from rest_framework import serializers
+from .models import ReglaPrecio
+
+
+class ReglaPrecioSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReglaPrecio
+        fields = [
+            'id', 'nombre', 'tipo', 'valor', 'lleva_n', 'paga_m', 'cantidad_minima',
+            'producto', 'categoria', 'marca', 'condicion_iva',
+            'vigente_desde', 'vigente_hasta', 'prioridad', 'activo', 'creado', 'actualizado',
+        ]
+        read_only_fields = ['creado', 'actualizado']
+
+    def validate(self, attrs):
+        # En un PATCH se valida contra los valores resultantes
+        datos = dict(attrs)
+        if self.instance is not None:
+            for campo in ('producto', 'categoria', 'marca', 'tipo', 'valor', 'lleva_n', 'paga_m', 'vigente_desde', 'vigente_hasta'):
+                datos.setdefault(campo, getattr(self.instance, campo))
+        alcance = [f for f in ('producto', 'categoria', 'marca') if datos.get(f)]
+        if len(alcance) > 1:
+            raise serializers.ValidationError({'detail': 'La regla aplica a un producto, una categoría o una marca, no a varios'})
+        tipo = datos.get('tipo')
+        valor = datos.get('valor') or 0
+        if tipo == 'NXM':
+            n, m = datos.get('lleva_n'), datos.get('paga_m')
+            if not n or not m or m >= n:
+                raise serializers.ValidationError({'lleva_n': 'NXM requiere lleva_n > paga_m >= 1'})
+        elif valor < 0:
+            raise serializers.ValidationError({'valor': 'No puede ser negativo'})
+        elif tipo == 'PORCENTAJE' and valor > 100:
+            raise serializers.ValidationError({'valor': 'El porcentaje debe estar entre 0 y 100'})
+        desde, hasta = datos.get('vigente_desde'), datos.get('vigente_hasta')
+        if desde and hasta and hasta < desde:
+            raise serializers.ValidationError({'vigente_hasta': 'Debe ser posterior a vigente_desde'})
+        return attrs
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from clientes.models import Clientes
+from core.models import EmpleadoProfile, Producto
+from lotes.models import Lote
+from marcas.models import Marca
+from movimientos_caja.models import Caja
+from productos.models import Categoria
+from ventas.models import DetalleVenta, Venta
+from ventas.numeracion import numerador
+
+from . import motor
+from .models import ReglaPrecio
+
+
+class MotorPreciosTests(TestCase):
+    def setUp(self):
+        # El índice de reglas y los bloques de numeración viven en memoria del proceso
+        motor.invalidar()
+        numerador._pools.clear()
+        user = User.objects.create_user('cajero', 'cajero@example.com', 'x')
+        user.groups.add(Group.objects.get_or_create(name='gerente')[0])
+        empleado = EmpleadoProfile.objects.create(user=user, nombre='C', apellido='J', dni='1', email='cajero@example.com')
+        Caja.objects.create(empleado_apertura=empleado, monto_inicial=0)
+        self.categoria = Categoria.objects.create(nombre='Bebidas')
+        self.marca = Marca.objects.create(nombre_marca='Acme')
+        self.producto = Producto.objects.create(
+            nombre='Gaseosa', precio=Decimal('100'), categoria_ref=self.categoria, marca=self.marca,
+        )
+        self.otro = Producto.objects.create(nombre='Pan', precio=Decimal('50'))
+        for producto in (self.producto, self.otro):
+            Lote.objects.create(producto=producto, cantidad_inicial=100, cantidad_disponible=100)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def regla(self, nombre, tipo, valor=0, **campos):
+        return ReglaPrecio.objects.create(nombre=nombre, tipo=tipo, valor=Decimal(valor), **campos)
+
+    def cotizar(self, cantidad, producto=None, cliente=None):
+        producto = producto or self.producto
+        body = {'items': [{'producto_id': producto.id, 'cantidad': cantidad}]}
+        if cliente:
+            body['cliente_id'] = cliente.id
+        respuesta = self.client.post('/api/ventas/cotizar/', body, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        item = respuesta.json()['items'][0]
+        return Decimal(str(item['subtotal'])), item['regla']['nombre'] if item['regla'] else None
+
+    def test_gana_la_regla_de_menor_subtotal(self):
+        self.regla('Categoría', 'PORCENTAJE', 10, categoria=self.categoria)
+        self.regla('Marca', 'MONTO', 15, marca=self.marca)
+        self.regla('Producto', 'PRECIO_FIJO', 90, producto=self.producto)
+        self.assertEqual(self.cotizar(2), (Decimal('170'), 'Marca'))
+        # Las reglas de otro producto, categoría o marca no lo alcanzan
+        self.assertEqual(self.cotizar(2, self.otro), (Decimal('100'), None))
+
+    def test_escalon_por_cantidad_y_nxm(self):
+        self.regla('3x2', 'NXM', lleva_n=3, paga_m=2, producto=self.producto)
+        self.regla('Mayorista', 'PORCENTAJE', 40, cantidad_minima=10, producto=self.producto)
+        self.assertEqual(self.cotizar(2), (Decimal('200'), None))
+        self.assertEqual(self.cotizar(4), (Decimal('300'), '3x2'))
+        self.assertEqual(self.cotizar(10), (Decimal('600'), 'Mayorista'))
+
+    def test_condicion_iva_y_vigencia(self):
+        ahora = timezone.now()
+        self.regla('Sólo RI', 'PORCENTAJE', 10, condicion_iva='RI')
+        self.regla('Vencida', 'PORCENTAJE', 50, vigente_hasta=ahora - timedelta(days=1))
+        self.regla('Futura', 'PORCENTAJE', 50, vigente_desde=ahora + timedelta(days=1))
+        inscripto = Clientes.objects.create(nombre='Ana', apellido='A', condicion_iva='RI')
+        final = Clientes.objects.create(nombre='Beto', apellido='B', condicion_iva='CF')
+        self.assertEqual(self.cotizar(1, cliente=inscripto), (Decimal('90'), 'Sólo RI'))
+        self.assertEqual(self.cotizar(1, cliente=final), (Decimal('100'), None))
+        self.assertEqual(self.cotizar(1), (Decimal('100'), None))
+
+    def test_venta_con_precio_servidor(self):
+        self.regla('3x2', 'NXM', lleva_n=3, paga_m=2, producto=self.producto)
+        body = {
+            'medio_pago': 'EFECTIVO', 'precio_servidor': True,
+            'items': [
+                {'producto_id': self.producto.id, 'cantidad': 3, 'precio_unitario': '1'},
+                {'producto_id': self.otro.id, 'cantidad': 1},
+            ],
+        }
+        respuesta = self.client.post('/api/ventas/', body, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        venta = Venta.objects.get(pk=respuesta.json()['id'])
+        self.assertEqual((venta.bruto, venta.descuento_total, venta.monto_total), (Decimal('350'), Decimal('100'), Decimal('250')))
+        detalle = DetalleVenta.objects.get(id_venta=venta, id_producto=self.producto)
+        self.assertEqual((detalle.precio_unitario, detalle.subtotal), (Decimal('100'), Decimal('200')))
+
+    @override_settings(PROMOCIONES_VERIFICAR_SEGUNDOS=0)
+    def test_update_masivo_cambia_la_firma(self):
+        self.regla('Producto', 'PORCENTAJE', 10, producto=self.producto)
+        indice = motor.obtener_indice()
+        self.assertEqual(self.cotizar(1), (Decimal('90'), 'Producto'))
+        ReglaPrecio.objects.filter(producto=self.producto).update(activo=False)
+        # Otro proceso conserva su índice: sólo se entera por la firma
+        with motor._lock:
+            motor._estado['indice'] = indice
+        self.assertEqual(self.cotizar(1), (Decimal('100'), None))
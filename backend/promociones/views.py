@@ -0,0 +1,15 @@
+from rest_framework import viewsets, permissions, filters
+from django_filters.rest_framework import DjangoFilterBackend
+
+from .models import ReglaPrecio
+from .serializers import ReglaPrecioSerializer
+
+
+class ReglaPrecioViewSet(viewsets.ModelViewSet):
+	permission_classes = [permissions.IsAuthenticated]
+	queryset = ReglaPrecio.objects.all()
+	serializer_class = ReglaPrecioSerializer
+	pagination_class = None  # Pocas reglas: el POS las carga todas
+	filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+	filterset_fields = ['tipo', 'activo', 'producto', 'categoria', 'marca']
+	search_fields = ['nombre']
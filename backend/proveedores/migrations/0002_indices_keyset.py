@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proveedores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='proveedores',
+            index=models.Index(fields=['nombre', 'id'], name='proveedor_nombre_id_idx'),
+        ),
+    ]
@@ -12,5 +12,10 @@ class Proveedores(models.Model):
     notas = models.TextField(blank=True, null=True)
     activo = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['nombre', 'id'], name='proveedor_nombre_id_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
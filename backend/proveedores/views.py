@@ -2,13 +2,17 @@ from rest_framework import viewsets, permissions
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Proveedores
+from core.cambios import SincronizacionMixin
+from core.pagination import KeysetPagination
 from .serializers import ProveedorSerializer
 
-class ProveedorViewSet(viewsets.ModelViewSet):
+class ProveedorViewSet(SincronizacionMixin, viewsets.ModelViewSet):
+    entidad_cambios = 'proveedor'
     queryset = Proveedores.objects.all().order_by('nombre')
     serializer_class = ProveedorSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = None  # Desactivar paginación para devolver todos los proveedores
+    pagination_class = KeysetPagination  # Lista completa salvo ?paginacion=cursor
+    keyset_ordering = ('nombre', 'id')
 
     def destroy(self, request, *args, **kwargs):
         from django.db.models.deletion import ProtectedError
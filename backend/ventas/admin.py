@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Venta, DetalleVenta
+from .models import Venta, DetalleVenta, SecuenciaVenta
 
 # Clase Inline para ver los detalles dentro de la venta
 class DetalleVentaInline(admin.TabularInline):
@@ -9,13 +9,19 @@ class DetalleVentaInline(admin.TabularInline):
 # --- Registro de Venta ---
 @admin.register(Venta)
 class VentaAdmin(admin.ModelAdmin):
-    list_display = ('id', 'fecha_venta', 'empleado', 'caja', 'monto_total')
+    list_display = ('id', 'numero', 'fecha_venta', 'empleado', 'caja', 'monto_total')
     list_filter = ('fecha_venta', 'empleado')
-    search_fields = ('empleado__user__username',)
+    search_fields = ('numero', 'empleado__user__username')
     # Muestra los detalles de la venta en la misma página
     inlines = [DetalleVentaInline] 
     raw_id_fields = ('caja', 'empleado') 
 
+@admin.register(SecuenciaVenta)
+class SecuenciaVentaAdmin(admin.ModelAdmin):
+    list_display = ('codigo', 'prefijo', 'formato', 'siguiente', 'tamano_bloque')
+    # `siguiente` lo avanza la reserva de bloques; editarlo a mano puede repetir números
+    readonly_fields = ('siguiente',)
+
 # No necesitamos registrar DetalleVenta por separado si usamos Inline, pero lo hacemos por si acaso.
 # @admin.register(DetalleVenta)
 # class DetalleVentaAdmin(admin.ModelAdmin):
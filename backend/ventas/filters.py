@@ -1,6 +1,7 @@
 import django_filters
 from datetime import datetime, time
 from django.utils.timezone import make_aware, is_naive
+from rest_framework.filters import SearchFilter
 from .models import Venta
 
 
@@ -37,3 +38,18 @@ class VentaFilter(django_filters.FilterSet):
         if is_naive(dt):
             dt = make_aware(dt)
         return queryset.filter(fecha_venta__lte=dt)
+
+
+class VentaSearchFilter(SearchFilter):
+    """
+    ?search= con un número de ticket exacto se resuelve por el índice único de
+    Venta.numero; cualquier otro término usa la búsqueda parcial de siempre.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if len(terms) == 1:
+            por_numero = queryset.filter(numero=terms[0])
+            if por_numero.exists():
+                return por_numero
+        return super().filter_queryset(request, queryset, view)
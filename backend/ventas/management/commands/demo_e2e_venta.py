@@ -4,7 +4,7 @@ from decimal import Decimal
 from rest_framework.test import APIRequestFactory, force_authenticate
 
 from core.models import Producto, EmpleadoProfile
-from lotes.models import Lote
+from lotes.models import Lote, diferir_recalculo_stock
 from movimientos_caja.models import Caja
 from ventas.views import VentaViewSet
 
@@ -43,8 +43,9 @@ class Command(BaseCommand):
             caja = Caja.objects.create(usuario=user, empleado_apertura=None, monto_inicial=opening, estado='ABIERTA')
 
         # Crear producto y lote
-        prod = Producto.objects.create(nombre='Producto E2E', precio=precio, cantidad=0)
-        lote = Lote.objects.create(producto=prod, cantidad_inicial=10, cantidad_disponible=10, costo_unitario=Decimal('1000'))
+        with diferir_recalculo_stock():
+            prod = Producto.objects.create(nombre='Producto E2E', precio=precio, cantidad=0)
+            lote = Lote.objects.create(producto=prod, cantidad_inicial=10, cantidad_disponible=10, costo_unitario=Decimal('1000'))
 
         # Preparar request a VentaViewSet
         factory = APIRequestFactory()
@@ -0,0 +1,21 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from ventas.numeracion import reporte_huecos
+
+
+class Command(BaseCommand):
+    help = (
+        "Lista los números de ticket reservados por bloque que no tienen venta asociada. "
+        "Los bloques recientes pueden seguir en uso por un proceso activo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--punto-venta', type=str, help='Código de la secuencia (por defecto, todas)')
+
+    def handle(self, *args, **options):
+        reporte = reporte_huecos(options['punto_venta'])
+        total = sum(len(fila['sin_usar']) for fila in reporte)
+        self.stdout.write(json.dumps(reporte, indent=2, ensure_ascii=False))
+        self.stdout.write(self.style.SUCCESS(f'Números reservados sin usar: {total}'))
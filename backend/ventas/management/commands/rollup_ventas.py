@@ -0,0 +1,64 @@
+import json
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from ventas.models import Venta
+from ventas.rollups import reconstruir, verificar
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye (o verifica con --verificar) los resúmenes de ventas por hora y por producto "
+        "a partir de Venta/DetalleVenta, procesando el rango en bloques de días. "
+        "Conviene reconstruir días ya cerrados: las ventas del día se acumulan solas al registrarse."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=str, help='YYYY-MM-DD (por defecto, la primera venta)')
+        parser.add_argument('--hasta', type=str, help='YYYY-MM-DD (por defecto, hoy)')
+        parser.add_argument('--dias', type=int, default=7, help='Días por bloque/transacción')
+        parser.add_argument('--verificar', action='store_true', help='Sólo comparar, sin escribir')
+
+    def _fecha(self, valor, nombre):
+        try:
+            return datetime.strptime(valor, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'{nombre} debe tener formato YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        hasta = self._fecha(options['hasta'], '--hasta') if options['hasta'] else timezone.localdate()
+        if options['desde']:
+            desde = self._fecha(options['desde'], '--desde')
+        else:
+            primera = Venta.objects.aggregate(primera=Min('fecha_venta'))['primera']
+            if not primera:
+                self.stdout.write(self.style.SUCCESS('No hay ventas registradas'))
+                return
+            desde = timezone.localtime(primera).date()
+        if desde > hasta:
+            raise CommandError('--desde no puede ser posterior a --hasta')
+        paso = timedelta(days=max(1, options['dias']))
+
+        diferencias = []
+        inicio = desde
+        while inicio <= hasta:
+            fin = min(inicio + paso - timedelta(days=1), hasta)
+            if options['verificar']:
+                encontradas = verificar(inicio, fin)
+                diferencias.extend(encontradas)
+                self.stdout.write(f'{inicio} a {fin}: {len(encontradas)} diferencias')
+            else:
+                horas, productos = reconstruir(inicio, fin)
+                self.stdout.write(f'{inicio} a {fin}: {horas} filas hora, {productos} filas producto')
+            inicio = fin + timedelta(days=1)
+
+        if options['verificar']:
+            if diferencias:
+                self.stdout.write(json.dumps(diferencias, indent=2, ensure_ascii=False))
+                raise CommandError(f'Los resúmenes no coinciden con las ventas ({len(diferencias)} diferencias)')
+            self.stdout.write(self.style.SUCCESS('Resúmenes verificados: sin diferencias'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Resúmenes reconstruidos del {desde} al {hasta}'))
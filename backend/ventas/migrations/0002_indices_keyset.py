@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0003_indices_keyset'),
+        ('core', '0003_indices_keyset'),
+        ('movimientos_caja', '0002_indices_keyset'),
+        ('ventas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['fecha_venta', 'id'], name='venta_fecha_id_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_indices_keyset'),
+        ('ventas', '0002_indices_keyset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenProductoDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('bruto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('descuento', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.producto')),
+            ],
+            options={
+                'verbose_name_plural': 'Resúmenes de Producto por Día',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'producto'), name='resumen_producto_dia_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenVentaHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora', models.PositiveSmallIntegerField()),
+                ('medio_pago', models.CharField(max_length=20)),
+                ('tickets', models.PositiveIntegerField(default=0)),
+                ('monto_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.empleadoprofile')),
+            ],
+            options={
+                'verbose_name_plural': 'Resúmenes de Venta por Hora',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'hora', 'medio_pago', 'empleado'), name='resumen_venta_hora_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0003_resumenes_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='bruto',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='descuento_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='unidades',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+from django.db.models import Count, DecimalField, F, Sum
+
+
+LOTE = 1000
+
+
+def backfill_totales(apps, schema_editor):
+    """Completa bruto/descuento_total/items_count/unidades de las ventas existentes, de a LOTE ventas."""
+    Venta = apps.get_model('ventas', 'Venta')
+    DetalleVenta = apps.get_model('ventas', 'DetalleVenta')
+    ultimo_id = 0
+    while True:
+        ids = list(Venta.objects.filter(id__gt=ultimo_id).order_by('id').values_list('id', flat=True)[:LOTE])
+        if not ids:
+            break
+        ultimo_id = ids[-1]
+        totales = {
+            fila['id_venta']: fila
+            for fila in (DetalleVenta.objects
+                         .filter(id_venta__in=ids)
+                         .order_by()
+                         .values('id_venta')
+                         .annotate(
+                             bruto=Sum(F('precio_unitario') * F('cantidad'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+                             neto=Sum('subtotal'),
+                             items_count=Count('id'),
+                             unidades=Sum('cantidad'),
+                         ))
+        }
+        ventas = list(Venta.objects.filter(id__in=totales).only('id'))
+        for venta in ventas:
+            fila = totales[venta.id]
+            venta.bruto = fila['bruto'] or 0
+            venta.descuento_total = (fila['bruto'] or 0) - (fila['neto'] or 0)
+            venta.items_count = fila['items_count']
+            venta.unidades = fila['unidades'] or 0
+        Venta.objects.bulk_update(ventas, ['bruto', 'descuento_total', 'items_count', 'unidades'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0004_totales_venta'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_totales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0005_backfill_totales_venta'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='venta',
+            name='fecha_venta',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
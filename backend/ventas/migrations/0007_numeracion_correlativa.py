@@ -0,0 +1,65 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0003_indices_keyset'),
+        ('core', '0004_idempotency_key'),
+        ('movimientos_caja', '0002_indices_keyset'),
+        ('ventas', '0006_fecha_venta_cliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaVenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=20, unique=True, verbose_name='Punto de venta')),
+                ('prefijo', models.CharField(blank=True, default='', max_length=10)),
+                ('formato', models.CharField(default='{prefijo}{numero:08d}', max_length=40)),
+                ('siguiente', models.PositiveBigIntegerField(default=1)),
+                ('tamano_bloque', models.PositiveIntegerField(default=20)),
+            ],
+            options={
+                'verbose_name_plural': 'Secuencias de Venta',
+            },
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='correlativo',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='venta',
+            name='numero',
+            field=models.CharField(blank=True, max_length=30, null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name='ReservaNumeracion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desde', models.PositiveBigIntegerField()),
+                ('hasta', models.PositiveBigIntegerField()),
+                ('reservado_por', models.CharField(max_length=100)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('secuencia', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reservas', to='ventas.secuenciaventa')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='secuencia',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ventas', to='ventas.secuenciaventa'),
+        ),
+        migrations.AddConstraint(
+            model_name='venta',
+            constraint=models.UniqueConstraint(fields=('secuencia', 'correlativo'), name='venta_secuencia_correlativo_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='reservanumeracion',
+            index=models.Index(fields=['secuencia', 'desde'], name='reserva_num_secuencia_idx'),
+        ),
+    ]
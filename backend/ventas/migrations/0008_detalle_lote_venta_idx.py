@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_idempotency_key'),
+        ('lotes', '0006_lote_vendible_idx_disponible'),
+        ('ventas', '0007_numeracion_correlativa'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detalleventa',
+            index=models.Index(fields=['id_lote', 'id_venta'], name='detalle_lote_venta_idx'),
+        ),
+    ]
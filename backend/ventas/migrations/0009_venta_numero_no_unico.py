@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0008_detalle_lote_venta_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='venta',
+            name='numero',
+            field=models.CharField(blank=True, db_index=True, max_length=30, null=True),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from core.models import EmpleadoProfile, Producto
 from movimientos_caja.models import Caja 
 from clientes.models import Clientes
@@ -16,18 +17,35 @@ class Venta(models.Model):
     cliente = models.ForeignKey('clientes.Clientes', on_delete=models.PROTECT, null=True, blank=True)
     # Medio de pago (texto alineado con caja)
     medio_pago = models.CharField(max_length=20)
-    # Número correlativo simple (opcional)
-    numero = models.CharField(max_length=30, blank=True, null=True)
+    # Número de ticket formateado (ver ventas.numeracion); indexado para la búsqueda exacta.
+    # No es único: dos puntos de venta sin prefijo emiten el mismo texto. Lo único
+    # es (secuencia, correlativo).
+    numero = models.CharField(max_length=30, blank=True, null=True, db_index=True)
+    secuencia = models.ForeignKey('SecuenciaVenta', on_delete=models.PROTECT, null=True, blank=True, related_name='ventas')
+    correlativo = models.PositiveBigIntegerField(null=True, blank=True)
     # Notas opcionales
     notas = models.TextField(blank=True, null=True)
     # Idempotencia (para evitar duplicados por reintentos)
     idempotency_key = models.CharField(max_length=100, blank=True, null=True, unique=True)
 
-    fecha_venta = models.DateTimeField(auto_now_add=True)
+    # default en lugar de auto_now_add: las ventas offline (/bulk/) conservan la hora del POS
+    fecha_venta = models.DateTimeField(default=timezone.now, editable=False)
     monto_total = models.DecimalField(max_digits=12, decimal_places=2)
+    # Totales de las líneas, calculados una vez al registrar la venta
+    bruto = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    descuento_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    items_count = models.PositiveIntegerField(default=0)
+    unidades = models.PositiveIntegerField(default=0)
     
     class Meta:
         verbose_name_plural = "Ventas"
+        indexes = [
+            # Orden del listado y paginación keyset: (-fecha_venta, -id)
+            models.Index(fields=['fecha_venta', 'id'], name='venta_fecha_id_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['secuencia', 'correlativo'], name='venta_secuencia_correlativo_uniq'),
+        ]
         permissions = [
             ("can_view_sale_details", "Puede ver los detalles de cualquier venta"),
         ]
@@ -36,6 +54,48 @@ class Venta(models.Model):
         return f"Venta N°{self.pk} - Total: {self.monto_total}"
 
 
+# ==========================================================
+# NUMERACIÓN CORRELATIVA DE TICKETS
+# ==========================================================
+# Una secuencia por punto de venta. Cada proceso reserva bloques de
+# `tamano_bloque` números (ReservaNumeracion) y los reparte en memoria;
+# ver ventas.numeracion.
+
+class SecuenciaVenta(models.Model):
+    codigo = models.CharField(max_length=20, unique=True, verbose_name='Punto de venta')
+    prefijo = models.CharField(max_length=10, blank=True, default='')
+    # Campos disponibles: {prefijo} y {numero}
+    formato = models.CharField(max_length=40, default='{prefijo}{numero:08d}')
+    siguiente = models.PositiveBigIntegerField(default=1)
+    tamano_bloque = models.PositiveIntegerField(default=20)
+
+    class Meta:
+        verbose_name_plural = "Secuencias de Venta"
+
+    def formatear(self, numero):
+        return self.formato.format(prefijo=self.prefijo, numero=numero)
+
+    def __str__(self):
+        return f"Secuencia {self.codigo} (siguiente {self.siguiente})"
+
+
+class ReservaNumeracion(models.Model):
+    secuencia = models.ForeignKey(SecuenciaVenta, on_delete=models.PROTECT, related_name='reservas')
+    desde = models.PositiveBigIntegerField()
+    hasta = models.PositiveBigIntegerField()
+    # host:pid del proceso que reservó el bloque
+    reservado_por = models.CharField(max_length=100)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['secuencia', 'desde'], name='reserva_num_secuencia_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.secuencia.codigo}: {self.desde}-{self.hasta} ({self.reservado_por})"
+
+
 # ==========================================================
 # MODELO DETALLE_VENTA (Basado en tu DER)
 # ==========================================================
@@ -55,6 +115,53 @@ class DetalleVenta(models.Model):
     class Meta:
         verbose_name_plural = "Detalles de Venta"
         # primary_key conjunta si la necesitas (id_venta, id_producto)
+        indexes = [
+            # Trazabilidad lote -> ventas (ventas.trazabilidad): filtra por lote y recorre en orden de venta
+            models.Index(fields=['id_lote', 'id_venta'], name='detalle_lote_venta_idx'),
+        ]
 
     def __str__(self):
         return f"Detalle de Venta {self.id_venta.pk}"
+
+
+# ==========================================================
+# RESÚMENES (ROLLUPS) DE VENTAS
+# ==========================================================
+# Se mantienen dentro de la misma transacción que registra la venta
+# (ventas.rollups) y se reconstruyen con `manage.py rollup_ventas`.
+# Fecha y hora están en la zona horaria local (settings.TIME_ZONE).
+
+class ResumenVentaHora(models.Model):
+    fecha = models.DateField()
+    hora = models.PositiveSmallIntegerField()
+    medio_pago = models.CharField(max_length=20)
+    empleado = models.ForeignKey(EmpleadoProfile, on_delete=models.PROTECT, related_name='+')
+    tickets = models.PositiveIntegerField(default=0)
+    monto_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "Resúmenes de Venta por Hora"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'hora', 'medio_pago', 'empleado'], name='resumen_venta_hora_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.hora:02d}h {self.medio_pago} - {self.tickets} tickets"
+
+
+class ResumenProductoDia(models.Model):
+    fecha = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='+')
+    unidades = models.PositiveIntegerField(default=0)
+    bruto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    descuento = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "Resúmenes de Producto por Día"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='resumen_producto_dia_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} producto {self.producto_id} - {self.unidades} u."
@@ -0,0 +1,152 @@
+import heapq
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import SecuenciaVenta, ReservaNumeracion, Venta
+
+
+# ==========================================================
+# NUMERACIÓN CORRELATIVA DE TICKETS
+# ==========================================================
+# Un MAX(numero)+1 por venta serializaría todos los cobros sobre una fila.
+# En su lugar cada proceso reserva un bloque de números de la secuencia
+# (una transacción corta con SELECT ... FOR UPDATE, fuera de la transacción
+# de la venta) y los reparte en memoria sin tocar la base.
+#
+# - Un número sólo queda usado si la venta hace commit; si falla se devuelve
+#   al pool del proceso y lo toma la venta siguiente.
+# - Los números se entregan de menor a mayor dentro de cada proceso; entre
+#   procesos el orden temporal puede intercalarse por bloques.
+# - Si un proceso termina con números sin usar, quedan como huecos auditables
+#   en reporte_huecos() (manage.py huecos_numeracion).
+
+
+class Numero(NamedTuple):
+    secuencia_id: int
+    correlativo: int
+    texto: str
+
+
+def punto_venta_por_defecto():
+    return getattr(settings, 'VENTAS_PUNTO_VENTA', 'PRINCIPAL')
+
+
+class Numerador:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}
+
+    def _identidad(self):
+        return f'{socket.gethostname()}:{os.getpid()}'[:100]
+
+    def _secuencia(self, codigo):
+        if codigo == punto_venta_por_defecto():
+            secuencia, _ = SecuenciaVenta.objects.get_or_create(codigo=codigo)
+            return secuencia
+        secuencia = SecuenciaVenta.objects.filter(codigo=codigo).first()
+        if secuencia is None:
+            raise serializers.ValidationError({"detail": f"Punto de venta inexistente: {codigo}"})
+        return secuencia
+
+    def _reservar_bloque(self, codigo, minimo):
+        """Reserva en la base el próximo bloque de la secuencia (al menos `minimo` números)."""
+        with transaction.atomic():
+            secuencia = self._secuencia(codigo)
+            secuencia = SecuenciaVenta.objects.select_for_update().get(pk=secuencia.pk)
+            desde = secuencia.siguiente
+            hasta = desde + max(secuencia.tamano_bloque, minimo) - 1
+            secuencia.siguiente = hasta + 1
+            secuencia.save(update_fields=['siguiente'])
+            ReservaNumeracion.objects.create(secuencia=secuencia, desde=desde, hasta=hasta, reservado_por=self._identidad())
+        return secuencia, range(desde, hasta + 1)
+
+    def tomar(self, codigo=None, cantidad=1):
+        """
+        Devuelve `cantidad` números (Numero) de la secuencia del punto de venta.
+        Llamar fuera de transaction.atomic: si hay que reservar un bloque nuevo,
+        la fila de la secuencia queda bloqueada sólo durante esa reserva.
+        """
+        codigo = codigo or punto_venta_por_defecto()
+        with self._lock:
+            pool = self._pools.get(codigo)
+            faltan = cantidad - (len(pool['libres']) if pool else 0)
+            if faltan > 0:
+                secuencia, nuevos = self._reservar_bloque(codigo, faltan)
+                if pool is None:
+                    pool = self._pools[codigo] = {'libres': []}
+                # Formato y prefijo se releen con cada bloque
+                pool['secuencia'] = secuencia
+                for correlativo in nuevos:
+                    heapq.heappush(pool['libres'], correlativo)
+            secuencia = pool['secuencia']
+            return [
+                Numero(secuencia.pk, correlativo, secuencia.formatear(correlativo))
+                for correlativo in (heapq.heappop(pool['libres']) for _ in range(cantidad))
+            ]
+
+    def devolver(self, codigo, numeros):
+        """Vuelve al pool números tomados que no llegaron a usarse (venta rechazada o revertida)."""
+        codigo = codigo or punto_venta_por_defecto()
+        if not numeros:
+            return
+        with self._lock:
+            pool = self._pools.get(codigo)
+            if pool is None:
+                return
+            for numero in numeros:
+                if numero.secuencia_id == pool['secuencia'].pk:
+                    heapq.heappush(pool['libres'], numero.correlativo)
+
+    @contextmanager
+    def numero(self, codigo=None):
+        """Entrega un número y lo devuelve al pool si el bloque `with` termina en excepción."""
+        [numero] = self.tomar(codigo)
+        try:
+            yield numero
+        except BaseException:
+            self.devolver(codigo, [numero])
+            raise
+
+
+numerador = Numerador()
+
+
+def reporte_huecos(codigo=None):
+    """
+    Números reservados que no tienen venta, agrupados por bloque reservado.
+    Un bloque reciente puede seguir en uso por un proceso vivo: `reservado_por`
+    y `creado` permiten distinguirlo de los bloques abandonados.
+    """
+    secuencias = SecuenciaVenta.objects.all().order_by('codigo')
+    if codigo:
+        secuencias = secuencias.filter(codigo=codigo)
+    reporte = []
+    for secuencia in secuencias:
+        reservas = list(secuencia.reservas.order_by('desde'))
+        if not reservas:
+            continue
+        usados = set(
+            Venta.objects
+            .filter(secuencia=secuencia, correlativo__gte=reservas[0].desde, correlativo__lte=reservas[-1].hasta)
+            .values_list('correlativo', flat=True)
+        )
+        for reserva in reservas:
+            faltantes = [n for n in range(reserva.desde, reserva.hasta + 1) if n not in usados]
+            if faltantes:
+                reporte.append({
+                    'punto_venta': secuencia.codigo,
+                    'reserva_id': reserva.id,
+                    'desde': reserva.desde,
+                    'hasta': reserva.hasta,
+                    'reservado_por': reserva.reservado_por,
+                    'creado': reserva.creado.isoformat(),
+                    'sin_usar': [secuencia.formatear(n) for n in faltantes],
+                })
+    return reporte
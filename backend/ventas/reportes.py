@@ -0,0 +1,159 @@
+from decimal import Decimal
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, TruncDate
+
+from .models import DetalleVenta, ResumenVentaHora, ResumenProductoDia
+
+
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+
+def _num(valor):
+    return float(valor or 0)
+
+
+def _serie(fila):
+    return {'monto_total': _num(fila.get('monto_total')), 'tickets': fila.get('tickets') or 0}
+
+
+def _armar_resumen(agrupado, metricas, dia, hora, lineas, por_producto, top):
+    """
+    Arma la respuesta común a las dos fuentes (ventas crudas o resúmenes).
+
+    `agrupado` es el queryset base de tickets/montos, `dia` y `hora` las
+    expresiones de fecha local y hora, `lineas` el agregado de bruto/neto/unidades
+    y `por_producto` un queryset values('producto_id', 'producto_nombre')
+    anotado con unidades e ingresos.
+    """
+    totales = agrupado.aggregate(**metricas)
+    tickets = totales['tickets'] or 0
+    monto_total = totales['monto_total'] or Decimal('0')
+    bruto = lineas['bruto'] or Decimal('0')
+
+    por_dia = [
+        {'fecha': fila['dia'].isoformat(), **_serie(fila)}
+        for fila in agrupado.annotate(dia=dia).values('dia').annotate(**metricas).order_by('dia')
+    ]
+
+    # Alias distinto de 'hora': en ResumenVentaHora choca con el campo del modelo
+    horas = {fila['hora_local']: fila for fila in agrupado.annotate(hora_local=hora).values('hora_local').annotate(**metricas)}
+    por_hora = [{'hora': f'{h:02d}', **_serie(horas.get(h, {}))} for h in range(24)]
+
+    dias = {fila['dia']: fila for fila in agrupado.annotate(dia=ExtractIsoWeekDay(dia)).values('dia').annotate(**metricas)}
+    por_dia_semana = [
+        {'dia': d, 'nombre': DIAS_SEMANA[d - 1], **_serie(dias.get(d, {}))}
+        for d in range(1, 8)
+    ]
+
+    por_medio_pago = [
+        {'medio_pago': fila['medio_pago'], **_serie(fila)}
+        for fila in agrupado.values('medio_pago').annotate(**metricas).order_by('-monto_total')
+    ]
+
+    por_empleado = [
+        {
+            'empleado_id': fila['empleado_id'],
+            'empleado_nombre': f"{fila['empleado__nombre'] or ''} {fila['empleado__apellido'] or ''}".strip() or None,
+            **_serie(fila),
+        }
+        for fila in agrupado.values('empleado_id', 'empleado__nombre', 'empleado__apellido').annotate(**metricas).order_by('-monto_total')
+    ]
+
+    def _top(orden):
+        return [
+            {
+                'producto_id': fila['producto_id'],
+                'producto_nombre': fila['producto_nombre'],
+                'unidades': fila['unidades'] or 0,
+                'ingresos': _num(fila['ingresos']),
+            }
+            for fila in por_producto.order_by(orden, 'producto_id')[:top]
+        ]
+
+    return {
+        'totales': {
+            'monto_total': _num(monto_total),
+            'tickets': tickets,
+            'ticket_promedio': _num(monto_total / tickets) if tickets else 0.0,
+            'bruto': _num(bruto),
+            'descuento_total': _num(bruto - (lineas['neto'] or Decimal('0'))),
+            'unidades': lineas['unidades'] or 0,
+        },
+        'series': {
+            'por_dia': por_dia,
+            'por_hora': por_hora,
+            'por_dia_semana': por_dia_semana,
+        },
+        'por_medio_pago': por_medio_pago,
+        'por_empleado': por_empleado,
+        'top_productos': {
+            'por_unidades': _top('-unidades'),
+            'por_ingresos': _top('-ingresos'),
+        },
+    }
+
+
+def resumen_ventas(ventas, top=10):
+    """
+    Calcula en la base de datos los indicadores que antes armaba el front
+    (Dashboard / Reportes) recorriendo cada venta.
+
+    `ventas` es un queryset de Venta ya filtrado. Todas las consultas son
+    GROUP BY, por lo que el tamaño de la respuesta depende del rango de fechas
+    y de `top`, no de la cantidad de ventas.
+    """
+    ventas = ventas.order_by()
+    detalles = DetalleVenta.objects.filter(id_venta__in=ventas.values('id')).order_by()
+    # Totales de líneas persistidos en Venta: no hace falta recorrer los detalles
+    suma = ventas.aggregate(
+        suma_bruto=Sum('bruto'),
+        suma_descuento=Sum('descuento_total'),
+        suma_unidades=Sum('unidades'),
+    )
+    lineas = {
+        'bruto': suma['suma_bruto'],
+        'neto': (suma['suma_bruto'] or Decimal('0')) - (suma['suma_descuento'] or Decimal('0')),
+        'unidades': suma['suma_unidades'],
+    }
+    por_producto = (detalles
+                    .values(producto_id=F('id_producto'), producto_nombre=F('id_producto__nombre'))
+                    .annotate(unidades=Sum('cantidad'), ingresos=Sum('subtotal')))
+    return _armar_resumen(
+        ventas,
+        {'monto_total': Sum('monto_total'), 'tickets': Count('id')},
+        TruncDate('fecha_venta'),
+        ExtractHour('fecha_venta'),
+        lineas,
+        por_producto,
+        top,
+    )
+
+
+def resumen_desde_rollups(desde=None, hasta=None, top=10):
+    """
+    Mismo resultado que resumen_ventas() para un rango de fechas, leído de
+    ResumenVentaHora / ResumenProductoDia: el costo depende de los días del
+    rango y no de la cantidad de ventas.
+    """
+    horas = ResumenVentaHora.objects.order_by()
+    productos = ResumenProductoDia.objects.order_by()
+    if desde:
+        horas = horas.filter(fecha__gte=desde)
+        productos = productos.filter(fecha__gte=desde)
+    if hasta:
+        horas = horas.filter(fecha__lte=hasta)
+        productos = productos.filter(fecha__lte=hasta)
+    lineas = productos.aggregate(bruto=Sum('bruto'), neto=Sum('ingresos'), unidades=Sum('unidades'))
+    por_producto = (productos
+                    .values('producto_id', producto_nombre=F('producto__nombre'))
+                    .annotate(unidades=Sum('unidades'), ingresos=Sum('ingresos')))
+    return _armar_resumen(
+        horas,
+        {'monto_total': Sum('monto_total'), 'tickets': Sum('tickets')},
+        F('fecha'),
+        F('hora'),
+        lineas,
+        por_producto,
+        top,
+    )
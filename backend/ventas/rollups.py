@@ -0,0 +1,172 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal, ROUND_HALF_EVEN
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, PositiveIntegerField, Sum, When
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .models import Venta, DetalleVenta, ResumenVentaHora, ResumenProductoDia
+
+
+CENTAVO = Decimal('0.01')
+IMPORTE = DecimalField(max_digits=14, decimal_places=2)
+
+
+def importe(valor):
+    # Mismo redondeo que aplica Django al guardar un DecimalField
+    return Decimal(valor).quantize(CENTAVO, rounding=ROUND_HALF_EVEN)
+
+
+def _sumar(campo, incrementos, clave, output_field):
+    """CASE clave WHEN k THEN campo + delta ... para incrementar varias filas en un UPDATE."""
+    return Case(
+        *[When(**{clave: k}, then=F(campo) + delta) for k, delta in incrementos.items()],
+        default=F(campo),
+        output_field=output_field,
+    )
+
+
+# ==========================================================
+# MANTENIMIENTO INCREMENTAL (dentro de la transacción de la venta)
+# ==========================================================
+
+def acumular_ventas(ventas):
+    """
+    Suma a los resúmenes las ventas recién registradas.
+
+    `ventas` es un iterable de (venta, detalles). Crea las filas que falten con
+    INSERT ... IGNORE y luego incrementa con UPDATE ... SET x = x + delta, así dos
+    cajas concurrentes nunca pisan el total de la otra.
+    """
+    horas = defaultdict(lambda: [0, Decimal('0')])
+    productos = defaultdict(lambda: defaultdict(lambda: [0, Decimal('0'), Decimal('0')]))
+    for venta, detalles in ventas:
+        local = timezone.localtime(venta.fecha_venta)
+        clave = (local.date(), local.hour, venta.medio_pago, venta.empleado_id)
+        horas[clave][0] += 1
+        horas[clave][1] += importe(venta.monto_total)
+        for det in detalles:
+            acc = productos[local.date()][det.id_producto_id]
+            acc[0] += det.cantidad
+            acc[1] += det.precio_unitario * det.cantidad
+            acc[2] += importe(det.subtotal)
+
+    if horas:
+        ResumenVentaHora.objects.bulk_create([
+            ResumenVentaHora(fecha=fecha, hora=hora, medio_pago=medio_pago, empleado_id=empleado_id)
+            for fecha, hora, medio_pago, empleado_id in horas
+        ], ignore_conflicts=True)
+        for (fecha, hora, medio_pago, empleado_id), (tickets, monto) in sorted(horas.items()):
+            ResumenVentaHora.objects.filter(
+                fecha=fecha, hora=hora, medio_pago=medio_pago, empleado_id=empleado_id,
+            ).update(tickets=F('tickets') + tickets, monto_total=F('monto_total') + monto)
+
+    for fecha, filas in sorted(productos.items()):
+        ResumenProductoDia.objects.bulk_create([
+            ResumenProductoDia(fecha=fecha, producto_id=producto_id) for producto_id in filas
+        ], ignore_conflicts=True)
+        ResumenProductoDia.objects.filter(fecha=fecha, producto_id__in=sorted(filas)).update(
+            unidades=_sumar('unidades', {k: v[0] for k, v in filas.items()}, 'producto_id', PositiveIntegerField()),
+            bruto=_sumar('bruto', {k: v[1] for k, v in filas.items()}, 'producto_id', IMPORTE),
+            descuento=_sumar('descuento', {k: v[1] - v[2] for k, v in filas.items()}, 'producto_id', IMPORTE),
+            ingresos=_sumar('ingresos', {k: v[2] for k, v in filas.items()}, 'producto_id', IMPORTE),
+        )
+
+
+# ==========================================================
+# RECONSTRUCCIÓN Y VERIFICACIÓN (manage.py rollup_ventas)
+# ==========================================================
+
+def _rango(desde, hasta):
+    inicio = timezone.make_aware(datetime.combine(desde, time.min))
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+    return inicio, fin
+
+
+def calcular_desde_ventas(desde, hasta):
+    """Agrega las filas crudas de Venta/DetalleVenta entre `desde` y `hasta` (inclusive)."""
+    inicio, fin = _rango(desde, hasta)
+    horas = (Venta.objects
+             .filter(fecha_venta__gte=inicio, fecha_venta__lt=fin)
+             .order_by()
+             .annotate(fecha=TruncDate('fecha_venta'), hora=ExtractHour('fecha_venta'))
+             .values('fecha', 'hora', 'medio_pago', 'empleado_id')
+             .annotate(tickets=Count('id'), monto_total=Sum('monto_total')))
+    productos = (DetalleVenta.objects
+                 .filter(id_venta__fecha_venta__gte=inicio, id_venta__fecha_venta__lt=fin)
+                 .order_by()
+                 .annotate(fecha=TruncDate('id_venta__fecha_venta'))
+                 .values('fecha', 'id_producto')
+                 .annotate(
+                     unidades=Sum('cantidad'),
+                     bruto=Sum(F('precio_unitario') * F('cantidad'), output_field=IMPORTE),
+                     ingresos=Sum('subtotal'),
+                 ))
+    esperado_horas = {
+        (f['fecha'], f['hora'], f['medio_pago'], f['empleado_id']): (f['tickets'], importe(f['monto_total'] or 0))
+        for f in horas
+    }
+    esperado_productos = {
+        (f['fecha'], f['id_producto']): (
+            f['unidades'] or 0,
+            importe(f['bruto'] or 0),
+            importe((f['bruto'] or 0) - (f['ingresos'] or 0)),
+            importe(f['ingresos'] or 0),
+        )
+        for f in productos
+    }
+    return esperado_horas, esperado_productos
+
+
+def reconstruir(desde, hasta):
+    """Reemplaza los resúmenes del rango por los calculados desde las ventas."""
+    with transaction.atomic():
+        horas, productos = calcular_desde_ventas(desde, hasta)
+        ResumenVentaHora.objects.filter(fecha__gte=desde, fecha__lte=hasta).delete()
+        ResumenProductoDia.objects.filter(fecha__gte=desde, fecha__lte=hasta).delete()
+        ResumenVentaHora.objects.bulk_create([
+            ResumenVentaHora(fecha=fecha, hora=hora, medio_pago=medio_pago, empleado_id=empleado_id,
+                             tickets=tickets, monto_total=monto)
+            for (fecha, hora, medio_pago, empleado_id), (tickets, monto) in horas.items()
+        ], batch_size=1000)
+        ResumenProductoDia.objects.bulk_create([
+            ResumenProductoDia(fecha=fecha, producto_id=producto_id, unidades=unidades,
+                               bruto=bruto, descuento=descuento, ingresos=ingresos)
+            for (fecha, producto_id), (unidades, bruto, descuento, ingresos) in productos.items()
+        ], batch_size=1000)
+    return len(horas), len(productos)
+
+
+def verificar(desde, hasta):
+    """Compara los resúmenes con las ventas del rango y devuelve la lista de diferencias."""
+    esperado_horas, esperado_productos = calcular_desde_ventas(desde, hasta)
+    actual_horas = {
+        (f['fecha'], f['hora'], f['medio_pago'], f['empleado_id']): (f['tickets'], f['monto_total'])
+        for f in ResumenVentaHora.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+        .values('fecha', 'hora', 'medio_pago', 'empleado_id', 'tickets', 'monto_total')
+    }
+    actual_productos = {
+        (f['fecha'], f['producto_id']): (f['unidades'], f['bruto'], f['descuento'], f['ingresos'])
+        for f in ResumenProductoDia.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+        .values('fecha', 'producto_id', 'unidades', 'bruto', 'descuento', 'ingresos')
+    }
+    vacio_horas = (0, Decimal('0.00'))
+    vacio_productos = (0, Decimal('0.00'), Decimal('0.00'), Decimal('0.00'))
+    diferencias = []
+    for tabla, esperado, actual, vacio in (
+        ('venta_hora', esperado_horas, actual_horas, vacio_horas),
+        ('producto_dia', esperado_productos, actual_productos, vacio_productos),
+    ):
+        for clave in sorted(esperado.keys() | actual.keys(), key=str):
+            e = esperado.get(clave, vacio)
+            a = actual.get(clave, vacio)
+            if tuple(Decimal(x) for x in e) != tuple(Decimal(x) for x in a):
+                diferencias.append({
+                    'tabla': tabla,
+                    'clave': [str(x) for x in clave],
+                    'esperado': [str(x) for x in e],
+                    'actual': [str(x) for x in a],
+                })
+    return diferencias
@@ -1,8 +1,11 @@
 
+from django.conf import settings
 from rest_framework import serializers
+from datetime import timedelta
 from decimal import Decimal
-from .models import Venta, DetalleVenta
+from .models import Venta, DetalleVenta, SecuenciaVenta
 from clientes.models import Clientes
+from lotes.asignacion import ESTRATEGIAS
 
 
 class LoteAsignadoSerializer(serializers.Serializer):
@@ -40,6 +43,7 @@ class VentaSerializer(serializers.ModelSerializer):
             'id', 'numero', 'fecha', 'hora', 'cliente', 'medio_pago', 'notas',
             'empleado_id', 'empleado_nombre',
             'monto_total', 'bruto', 'descuento_total', 'recargo_total', 'impuestos_total',
+            'items_count', 'unidades',
             'detalles', 'movimiento_caja'
         ]
 
@@ -75,24 +79,12 @@ class VentaSerializer(serializers.ModelSerializer):
         full = f"{nombre} {apellido}".strip()
         return full or str(obj.empleado)
 
-    def _acum_financiero(self, obj):
-        bruto_sum = Decimal('0.00')
-        desc_sum = Decimal('0.00')
-        for det in obj.detalles.all():
-            lb = det.precio_unitario * det.cantidad
-            bruto_sum += lb
-            desc_sum += (lb - det.subtotal)
-        return bruto_sum, desc_sum
-
     def get_bruto(self, obj):
-        from decimal import Decimal
-        bruto_sum, _ = self._acum_financiero(obj)
-        return None if bruto_sum == Decimal('0.00') else bruto_sum
+        # Columnas calculadas al registrar la venta (ver CheckoutVenta.registrar)
+        return None if obj.bruto == Decimal('0.00') else obj.bruto
 
     def get_descuento_total(self, obj):
-        from decimal import Decimal
-        _, desc_sum = self._acum_financiero(obj)
-        return None if desc_sum == Decimal('0.00') else desc_sum
+        return None if obj.descuento_total == Decimal('0.00') else obj.descuento_total
 
     def get_recargo_total(self, obj):
         # No se gestiona en el modelo; devolver None para que el front lo trate como opcional
@@ -121,7 +113,13 @@ class VentaListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Venta
-        fields = ['id', 'fecha', 'hora', 'total', 'medio_pago', 'numero', 'cliente_nombre', 'empleado_id', 'empleado_nombre', 'items', 'bruto', 'descuento_total', 'recargo_total', 'impuestos_total']
+        fields = ['id', 'fecha', 'hora', 'total', 'medio_pago', 'numero', 'cliente_nombre', 'empleado_id', 'empleado_nombre', 'items', 'items_count', 'unidades', 'bruto', 'descuento_total', 'recargo_total', 'impuestos_total']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Con ?incluir_items=false la vista no precarga detalles: se omite 'items'
+        if not self.context.get('incluir_items', True):
+            self.fields.pop('items')
 
     def get_cliente_nombre(self, obj):
         if obj.cliente:
@@ -162,24 +160,11 @@ class VentaListSerializer(serializers.ModelSerializer):
         dt = timezone.localtime(obj.fecha_venta)
         return dt.strftime("%H:%M")
 
-    def _acum_financiero(self, obj):
-        bruto_sum = Decimal('0.00')
-        desc_sum = Decimal('0.00')
-        for det in obj.detalles.all():
-            lb = det.precio_unitario * det.cantidad
-            bruto_sum += lb
-            desc_sum += (lb - det.subtotal)
-        return bruto_sum, desc_sum
-
     def get_bruto(self, obj):
-        from decimal import Decimal
-        bruto_sum, _ = self._acum_financiero(obj)
-        return None if bruto_sum == Decimal('0.00') else float(bruto_sum)
+        return None if obj.bruto == Decimal('0.00') else float(obj.bruto)
 
     def get_descuento_total(self, obj):
-        from decimal import Decimal
-        _, desc_sum = self._acum_financiero(obj)
-        return None if desc_sum == Decimal('0.00') else float(desc_sum)
+        return None if obj.descuento_total == Decimal('0.00') else float(obj.descuento_total)
 
     def get_recargo_total(self, obj):
         return None
@@ -191,11 +176,15 @@ class VentaListSerializer(serializers.ModelSerializer):
 class VentaItemInputSerializer(serializers.Serializer):
     # Soporta snake y camelCase
     producto_id = serializers.IntegerField(required=True)
-    lotes_asignados = LoteAsignadoSerializer(many=True, required=True)
+    lotes_asignados = LoteAsignadoSerializer(many=True, required=False)
+    # Asignación automática: si no vienen lotes_asignados el servidor elige los lotes
+    cantidad = serializers.IntegerField(min_value=1, required=False)
+    precio_unitario = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    descuento_por_item = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, default=0)
 
     def validate(self, attrs):
-        if not attrs.get('lotes_asignados'):
-            raise serializers.ValidationError({'lotes_asignados': 'Debe ser una lista de lotes asignados y no puede estar vacía'})
+        if not attrs.get('lotes_asignados') and not attrs.get('cantidad'):
+            raise serializers.ValidationError({'lotes_asignados': 'Debe indicar lotes_asignados o la cantidad para asignación automática'})
         return attrs
 
 
@@ -209,6 +198,14 @@ class VentaCreateSerializer(serializers.Serializer):
     notas = serializers.CharField(required=False, allow_blank=True, allow_null=True)
     idempotency_key = serializers.CharField(required=False, allow_blank=True, allow_null=True)
     idempotencyKey = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    # Estrategia de asignación de lotes para items sin lotes_asignados (FEFO | FIFO | COSTO)
+    estrategia = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    # Carrito con reservas de stock (POST /api/reservas/): la venta las consume
+    carrito = serializers.CharField(required=False, allow_blank=True, allow_null=True, max_length=64)
+    # Secuencia de numeración de tickets; por defecto settings.VENTAS_PUNTO_VENTA
+    punto_venta = serializers.CharField(required=False, allow_blank=True, allow_null=True, max_length=20)
+    # Precios y descuentos calculados por las reglas de promociones; por defecto settings.VENTAS_PRECIO_SERVIDOR
+    precio_servidor = serializers.BooleanField(required=False)
 
     def validate_medio_pago(self, value):
         v = (value or '').strip().upper()
@@ -217,6 +214,22 @@ class VentaCreateSerializer(serializers.Serializer):
             raise serializers.ValidationError('medio_pago inválido')
         return v
 
+    def validate_estrategia(self, value):
+        if not value:
+            return None
+        # Sólo estrategias registradas: las rutas importables quedan para settings
+        if value.upper() not in ESTRATEGIAS:
+            raise serializers.ValidationError('estrategia inválida')
+        return value.upper()
+
+    def validate_punto_venta(self, value):
+        from .numeracion import punto_venta_por_defecto
+        if not value or value == punto_venta_por_defecto():
+            return None
+        if not SecuenciaVenta.objects.filter(codigo=value).exists():
+            raise serializers.ValidationError('Punto de venta inexistente')
+        return value
+
     def validate_items(self, items):
         if not items:
             raise serializers.ValidationError('items no puede estar vacío')
@@ -236,4 +249,38 @@ class VentaCreateSerializer(serializers.Serializer):
             attrs['medio_pago'] = self.validate_medio_pago(attrs['medio_pago'])
         else:
             raise serializers.ValidationError({'medio_pago': 'Este campo es requerido'})
+        if attrs.get('precio_servidor') is None:
+            attrs['precio_servidor'] = settings.VENTAS_PRECIO_SERVIDOR
+        return attrs
+
+
+class VentaOfflineSerializer(VentaCreateSerializer):
+    # Hora original de la venta en el POS; obligatoria junto con la clave de idempotencia
+    fecha = serializers.DateTimeField()
+
+    def validate_fecha(self, value):
+        from django.utils import timezone
+        if value > timezone.now() + timedelta(minutes=5):
+            raise serializers.ValidationError('La fecha de la venta no puede ser futura')
+        return value
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if not attrs.get('idempotency_key'):
+            raise serializers.ValidationError({'idempotency_key': 'Requerido en ventas offline'})
         return attrs
+
+
+class VentaBulkSerializer(serializers.Serializer):
+    # Cada venta se valida por separado (VentaOfflineSerializer) para rechazarla sin cortar la carga
+    ventas = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=500)
+
+
+class CotizacionItemSerializer(serializers.Serializer):
+    producto_id = serializers.IntegerField()
+    cantidad = serializers.IntegerField(min_value=1)
+
+
+class CotizacionSerializer(serializers.Serializer):
+    cliente_id = serializers.IntegerField(required=False, allow_null=True)
+    items = CotizacionItemSerializer(many=True, allow_empty=False, max_length=500)
@@ -0,0 +1,502 @@
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Value, When
+from django.utils import timezone
+from rest_framework import serializers
+
+from clientes.models import Clientes
+from core.models import Producto
+from lotes import kardex
+from lotes.asignacion import asignar, es_vendible, filtro_vendibles, obtener_estrategia
+from lotes.models import Lote, diferir_recalculo_stock, recalcular_stock_productos
+from lotes.reservas import liberar as liberar_reservas, reservado_por_lote, vigentes as reservas_vigentes
+from movimientos_caja.models import MovimientoDeCaja
+from promociones.motor import cotizar
+from tipo_movimientos.models import TipoMovimiento
+from tipo_pago.models import TipoPago
+from .models import Venta, DetalleVenta
+from .numeracion import numerador
+from .rollups import acumular_ventas, importe
+
+
+class CheckoutVenta:
+    """
+    Registra una venta con un número fijo de consultas, sin importar cuántas
+    líneas tenga el ticket.
+
+    Debe ejecutarse dentro de una transacción: los lotes se bloquean en una sola
+    consulta y en orden de id (así dos tickets concurrentes nunca se cruzan en
+    un deadlock) y quedan bloqueados hasta el commit. Los items cubiertos por las
+    reservas del carrito no bloquean sus lotes (ver consumir_reservas).
+    """
+
+    def __init__(self, user, caja, empleado):
+        self.user = user
+        self.caja = caja
+        self.empleado = empleado
+        self._tipo_ingreso = None
+        self._tipos_pago = {}
+        # Sólo en cargas masivas (precargar): productos leídos y lotes ya bloqueados del bloque
+        self._productos = None
+        self._lotes = None
+
+    # ------------------------------------------------------------------
+    # Catálogos de caja (se resuelven una vez por instancia)
+    # ------------------------------------------------------------------
+    def tipo_ingreso(self):
+        if self._tipo_ingreso is None:
+            tm = TipoMovimiento.objects.filter(nombre_tipo_movimiento__iexact='INGRESO').first()
+            if not tm:
+                tm = TipoMovimiento.objects.create(nombre_tipo_movimiento='INGRESO')
+            self._tipo_ingreso = tm
+        return self._tipo_ingreso
+
+    def tipo_pago(self, medio_pago):
+        if medio_pago not in self._tipos_pago:
+            tp = TipoPago.objects.filter(nombre_tipo_pago__iexact=medio_pago).first()
+            if not tp:
+                tp = TipoPago.objects.create(nombre_tipo_pago=medio_pago)
+            self._tipos_pago[medio_pago] = tp
+        return self._tipos_pago[medio_pago]
+
+    # ------------------------------------------------------------------
+    # Lecturas agrupadas
+    # ------------------------------------------------------------------
+    def cargar_productos(self, items):
+        producto_ids = {it['producto_id'] for it in items}
+        if self._productos is not None:
+            productos = self._productos
+        else:
+            productos = Producto.objects.in_bulk(producto_ids)
+        faltantes = sorted(producto_ids - productos.keys())
+        if faltantes:
+            raise serializers.ValidationError({"detail": f"Producto inexistente: {faltantes[0]}"})
+        return productos
+
+    def _consultar_lotes(self, items):
+        lote_ids = {l['lote_id'] for it in items for l in it.get('lotes_asignados') or []}
+        auto_ids = {it['producto_id'] for it in items if not it.get('lotes_asignados')}
+        condicion = Q(id__in=lote_ids)
+        if auto_ids:
+            condicion |= Q(producto_id__in=auto_ids) & filtro_vendibles()
+        return {
+            lote.id: lote
+            for lote in Lote.objects.select_for_update().filter(condicion).order_by('id')
+        }
+
+    def bloquear_lotes(self, items):
+        """
+        Bloquea en una sola consulta los lotes indicados explícitamente y, para los
+        items sin lotes_asignados, todos los lotes vendibles de su producto.
+        Si el bloque ya fue precargado, sólo verifica que estén los lotes pedidos.
+        """
+        lotes = self._lotes if self._lotes is not None else self._consultar_lotes(items)
+        lote_ids = {l['lote_id'] for it in items for l in it.get('lotes_asignados') or []}
+        faltantes = sorted(lote_ids - lotes.keys())
+        if faltantes:
+            raise serializers.ValidationError({"detail": f"Lote inexistente: {faltantes[0]}"})
+        return lotes
+
+    def precargar(self, items):
+        """
+        Para cargas masivas: lee los productos y bloquea los lotes de todas las
+        ventas de un bloque en dos consultas. Las ventas siguientes de la misma
+        transacción trabajan sobre esos objetos en memoria.
+        """
+        self._productos = Producto.objects.in_bulk({it['producto_id'] for it in items})
+        self._lotes = self._consultar_lotes(items)
+
+    def liberar_precarga(self):
+        self._productos = None
+        self._lotes = None
+
+    def consumir_reservas(self, items, productos, carrito):
+        """
+        Asigna desde las reservas vigentes del carrito los items que ellas cubren
+        por completo. Esos lotes no se bloquean ni se revalidan: la reserva ya los
+        descontó del disponible de los demás carritos, y el UPDATE con guarda de
+        descontar_stock sigue rechazando la venta si el lote cambió.
+        Las reservas del carrito sí se bloquean, así el mismo carrito no se cobra dos veces.
+
+        Devuelve ({indice: lineas}, {lote_id: lote}, [índices sin reserva suficiente]).
+        Los items pendientes (reserva vencida, faltante o parcial) siguen el camino
+        con bloqueo de bloquear_lotes/asignar_lotes.
+        """
+        if not carrito:
+            return {}, {}, list(range(len(items)))
+        reservas = list(
+            reservas_vigentes().select_for_update()
+            .filter(carrito=carrito, user=self.user)
+            .order_by('id')
+        )
+        if not reservas:
+            return {}, {}, list(range(len(items)))
+        lotes = Lote.objects.in_bulk({reserva.lote_id for reserva in reservas})
+        if self._lotes is not None:
+            # Carga masiva: se usan los objetos precargados para que la memoria del bloque siga al día
+            lotes.update({lote_id: self._lotes[lote_id] for lote_id in lotes if lote_id in self._lotes})
+        restante = {reserva.id: reserva.cantidad for reserva in reservas if reserva.lote_id in lotes}
+        por_producto = defaultdict(list)
+        for reserva in reservas:
+            if reserva.id in restante:
+                por_producto[reserva.producto_id].append(reserva)
+
+        def tomar(propias, cantidad, pendiente_de):
+            tomado = []
+            for reserva in propias:
+                if cantidad <= 0:
+                    break
+                unidades = min(pendiente_de[reserva.id], cantidad)
+                if unidades > 0:
+                    pendiente_de[reserva.id] -= unidades
+                    cantidad -= unidades
+                    tomado.append((reserva.lote_id, unidades))
+            return tomado if cantidad <= 0 else None
+
+        resultado, pendientes = {}, []
+        for idx, it in enumerate(items):
+            producto = productos[it['producto_id']]
+            propias = por_producto.get(producto.id, [])
+            tentativo = dict(restante)
+            lineas = []
+            if it.get('lotes_asignados'):
+                for lote_info in it['lotes_asignados']:
+                    del_lote = [reserva for reserva in propias if reserva.lote_id == lote_info['lote_id']]
+                    tomado = tomar(del_lote, int(lote_info['cantidad']), tentativo)
+                    if tomado is None:
+                        lineas = None
+                        break
+                    lineas.extend(
+                        (lotes[lote_id], unidades, lote_info['precio_unitario'], lote_info.get('descuento_por_item'))
+                        for lote_id, unidades in tomado
+                    )
+            else:
+                tomado = tomar(propias, it['cantidad'], tentativo)
+                precio = it.get('precio_unitario')
+                if precio is None:
+                    precio = producto.precio
+                lineas = None if tomado is None else [
+                    (lotes[lote_id], unidades, precio, it.get('descuento_por_item')) for lote_id, unidades in tomado
+                ]
+            if lineas is None:
+                pendientes.append(idx)
+            else:
+                restante = tentativo
+                resultado[idx] = lineas
+        return resultado, lotes, pendientes
+
+    def asignar_lotes(self, items, productos, lotes, estrategia=None, reservado=None):
+        """
+        Devuelve, por cada item y en el mismo orden, la lista de
+        (lote, cantidad, precio_unitario, descuento_por_item) a vender.
+
+        Primero se reservan las asignaciones explícitas del cliente y luego se
+        reparten los items automáticos sobre el stock que queda, según la estrategia.
+        `reservado` ({lote_id: unidades}) son las reservas vigentes de otros carritos.
+        """
+        reservado = reservado or {}
+        disponible = {lote.id: lote.cantidad_disponible - reservado.get(lote.id, 0) for lote in lotes.values()}
+        resultado = [None] * len(items)
+        automaticos = []
+        for idx, it in enumerate(items):
+            producto = productos[it['producto_id']]
+            lotes_asignados = it.get('lotes_asignados') or []
+            if not lotes_asignados:
+                automaticos.append(idx)
+                continue
+            lineas = []
+            for lote_info in lotes_asignados:
+                lote = lotes[lote_info['lote_id']]
+                if lote.producto_id != producto.id:
+                    raise serializers.ValidationError({"detail": f"El lote {lote.id} no corresponde al producto {producto.id}"})
+                cantidad = int(lote_info['cantidad'])
+                disponible[lote.id] -= cantidad
+                if disponible[lote.id] < 0:
+                    raise serializers.ValidationError({"detail": f"Stock insuficiente en lote {lote.id} para producto {producto.id}"})
+                lineas.append((lote, cantidad, lote_info['precio_unitario'], lote_info.get('descuento_por_item')))
+            resultado[idx] = lineas
+
+        if automaticos:
+            clave = obtener_estrategia(estrategia)
+            hoy = timezone.localdate()
+            por_producto = defaultdict(list)
+            for lote in lotes.values():
+                por_producto[lote.producto_id].append(lote)
+            for idx in automaticos:
+                it = items[idx]
+                producto = productos[it['producto_id']]
+                candidatos = [l for l in por_producto[producto.id] if es_vendible(l, hoy)]
+                asignaciones, faltante = asignar(candidatos, it['cantidad'], clave, disponible)
+                if faltante > 0:
+                    raise serializers.ValidationError({"detail": f"Stock insuficiente para producto {producto.id}: faltan {faltante} unidades"})
+                precio = it.get('precio_unitario')
+                if precio is None:
+                    precio = producto.precio
+                resultado[idx] = [
+                    (lote, cantidad, precio, it.get('descuento_por_item'))
+                    for lote, cantidad in asignaciones
+                ]
+        return resultado
+
+    def aplicar_precios(self, items, productos, cliente=None):
+        """
+        Reemplaza precio y descuento de cada item (y de sus lotes_asignados) por
+        los del motor de promociones. El descuento de la regla se expresa como el
+        porcentaje equivalente sobre el precio de lista, así se reparte entre lotes
+        igual que un descuento cargado en el POS. Devuelve items nuevos.
+        """
+        cantidades = [
+            {'producto_id': it['producto_id'], 'cantidad': it.get('cantidad') or sum(int(l['cantidad']) for l in it['lotes_asignados'])}
+            for it in items
+        ]
+        precios = []
+        for it, linea in zip(items, cotizar(cantidades, productos, cliente)):
+            nuevo = {**it, 'precio_unitario': linea.precio_unitario, 'descuento_por_item': linea.descuento_por_item}
+            if it.get('lotes_asignados'):
+                nuevo['lotes_asignados'] = [
+                    {**l, 'precio_unitario': linea.precio_unitario, 'descuento_por_item': linea.descuento_por_item}
+                    for l in it['lotes_asignados']
+                ]
+            precios.append(nuevo)
+        return precios
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def registrar(self, payload, cliente=None, fecha_venta=None, numero=None):
+        """Crea la venta, sus detalles, descuenta stock y registra el ingreso en caja.
+
+        Los items pueden traer lotes_asignados o sólo cantidad; en ese caso los
+        lotes se eligen aquí, dentro de la transacción que los tiene bloqueados.
+        `fecha_venta` permite conservar la hora original de una venta offline y
+        `numero` es el Numero de ticket tomado de ventas.numeracion (opcional).
+        Con payload['precio_servidor'] los precios enviados se ignoran y se cotizan
+        con las reglas de promociones.
+        Devuelve (venta, movimiento_caja).
+        """
+        items = payload['items']
+        carrito = payload.get('carrito')
+        productos = self.cargar_productos(items)
+        if payload.get('precio_servidor'):
+            items = self.aplicar_precios(items, productos, cliente)
+        asignaciones, lotes, pendientes = self.consumir_reservas(items, productos, carrito)
+        if pendientes:
+            otros = [items[idx] for idx in pendientes]
+            bloqueados = self.bloquear_lotes(otros)
+            # Lo retenido por otros carritos no se puede vender, ni lo que este ticket ya tomó de sus reservas
+            reservado = reservado_por_lote(bloqueados.keys(), excluir_carrito=carrito, user=self.user)
+            for lineas in asignaciones.values():
+                for lote, cantidad, _, _ in lineas:
+                    reservado[lote.id] = reservado.get(lote.id, 0) + cantidad
+            for idx, lineas in zip(pendientes, self.asignar_lotes(otros, productos, bloqueados, payload.get('estrategia'), reservado)):
+                asignaciones[idx] = lineas
+            lotes.update(bloqueados)
+        asignaciones = [asignaciones[idx] for idx in range(len(items))]
+
+        lineas = []
+        demanda = defaultdict(int)
+        total = Decimal('0.00')
+        bruto = Decimal('0.00')
+        neto = Decimal('0.00')
+        for it, asignadas in zip(items, asignaciones):
+            producto = productos[it['producto_id']]
+            for lote, cantidad, precio, descuento in asignadas:
+                precio_unitario = Decimal(str(precio))
+                desc = Decimal(str(descuento or '0'))
+                demanda[lote.id] += cantidad
+                subtotal = precio_unitario * Decimal(cantidad) * (Decimal('1.0') - desc / Decimal('100'))
+                lineas.append(DetalleVenta(
+                    id_producto=producto,
+                    id_lote=lote,
+                    cantidad=cantidad,
+                    precio_unitario=precio_unitario,
+                    descuento_por_item=desc if desc > 0 else None,
+                    subtotal=subtotal,
+                ))
+                total += subtotal
+                bruto += precio_unitario * cantidad
+                neto += importe(subtotal)
+
+        venta = Venta.objects.create(
+            fecha_venta=fecha_venta or timezone.now(),
+            numero=numero.texto if numero else None,
+            secuencia_id=numero.secuencia_id if numero else None,
+            correlativo=numero.correlativo if numero else None,
+            caja=self.caja,
+            empleado=self.empleado,
+            cliente=cliente,
+            medio_pago=payload['medio_pago'],
+            notas=payload.get('notas') or None,
+            idempotency_key=payload.get('idempotency_key') or None,
+            monto_total=total,
+            bruto=bruto,
+            descuento_total=bruto - neto,
+            items_count=len(lineas),
+            unidades=sum(linea.cantidad for linea in lineas),
+        )
+        for linea in lineas:
+            linea.id_venta = venta
+        DetalleVenta.objects.bulk_create(lineas)
+
+        self.descontar_stock(lotes, demanda)
+        recalcular_stock_productos({lotes[lote_id].producto_id for lote_id in demanda})
+        kardex.registrar(
+            kardex.movimiento(lotes[lote_id], 'VENTA', -cantidad, 'venta', venta.id, self.user)
+            for lote_id, cantidad in demanda.items()
+        )
+
+        mov = MovimientoDeCaja.objects.create(
+            caja=self.caja,
+            monto=total,
+            descripcion=f'Venta #{venta.id}',
+            empleado=self.empleado,
+            id_tipo_movimiento=self.tipo_ingreso(),
+            id_tipo_pago=self.tipo_pago(payload['medio_pago']),
+            tipo='INGRESO',
+            origen='VENTA',
+            ref_type='venta',
+            ref_id=venta.id,
+            created_by=self.user,
+        )
+        if carrito:
+            liberar_reservas(self.user, carrito)
+        # Al final: las filas de resumen son compartidas entre cajas, se bloquean lo menos posible
+        acumular_ventas([(venta, lineas)])
+        return venta, mov
+
+    def registrar_lote(self, ventas, tamano_bloque=50):
+        """
+        Registra ventas offline (POS sin conexión) en bloques de `tamano_bloque`.
+
+        `ventas` es una lista de (indice, payload) ya validados, cada uno con
+        idempotency_key y fecha. Cada bloque es una transacción que precarga
+        productos, clientes y lotes una sola vez; cada venta va en su propio
+        savepoint, así una venta rechazada no arrastra a las demás.
+        Devuelve {indice: resultado}.
+        """
+        resultados = {}
+        conocidas = {}
+        for inicio in range(0, len(ventas), tamano_bloque):
+            bloque = ventas[inicio:inicio + tamano_bloque]
+            conocidas.update(Venta.objects.filter(
+                idempotency_key__in=[payload['idempotency_key'] for _, payload in bloque],
+            ).values_list('idempotency_key', 'id'))
+            pendientes = []
+            for indice, payload in bloque:
+                venta_id = conocidas.get(payload['idempotency_key'])
+                if venta_id:
+                    resultados[indice] = {'estado': 'duplicada', 'venta_id': venta_id}
+                else:
+                    pendientes.append((indice, payload))
+            if not pendientes:
+                continue
+
+            # Números de ticket del bloque, tomados antes de abrir la transacción
+            numeros = defaultdict(list)
+            for codigo, cantidad in Counter(payload.get('punto_venta') for _, payload in pendientes).items():
+                numeros[codigo] = numerador.tomar(codigo, cantidad)
+            usados = defaultdict(list)
+            try:
+                # Un solo recálculo de stock por bloque, no uno por venta
+                with diferir_recalculo_stock():
+                    self._registrar_bloque(pendientes, conocidas, resultados, numeros, usados)
+            except BaseException:
+                # Toda la transacción del bloque se deshizo: también los números asignados
+                for codigo, lista in usados.items():
+                    numerador.devolver(codigo, lista)
+                raise
+            finally:
+                for codigo, lista in numeros.items():
+                    numerador.devolver(codigo, lista)
+        return resultados
+
+    def _registrar_bloque(self, pendientes, conocidas, resultados, numeros, usados):
+        """Registra las ventas pendientes de un bloque; corre dentro de la transacción del bloque."""
+        clientes = Clientes.objects.in_bulk({p['cliente_id'] for _, p in pendientes if p.get('cliente_id')})
+        self.precargar([it for _, payload in pendientes for it in payload['items']])
+        try:
+            for indice, payload in pendientes:
+                clave = payload['idempotency_key']
+                if clave in conocidas:
+                    # Repetida dentro de la misma carga
+                    resultados[indice] = {'estado': 'duplicada', 'venta_id': conocidas[clave]}
+                    continue
+                estado = self._estado_memoria()
+                codigo = payload.get('punto_venta')
+                numero = numeros[codigo].pop(0)
+                try:
+                    with transaction.atomic():
+                        venta, _ = self.registrar(
+                            payload,
+                            cliente=clientes.get(payload.get('cliente_id')),
+                            fecha_venta=payload['fecha'],
+                            numero=numero,
+                        )
+                except IntegrityError:
+                    # Otra terminal registró la misma clave entre la consulta y el INSERT
+                    numeros[codigo].insert(0, numero)
+                    self._restaurar_memoria(estado)
+                    venta_id = Venta.objects.filter(idempotency_key=clave).values_list('id', flat=True).first()
+                    if venta_id is None:
+                        raise
+                    conocidas[clave] = venta_id
+                    resultados[indice] = {'estado': 'duplicada', 'venta_id': venta_id}
+                except serializers.ValidationError as exc:
+                    numeros[codigo].insert(0, numero)
+                    self._restaurar_memoria(estado)
+                    detalle = exc.detail.get('detail', exc.detail) if isinstance(exc.detail, dict) else exc.detail
+                    resultados[indice] = {'estado': 'rechazada', 'detalle': detalle}
+                else:
+                    usados[codigo].append(numero)
+                    conocidas[clave] = venta.id
+                    resultados[indice] = {'estado': 'creada', 'venta_id': venta.id, 'monto_total': venta.monto_total}
+        finally:
+            self.liberar_precarga()
+
+    def _estado_memoria(self):
+        """Copia de lo que una venta fallida podría dejar modificado en memoria."""
+        return (
+            {lote.id: (lote.cantidad_disponible, lote.activo) for lote in (self._lotes or {}).values()},
+            self._tipo_ingreso,
+            dict(self._tipos_pago),
+        )
+
+    def _restaurar_memoria(self, estado):
+        # El savepoint deshace la base; los objetos precargados se vuelven atrás a mano
+        lotes, self._tipo_ingreso, self._tipos_pago = estado
+        for lote_id, (cantidad, activo) in lotes.items():
+            self._lotes[lote_id].cantidad_disponible = cantidad
+            self._lotes[lote_id].activo = activo
+
+    def descontar_stock(self, lotes, demanda):
+        """
+        Descuenta la demanda de cada lote con un único UPDATE condicional.
+        La condición cantidad_disponible >= demanda actúa como guarda: si alguna
+        fila no se actualiza, la venta completa se rechaza.
+        """
+        if not demanda:
+            return
+        condicion = Q()
+        for lote_id, cantidad in demanda.items():
+            condicion |= Q(id=lote_id, cantidad_disponible__gte=cantidad)
+        # Los lotes tomados de reservas no están bloqueados: el agotamiento se decide en SQL.
+        # `activo` va primero porque MySQL evalúa el SET de izquierda a derecha.
+        actualizados = Lote.objects.filter(condicion).update(
+            activo=Case(
+                *[When(id=lote_id, cantidad_disponible__lte=cantidad, then=Value(False)) for lote_id, cantidad in demanda.items()],
+                default=F('activo'),
+            ),
+            cantidad_disponible=Case(
+                *[When(id=lote_id, then=F('cantidad_disponible') - cantidad) for lote_id, cantidad in demanda.items()],
+                default=F('cantidad_disponible'),
+                output_field=PositiveIntegerField(),
+            ),
+        )
+        if actualizados != len(demanda):
+            raise serializers.ValidationError({"detail": "Stock insuficiente: los lotes cambiaron durante la venta"})
+        for lote_id, cantidad in demanda.items():
+            lotes[lote_id].cantidad_disponible = max(lotes[lote_id].cantidad_disponible - cantidad, 0)
+            if lotes[lote_id].cantidad_disponible == 0:
+                lotes[lote_id].activo = False
@@ -1,3 +1,170 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from clientes.models import Clientes
+from core.models import EmpleadoProfile, Producto
+from lotes.asignacion import obtener_estrategia, orden_fifo
+from lotes.models import Lote, ReservaStock
+from movimientos_caja.models import Caja
+
+from .models import DetalleVenta, SecuenciaVenta, Venta
+from .numeracion import numerador
+
+
+class VentaTestCase(TestCase):
+    def setUp(self):
+        # Los bloques reservados viven en memoria del proceso: no deben pasar de un test a otro
+        numerador._pools.clear()
+        user = User.objects.create_user('cajero', 'cajero@example.com', 'x')
+        user.groups.add(Group.objects.get_or_create(name='gerente')[0])
+        empleado = EmpleadoProfile.objects.create(user=user, nombre='C', apellido='J', dni='1', email='cajero@example.com')
+        Caja.objects.create(empleado_apertura=empleado, monto_inicial=0)
+        self.producto = Producto.objects.create(nombre='Yerba', precio=Decimal('100'))
+        self.lote = Lote.objects.create(producto=self.producto, cantidad_inicial=50, cantidad_disponible=50)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+
+class NumeracionVentasTests(VentaTestCase):
+
+    def vender(self, punto_venta=None):
+        body = {'medio_pago': 'EFECTIVO', 'items': [{'producto_id': self.producto.id, 'cantidad': 1}]}
+        if punto_venta:
+            body['punto_venta'] = punto_venta
+        respuesta = self.client.post('/api/ventas/', body, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        return respuesta.json()['numero']
+
+    def test_correlativos_por_punto_de_venta(self):
+        SecuenciaVenta.objects.create(codigo='CAJA2', tamano_bloque=5)
+        numeros = [self.vender(), self.vender(), self.vender('CAJA2'), self.vender('CAJA2')]
+        self.assertEqual(numeros, ['00000001', '00000002', '00000001', '00000002'])
+        self.assertEqual(
+            sorted(Venta.objects.filter(secuencia__codigo='CAJA2').values_list('correlativo', flat=True)), [1, 2]
+        )
+
+    def test_prefijo_en_el_formato(self):
+        SecuenciaVenta.objects.create(codigo='CAJA3', prefijo='B-', formato='{prefijo}{numero:04d}')
+        self.assertEqual(self.vender('CAJA3'), 'B-0001')
+
+
+class EstrategiaAsignacionTests(VentaTestCase):
+    def test_solo_estrategias_registradas(self):
+        for estrategia in ('os.system', 'lotes.asignacion.orden_fifo', 'NADA'):
+            body = {'medio_pago': 'EFECTIVO', 'estrategia': estrategia,
+                    'items': [{'producto_id': self.producto.id, 'cantidad': 1}]}
+            respuesta = self.client.post('/api/ventas/', body, format='json')
+            self.assertEqual(respuesta.status_code, 400, estrategia)
+            self.assertIn('estrategia inválida', respuesta.content.decode())
+            respuesta = self.client.post('/api/reservas/', {
+                'carrito': 'A', 'producto_id': self.producto.id, 'cantidad': 1, 'estrategia': estrategia,
+            }, format='json')
+            self.assertEqual(respuesta.status_code, 400, estrategia)
+        self.assertFalse(Venta.objects.exists())
+        self.assertFalse(ReservaStock.objects.exists())
+
+    def test_estrategia_por_nombre(self):
+        body = {'medio_pago': 'EFECTIVO', 'estrategia': 'fifo', 'items': [{'producto_id': self.producto.id, 'cantidad': 1}]}
+        self.assertEqual(self.client.post('/api/ventas/', body, format='json').status_code, 201)
+
+    @override_settings(LOTES_ESTRATEGIA_ASIGNACION='lotes.asignacion.orden_fifo')
+    def test_ruta_importable_solo_desde_settings(self):
+        self.assertIs(obtener_estrategia(), orden_fifo)
+        with self.assertRaises(ValueError):
+            obtener_estrategia('lotes.asignacion.orden_fifo')
+
+
+class ReservasEnCheckoutTests(VentaTestCase):
+    def setUp(self):
+        super().setUp()
+        # Vence antes: FEFO lo elige primero si la venta no sale de la reserva
+        self.otro_lote = Lote.objects.create(
+            producto=self.producto, cantidad_inicial=10, cantidad_disponible=10,
+            fecha_vencimiento=timezone.localdate() + timedelta(days=5),
+        )
+
+    def reservar(self, carrito, cantidad, lote=None):
+        body = {'carrito': carrito, 'producto_id': self.producto.id, 'cantidad': cantidad}
+        if lote:
+            body['lote_id'] = lote.id
+        respuesta = self.client.post('/api/reservas/', body, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+
+    def vender(self, cantidad, carrito=None):
+        body = {'medio_pago': 'EFECTIVO', 'items': [{'producto_id': self.producto.id, 'cantidad': cantidad}]}
+        if carrito:
+            body['carrito'] = carrito
+        return self.client.post('/api/ventas/', body, format='json')
+
+    def lotes_vendidos(self, respuesta):
+        return dict(DetalleVenta.objects.filter(id_venta=respuesta.json()['id']).values_list('id_lote', 'cantidad'))
+
+    def test_la_venta_consume_la_reserva_del_carrito(self):
+        self.reservar('A', 4, lote=self.lote)
+        respuesta = self.vender(4, carrito='A')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.assertEqual(self.lotes_vendidos(respuesta), {self.lote.id: 4})
+        self.assertFalse(ReservaStock.objects.filter(carrito='A').exists())
+        self.lote.refresh_from_db()
+        self.assertEqual(self.lote.cantidad_disponible, 46)
+
+    def test_reserva_vencida_vuelve_a_validar(self):
+        self.reservar('A', 4, lote=self.lote)
+        ReservaStock.objects.update(expira=timezone.now() - timedelta(seconds=1))
+        respuesta = self.vender(4, carrito='A')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.assertEqual(self.lotes_vendidos(respuesta), {self.otro_lote.id: 4})
+
+    def test_reserva_insuficiente_valida_el_item_completo(self):
+        self.reservar('A', 10, lote=self.otro_lote)
+        self.reservar('B', 45, lote=self.lote)
+        # La reserva no cubre el item: se valida entero contra lo libre (las 10 propias + 5 sin reservar)
+        respuesta = self.vender(16, carrito='A')
+        self.assertEqual(respuesta.status_code, 400, respuesta.content)
+        respuesta = self.vender(15, carrito='A')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.assertEqual(self.lotes_vendidos(respuesta), {self.otro_lote.id: 10, self.lote.id: 5})
+
+    def test_sin_carrito_respeta_las_reservas_ajenas(self):
+        self.reservar('A', 58)
+        self.assertEqual(self.vender(3).status_code, 400)
+        self.assertEqual(self.vender(2).status_code, 201)
+
+
+class TrazabilidadLoteTests(VentaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cliente = Clientes.objects.create(nombre='=HYPERLINK("http://x")', apellido='@Suma', telefono='+5411')
+        self.ventas = []
+        for i in range(5):
+            body = {'medio_pago': 'EFECTIVO', 'cliente_id': self.cliente.id if i % 2 == 0 else None,
+                    'items': [{'producto_id': self.producto.id, 'cantidad': 1}]}
+            respuesta = self.client.post('/api/ventas/', body, format='json')
+            self.assertEqual(respuesta.status_code, 201, respuesta.content)
+            self.ventas.append(respuesta.json()['id'])
+
+    def test_ventas_por_paginas(self):
+        url = f'/api/lotes/{self.lote.id}/trazabilidad/?page_size=2'
+        vistas = []
+        while url:
+            datos = self.client.get(url).json()
+            self.assertEqual(datos['resumen']['ventas'], 5)
+            self.assertLessEqual(len(datos['ventas']['results']), 2)
+            vistas += [linea['venta_id'] for linea in datos['ventas']['results']]
+            url = datos['ventas']['next']
+        self.assertEqual(vistas, self.ventas)
+        primera = self.client.get(f'/api/lotes/{self.lote.id}/trazabilidad/').json()['ventas']['results'][0]
+        self.assertEqual((primera['cliente_id'], primera['cliente']), (self.cliente.id, '=HYPERLINK("http://x") @Suma'))
+
+    def test_csv_sin_formulas(self):
+        respuesta = self.client.get(f'/api/lotes/{self.lote.id}/trazabilidad/', {'formato': 'csv'})
+        contenido = b''.join(respuesta.streaming_content).decode()
+        self.assertEqual(len(contenido.splitlines()), 6)
+        self.assertIn('"\'=HYPERLINK(""http://x"")",\'@Suma', contenido)
+        self.assertIn("'+5411", contenido)
+        self.assertNotIn(',=HYPERLINK', contenido)
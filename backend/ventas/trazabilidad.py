@@ -0,0 +1,165 @@
+import csv
+
+from django.db.models import Count, Max, Sum
+
+from .models import DetalleVenta
+
+
+# ==========================================================
+# TRAZABILIDAD DE LOTES (recall de proveedor)
+# ==========================================================
+# lote -> ventas/clientes y venta -> lote/compra/proveedor. Las consultas por
+# lote recorren el índice detalle_lote_venta_idx (id_lote, id_venta) en orden,
+# sin escanear DetalleVenta ni ordenar en memoria.
+
+COLUMNAS_CSV = (
+    'venta_id', 'numero', 'fecha_venta', 'cliente_id', 'cliente_nombre', 'cliente_apellido',
+    'cliente_email', 'cliente_telefono', 'cliente_dni', 'producto_id', 'cantidad', 'precio_unitario', 'subtotal',
+)
+
+_CAMPOS_LINEA = (
+    'id_venta_id', 'id_venta__numero', 'id_venta__fecha_venta',
+    'id_venta__cliente_id', 'id_venta__cliente__nombre', 'id_venta__cliente__apellido',
+    'id_venta__cliente__email', 'id_venta__cliente__telefono', 'id_venta__cliente__dni',
+    'id_producto_id', 'cantidad', 'precio_unitario', 'subtotal',
+)
+
+
+def lineas_de_lote(lote_id):
+    """Líneas de venta que consumieron el lote, en orden de venta, como tuplas de _CAMPOS_LINEA."""
+    return (
+        DetalleVenta.objects
+        .filter(id_lote_id=lote_id)
+        .order_by('id_venta_id', 'id')
+        .values_list(*_CAMPOS_LINEA)
+    )
+
+
+def resumen_lote(lote_id):
+    detalles = DetalleVenta.objects.filter(id_lote_id=lote_id)
+    totales = detalles.aggregate(
+        ventas=Count('id_venta', distinct=True),
+        clientes=Count('id_venta__cliente', distinct=True),
+        unidades=Sum('cantidad'),
+        importe=Sum('subtotal'),
+    )
+    clientes = (
+        detalles
+        .exclude(id_venta__cliente__isnull=True)
+        .values(
+            'id_venta__cliente_id', 'id_venta__cliente__nombre', 'id_venta__cliente__apellido',
+            'id_venta__cliente__email', 'id_venta__cliente__telefono',
+        )
+        .annotate(ventas=Count('id_venta', distinct=True), unidades=Sum('cantidad'), ultima_venta=Max('id_venta__fecha_venta'))
+        .order_by('id_venta__cliente__apellido', 'id_venta__cliente__nombre', 'id_venta__cliente_id')
+    )
+    return {
+        'ventas': totales['ventas'],
+        'clientes': totales['clientes'],
+        'unidades': totales['unidades'] or 0,
+        'importe': totales['importe'] or 0,
+    }, [
+        {
+            'id': c['id_venta__cliente_id'],
+            'nombre': c['id_venta__cliente__nombre'],
+            'apellido': c['id_venta__cliente__apellido'],
+            'email': c['id_venta__cliente__email'],
+            'telefono': c['id_venta__cliente__telefono'],
+            'ventas': c['ventas'],
+            'unidades': c['unidades'],
+            'ultima_venta': c['ultima_venta'],
+        }
+        for c in clientes
+    ]
+
+
+def detalles_de_lote(lote_id):
+    """Las mismas líneas como DetalleVenta, para paginarlas por keyset (id_venta_id, id)."""
+    return (
+        DetalleVenta.objects
+        .filter(id_lote_id=lote_id)
+        .select_related('id_venta__cliente')
+        .only('id', 'id_venta_id', 'cantidad', 'precio_unitario', 'subtotal',
+              'id_venta__numero', 'id_venta__fecha_venta', 'id_venta__cliente__nombre', 'id_venta__cliente__apellido')
+        .order_by('id_venta_id', 'id')
+    )
+
+
+def lineas_lote_json(detalles):
+    lineas = []
+    for detalle in detalles:
+        venta, cliente = detalle.id_venta, detalle.id_venta.cliente
+        lineas.append({
+            'venta_id': venta.id,
+            'numero': venta.numero,
+            'fecha_venta': venta.fecha_venta,
+            'cliente_id': venta.cliente_id,
+            'cliente': f'{cliente.nombre} {cliente.apellido}' if cliente else None,
+            'cantidad': detalle.cantidad,
+            'precio_unitario': detalle.precio_unitario,
+            'subtotal': detalle.subtotal,
+        })
+    return lineas
+
+
+def _celda(valor):
+    # Los datos de clientes van directo a una planilla: un texto que empieza con
+    # =, +, - o @ se interpretaría como fórmula
+    if valor is None:
+        return ''
+    if isinstance(valor, str) and valor[:1] in ('=', '+', '-', '@', '\t', '\r'):
+        return "'" + valor
+    return valor
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en lugar de escribirla."""
+
+    def write(self, valor):
+        return valor
+
+
+def filas_csv_lote(lote_id, chunk_size=2000):
+    """
+    Genera el CSV de un lote línea por línea para StreamingHttpResponse. Las filas
+    se leen de a `chunk_size` con .iterator(), así la memoria no crece con la
+    cantidad de ventas.
+    """
+    writer = csv.writer(_Eco())
+    yield writer.writerow(COLUMNAS_CSV)
+    for fila in lineas_de_lote(lote_id).iterator(chunk_size=chunk_size):
+        fecha = fila[2]
+        yield writer.writerow(
+            (fila[0], _celda(fila[1]), fecha.isoformat() if fecha else '')
+            + tuple(_celda(valor) for valor in fila[3:])
+        )
+
+
+def trazabilidad_venta(venta_id):
+    """Por cada línea de la venta: producto, lote, compra y proveedor (una sola consulta)."""
+    detalles = (
+        DetalleVenta.objects
+        .filter(id_venta_id=venta_id)
+        .select_related('id_producto', 'id_lote__compra__id_proveedor')
+        .order_by('id')
+    )
+    lineas = []
+    for detalle in detalles:
+        lote = detalle.id_lote
+        compra = lote.compra if lote else None
+        proveedor = compra.id_proveedor if compra else None
+        lineas.append({
+            'detalle_id': detalle.id,
+            'producto': {'id': detalle.id_producto_id, 'nombre': detalle.id_producto.nombre},
+            'cantidad': detalle.cantidad,
+            'subtotal': detalle.subtotal,
+            'lote': {
+                'id': lote.id,
+                'numero_lote': lote.numero_lote,
+                'fecha_compra': lote.fecha_compra,
+                'fecha_vencimiento': lote.fecha_vencimiento,
+            } if lote else None,
+            'compra': {'id': compra.id, 'fecha_compra': compra.fecha_compra} if compra else None,
+            'proveedor': {'id': proveedor.id, 'nombre': proveedor.nombre} if proveedor else None,
+        })
+    return lineas
@@ -1,20 +1,30 @@
+from datetime import datetime
 from decimal import Decimal
-from django.db import transaction
-from django.utils import timezone
-from rest_framework import viewsets, status, serializers, mixins, filters as drf_filters
+
+from django.shortcuts import get_object_or_404
+from rest_framework import viewsets, status, mixins, filters as drf_filters
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from .models import Venta, DetalleVenta
-from .serializers import VentaSerializer, VentaCreateSerializer, VentaListSerializer
-from .filters import VentaFilter
+from .models import Venta
+from .serializers import (
+	VentaSerializer, VentaCreateSerializer, VentaListSerializer,
+	VentaBulkSerializer, VentaOfflineSerializer, CotizacionSerializer,
+)
+from .filters import VentaFilter, VentaSearchFilter
+from .numeracion import numerador
+from .reportes import resumen_ventas, resumen_desde_rollups
+from .services import CheckoutVenta
+from .trazabilidad import trazabilidad_venta
 from django_filters.rest_framework import DjangoFilterBackend
+from core.idempotency import idempotente
 from core.models import EmpleadoProfile, Producto
+from core.pagination import KeysetPagination
+from lotes.models import diferir_recalculo_stock
 from clientes.models import Clientes
-from lotes.models import Lote
-from movimientos_caja.models import Caja, MovimientoDeCaja
-from tipo_movimientos.models import TipoMovimiento
-from tipo_pago.models import TipoPago
+from movimientos_caja.models import Caja
+from promociones import motor
 
 
 class VentaViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
@@ -24,18 +34,152 @@ class VentaViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.Crea
 				.select_related('cliente', 'empleado')
 				.prefetch_related('detalles__id_producto'))
 
-	pagination_class = None  # Desactivar paginación para devolver todas las ventas
-	filter_backends = [DjangoFilterBackend, drf_filters.SearchFilter, drf_filters.OrderingFilter]
+	pagination_class = KeysetPagination  # Lista completa salvo ?paginacion=cursor
+	keyset_ordering = ('-fecha_venta', '-id')
+	filter_backends = [DjangoFilterBackend, VentaSearchFilter, drf_filters.OrderingFilter]
 	filterset_class = VentaFilter
 	search_fields = ['cliente__nombre', 'cliente__apellido', 'cliente__email', 'numero', 'detalles__id_producto__nombre']
 	ordering_fields = ['fecha_venta', 'monto_total']
 	ordering = ['-fecha_venta']
+	bulk_tamano_bloque = 50  # ventas por transacción en /bulk/
+
+	def incluir_items(self):
+		return self.request.query_params.get('incluir_items', '').lower() not in ('false', '0', 'no')
+
+	def get_queryset(self):
+		qs = super().get_queryset()
+		if self.action == 'list' and not self.incluir_items():
+			# Totales ya persistidos en Venta: el listado liviano no necesita las líneas
+			qs = qs.prefetch_related(None)
+		return qs
+
+	def get_serializer_context(self):
+		context = super().get_serializer_context()
+		if self.action == 'list':
+			context['incluir_items'] = self.incluir_items()
+		return context
 
 	def get_serializer_class(self):
 		if self.action == 'list':
 			return VentaListSerializer
 		return VentaSerializer
 
+	@action(detail=False, methods=['get'])
+	def resumen(self, request):
+		"""
+		Indicadores agregados de ventas (totales, series por día/hora/día de semana,
+		medios de pago, empleados y top de productos) calculados con GROUP BY.
+		Acepta los mismos filtros que el listado (fecha_desde, fecha_hasta, medio_pago, empleado_id, search)
+		y ?top=N para el ranking de productos (por defecto 10).
+
+		Si sólo se filtra por fechas se lee de los resúmenes precalculados
+		(ResumenVentaHora / ResumenProductoDia); con cualquier otro filtro, o con
+		?fuente=ventas, se agregan las ventas crudas.
+		"""
+		try:
+			top = max(1, min(int(request.query_params.get('top', 10)), 100))
+		except ValueError:
+			top = 10
+		params = set(request.query_params) - {'top', 'fuente'}
+		if request.query_params.get('fuente') != 'ventas' and params <= {'fecha_desde', 'fecha_hasta'}:
+			fechas = {}
+			for param in params:
+				try:
+					fechas[param] = datetime.strptime(request.query_params[param], '%Y-%m-%d').date()
+				except ValueError:
+					pass  # igual que VentaFilter: una fecha inválida no filtra
+			return Response(resumen_desde_rollups(fechas.get('fecha_desde'), fechas.get('fecha_hasta'), top=top))
+
+		ventas = self.filter_queryset(Venta.objects.all())
+		if ventas.query.distinct:
+			ventas = Venta.objects.filter(pk__in=ventas.values('pk'))
+		return Response(resumen_ventas(ventas, top=top))
+
+	@action(detail=True, methods=['get'])
+	def trazabilidad(self, request, pk=None):
+		"""Por cada línea de la venta: lote consumido, compra de origen y proveedor."""
+		venta = get_object_or_404(Venta.objects.only('id', 'numero'), pk=pk)
+		return Response({'venta_id': venta.id, 'numero': venta.numero, 'lineas': trazabilidad_venta(venta.id)})
+
+	@action(detail=False, methods=['post'])
+	def bulk(self, request):
+		"""
+		Carga de ventas registradas offline por el POS: {"ventas": [...]} con hasta 500
+		ventas, cada una con el mismo formato que POST /api/ventas/ más
+		idempotency_key y fecha (hora original en el POS).
+		Responde un resultado por venta, en el mismo orden: creada, duplicada
+		(la clave ya estaba registrada) o rechazada con el motivo.
+		"""
+		ser = VentaBulkSerializer(data=request.data)
+		ser.is_valid(raise_exception=True)
+		ventas = ser.validated_data['ventas']
+
+		caja = self.get_open_caja(request.user)
+		if not caja:
+			return Response({"detail": "No hay sesión de caja abierta"}, status=409)
+		empleado = self.get_empleado(request.user)
+
+		resultados = [None] * len(ventas)
+		validas = []
+		for indice, data in enumerate(ventas):
+			item = VentaOfflineSerializer(data=data)
+			if item.is_valid():
+				validas.append((indice, item.validated_data))
+			else:
+				resultados[indice] = {'estado': 'rechazada', 'detalle': item.errors}
+
+		checkout = CheckoutVenta(request.user, caja, empleado)
+		for indice, resultado in checkout.registrar_lote(validas, tamano_bloque=self.bulk_tamano_bloque).items():
+			resultados[indice] = resultado
+
+		resumen = {'creadas': 0, 'duplicadas': 0, 'rechazadas': 0}
+		for indice, (data, resultado) in enumerate(zip(ventas, resultados)):
+			resultado['indice'] = indice
+			resultado['idempotency_key'] = data.get('idempotency_key') or data.get('idempotencyKey')
+			resumen[{'creada': 'creadas', 'duplicada': 'duplicadas', 'rechazada': 'rechazadas'}[resultado['estado']]] += 1
+		return Response({'resumen': resumen, 'resultados': resultados}, status=200)
+
+	@action(detail=False, methods=['post'])
+	def cotizar(self, request):
+		"""
+		Precio del carrito con las reglas de promociones vigentes, sin registrar nada:
+		{"cliente_id": opcional, "items": [{"producto_id", "cantidad"}, ...]}.
+		Es el mismo cálculo que aplica la venta con precio_servidor.
+		"""
+		ser = CotizacionSerializer(data=request.data)
+		ser.is_valid(raise_exception=True)
+		items = ser.validated_data['items']
+
+		productos = Producto.objects.in_bulk({it['producto_id'] for it in items})
+		faltantes = sorted({it['producto_id'] for it in items} - productos.keys())
+		if faltantes:
+			return Response({"detail": f"Producto inexistente: {faltantes[0]}"}, status=400)
+		cliente = None
+		if ser.validated_data.get('cliente_id'):
+			cliente = Clientes.objects.filter(id=ser.validated_data['cliente_id']).first()
+
+		lineas = motor.cotizar(items, productos, cliente)
+		bruto = sum((l.bruto for l in lineas), Decimal('0'))
+		total = sum((l.subtotal for l in lineas), Decimal('0'))
+		return Response({
+			'items': [
+				{
+					'producto_id': l.producto.id,
+					'nombre': l.producto.nombre,
+					'cantidad': l.cantidad,
+					'precio_unitario': l.precio_unitario,
+					'descuento_por_item': l.descuento_por_item.quantize(Decimal('0.01')),
+					'bruto': l.bruto,
+					'subtotal': l.subtotal,
+					'regla': {'id': l.regla.id, 'nombre': l.regla.nombre, 'tipo': l.regla.tipo} if l.regla else None,
+				}
+				for l in lineas
+			],
+			'bruto': bruto,
+			'descuento_total': bruto - total,
+			'total': total,
+		})
+
 	def get_empleado(self, user):
 		try:
 			return EmpleadoProfile.objects.get(user=user)
@@ -45,7 +189,9 @@ class VentaViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.Crea
 	def get_open_caja(self, user):
 		return Caja.objects.filter(estado='ABIERTA').first()
 
-	@transaction.atomic
+	# Idempotencia y número de ticket por fuera de la transacción: un reintento
+	# concurrente espera o repite la respuesta guardada sin llegar a bloquear lotes
+	@idempotente('ventas')
 	def create(self, request):
 		data = request.data
 		ser = VentaCreateSerializer(data=data)
@@ -59,7 +205,7 @@ class VentaViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.Crea
 
 		empleado = self.get_empleado(request.user)
 
-		# Idempotencia (si se envía)
+		# Idempotencia (si se envía): ventas registradas antes del store o con la clave ya expirada
 		idem = payload.get('idempotency_key')
 		if idem:
 			existente = Venta.objects.filter(idempotency_key=idem).first()
@@ -72,77 +218,13 @@ class VentaViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.Crea
 		if cliente_id:
 			cliente = Clientes.objects.filter(id=cliente_id).first()
 
-		# Calcular totales y validar stock
-		items = payload['items']
-		detalles_creados = []
-		total = Decimal('0.00')
-
-		venta = Venta.objects.create(
-			caja=caja,
-			empleado=empleado,
-			cliente=cliente,
-			medio_pago=payload['medio_pago'],
-			notas=payload.get('notas') or None,
-			idempotency_key=idem or None,
-			monto_total=Decimal('0.00'),
-		)
-
-
-		for it in items:
-			producto = Producto.objects.get(id=it['producto_id'])
-			lotes_asignados = it.get('lotes_asignados', [])
-			if not lotes_asignados:
-				raise serializers.ValidationError({"detail": f"No se especificaron lotes para el producto {producto.id}"})
-			for lote_info in lotes_asignados:
-				lote_id = lote_info['lote_id']
-				cantidad = int(lote_info['cantidad'])
-				precio_unitario = Decimal(str(lote_info['precio_unitario']))
-				desc = Decimal(str(lote_info.get('descuento_por_item') or '0'))
-				lote = Lote.objects.select_for_update().get(id=lote_id)
-				if lote.cantidad_disponible < cantidad:
-					raise serializers.ValidationError({"detail": f"Stock insuficiente en lote {lote_id} para producto {producto.id}"})
-				subtotal = precio_unitario * Decimal(cantidad) * (Decimal('1.0') - desc / Decimal('100'))
-				detalle = DetalleVenta.objects.create(
-					id_venta=venta,
-					id_producto=producto,
-					id_lote=lote,
-					cantidad=cantidad,
-					precio_unitario=precio_unitario,
-					descuento_por_item=desc if desc > 0 else None,
-					subtotal=subtotal,
-				)
-				detalles_creados.append(detalle)
-				total += subtotal
-				# descontar stock
-				lote.cantidad_disponible -= cantidad
-				if lote.cantidad_disponible <= 0:
-					lote.activo = False
-				lote.save(update_fields=['cantidad_disponible', 'activo'])
-
-		# Actualizar total de venta
-		venta.monto_total = total
-		venta.save(update_fields=['monto_total'])
-
-		# Registrar movimiento de caja (INGRESO)
-		tm = TipoMovimiento.objects.filter(nombre_tipo_movimiento__iexact='INGRESO').first()
-		if not tm:
-			tm = TipoMovimiento.objects.create(nombre_tipo_movimiento='INGRESO')
-		tp = TipoPago.objects.filter(nombre_tipo_pago__iexact=payload['medio_pago']).first()
-		if not tp:
-			tp = TipoPago.objects.create(nombre_tipo_pago=payload['medio_pago'])
-		mov = MovimientoDeCaja.objects.create(
-			caja=caja,
-			monto=total,
-			descripcion=f'Venta #{venta.id}',
-			empleado=empleado,
-			id_tipo_movimiento=tm,
-			id_tipo_pago=tp,
-			tipo='INGRESO',
-			origen='VENTA',
-			ref_type='venta',
-			ref_id=venta.id,
-			created_by=request.user,
-		)
+		# Escritura agrupada: lotes bloqueados en una sola consulta, detalles en bulk.
+		# Si la transacción falla, el número vuelve al pool y lo usa la venta siguiente.
+		checkout = CheckoutVenta(request.user, caja, empleado)
+		with numerador.numero(payload.get('punto_venta')) as numero:
+			with diferir_recalculo_stock():
+				venta, mov = checkout.registrar(payload, cliente=cliente, numero=numero)
+		total = venta.monto_total
 		mov_slim = {"id": mov.id, "tipo": "INGRESO", "medio_pago": payload['medio_pago'], "monto": float(total)}
 		return Response(VentaSerializer(venta, context={'movimiento_caja': mov_slim}).data, status=201)
 